@@ -0,0 +1,246 @@
+import datetime
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from exam.models import ExamShift, Student
+from region.models import Zone
+
+logger = logging.getLogger(__name__)
+
+# (exam_id, e_date, sm)
+AdmissionKey = Tuple[int, datetime.date, int]
+# Student o'zgarganda oshiriladigan umumiy (Redis) versiya: boshqa processlar indeksini yangilaydi
+VERSION_CACHE_KEY = 'access_control:admission_version'
+
+STUDENT_FIELDS = (
+    'id', 'exam_id', 'zone_id', 'zone__name', 'e_date', 'sm', 'gr_n', 'imei',
+    'last_name', 'first_name', 'middle_name', 'is_cheating', 'is_blacklist', 'is_image',
+)
+
+
+@dataclass(frozen=True)
+class AdmissionFacts:
+    """Eshik qarori va monitor xabari uchun kerakli talaba ma'lumotlari"""
+    id: int
+    exam_id: int
+    zone_id: Optional[int]
+    zone_name: str
+    e_date: datetime.date
+    sm: int
+    gr_n: int
+    imei: str
+    fio: str
+    is_cheating: bool
+    is_blacklist: bool
+    is_image: bool
+
+    @staticmethod
+    def _fio(last_name, first_name, middle_name):
+        if not middle_name:
+            return f"{last_name} {first_name}"
+        return f"{last_name} {first_name} {middle_name}"
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'AdmissionFacts':
+        return cls(
+            id=row['id'], exam_id=row['exam_id'], zone_id=row['zone_id'], zone_name=row['zone__name'] or '',
+            e_date=row['e_date'], sm=row['sm'], gr_n=row['gr_n'], imei=row['imei'],
+            fio=cls._fio(row['last_name'], row['first_name'], row['middle_name']),
+            is_cheating=row['is_cheating'], is_blacklist=row['is_blacklist'], is_image=row['is_image'],
+        )
+
+    @classmethod
+    def from_student(cls, student: Student, zone_name: str = None) -> 'AdmissionFacts':
+        if zone_name is None:
+            zone_name = student.zone.name if student.zone_id else ''
+        return cls(
+            id=student.id, exam_id=student.exam_id, zone_id=student.zone_id, zone_name=zone_name,
+            e_date=student.e_date, sm=student.sm, gr_n=student.gr_n, imei=student.imei, fio=student.fio,
+            is_cheating=student.is_cheating, is_blacklist=student.is_blacklist, is_image=student.is_image,
+        )
+
+
+class _ShiftIndex:
+    def __init__(self, by_imei: Dict[str, AdmissionFacts], synced_at):
+        self.by_imei = by_imei
+        self.synced_at = synced_at
+
+
+class AdmissionIndex:
+    """
+    Smena bo'yicha imei -> AdmissionFacts xaritasi. Smena ochilishidan oldin fon threadida
+    yuklanadi va updated_at bo'yicha qisman yangilanadi; Student signallari indeksni darhol yangilaydi.
+    Signal faqat shu jarayonda ishlaydi; boshqa processlar umumiy versiya kalitini
+    (VERSION_CACHE_KEY) ADMISSION_VERSION_CHECK_SECONDS da bir marta tekshiradi va versiya
+    o'zgargan bo'lsa yuklangan smenalarni darhol yangilaydi (aensure_current).
+    """
+
+    def __init__(self):
+        self._shifts: Dict[AdmissionKey, _ShiftIndex] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._seen_version = None
+        self._version_checked_at = 0.0
+
+    def lookup(self, exam_id, e_date, sm, imei) -> Optional[AdmissionFacts]:
+        """Hot path: bazaga murojaatsiz. Smena yuklanmagan yoki imei topilmasa None"""
+        shift = self._shifts.get((exam_id, e_date, sm))
+        if shift is None:
+            return None
+        return shift.by_imei.get(imei)
+
+    def is_loaded(self, exam_id, e_date, sm) -> bool:
+        return (exam_id, e_date, sm) in self._shifts
+
+    def stats(self) -> dict:
+        return {
+            'shifts': len(self._shifts),
+            'students': sum(len(shift.by_imei) for shift in self._shifts.values()),
+        }
+
+    def load(self, key: AdmissionKey) -> None:
+        start = time.perf_counter()
+        synced_at = timezone.now()
+        exam_id, e_date, sm = key
+        rows = Student.objects.filter(exam_id=exam_id, e_date=e_date, sm=sm).values(*STUDENT_FIELDS)
+        by_imei = {row['imei']: AdmissionFacts.from_row(row) for row in rows.iterator(chunk_size=5000)}
+        with self._lock:
+            self._shifts[key] = _ShiftIndex(by_imei, synced_at)
+        logger.info(f"Kirish indeksi yuklandi: {key} | {len(by_imei)} ta | {time.perf_counter() - start:.2f}s")
+
+    def refresh(self, key: AdmissionKey) -> None:
+        """Oxirgi sinxronlashdan keyin o'zgargan talabalarni indeksga qo'llash"""
+        shift = self._shifts.get(key)
+        if shift is None:
+            return
+        synced_at = timezone.now()
+        rows = Student.objects.filter(exam_id=key[0], updated_at__gt=shift.synced_at).values(*STUDENT_FIELDS)
+        for row in rows.iterator(chunk_size=2000):
+            self._apply(AdmissionFacts.from_row(row))
+        shift.synced_at = synced_at
+
+    def apply_student(self, student: Student) -> None:
+        """Signal orqali: saqlangan talaba indeksga darhol qo'llanadi"""
+        if not any(key[0] == student.exam_id for key in self._shifts):
+            return
+        self._apply(AdmissionFacts.from_student(student, zone_name=self._zone_name(student)))
+
+    def _zone_name(self, student: Student) -> str:
+        """Bino nomi: yuklangan bo'lsa obyektdan, bino o'zgarmagan bo'lsa indeksdan, aks holda bitta so'rov"""
+        if not student.zone_id:
+            return ''
+        if Student.zone.is_cached(student):
+            return student.zone.name
+        for shift in list(self._shifts.values()):
+            current = shift.by_imei.get(student.imei)
+            if current is not None and current.zone_id == student.zone_id:
+                return current.zone_name
+        return Zone.objects.filter(id=student.zone_id).values_list('name', flat=True).first() or ''
+
+    @staticmethod
+    def bump_version() -> None:
+        """Student o'zgarganini boshqa processlarga bildirish"""
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        except Exception as e:
+            logger.warning(f"[AdmissionIndex] versiya oshirilmadi: {e}")
+
+    def _refresh_loaded(self) -> None:
+        for key in list(self._shifts):
+            self.refresh(key)
+
+    async def aensure_current(self) -> None:
+        """
+        Hot path: versiya kaliti faqat ADMISSION_VERSION_CHECK_SECONDS da bir marta o'qiladi;
+        boshqa processda talaba o'zgargan bo'lsa, yuklangan smenalar bazadan yangilanadi.
+        """
+        now = time.monotonic()
+        if now - self._version_checked_at < settings.ADMISSION_VERSION_CHECK_SECONDS:
+            return
+        self._version_checked_at = now
+        try:
+            version = await cache.aget(VERSION_CACHE_KEY)
+        except Exception as e:
+            logger.warning(f"[AdmissionIndex] versiya o'qilmadi: {e}")
+            return
+        if version == self._seen_version:
+            return
+        first_check = self._seen_version is None
+        self._seen_version = version
+        if not first_check:
+            await sync_to_async(self._refresh_loaded)()
+
+    def _apply(self, facts: AdmissionFacts) -> None:
+        # Talaba boshqa smenaga ko'chirilgan bo'lsa, eski smenadan olib tashlanadi
+        for key, shift in list(self._shifts.items()):
+            current = shift.by_imei.get(facts.imei)
+            if key == (facts.exam_id, facts.e_date, facts.sm):
+                shift.by_imei[facts.imei] = facts
+            elif current is not None and current.id == facts.id:
+                del shift.by_imei[facts.imei]
+
+    def remove_student(self, student: Student) -> None:
+        for shift in list(self._shifts.values()):
+            current = shift.by_imei.get(student.imei)
+            if current is not None and current.id == student.id:
+                del shift.by_imei[student.imei]
+
+    def upcoming_keys(self, now=None):
+        """Bugungi, ochilishiga ADMISSION_WARMUP_MINUTES qolgan yoki ochiq smenalar"""
+        now = now or timezone.localtime()
+        lead = datetime.timedelta(minutes=settings.ADMISSION_WARMUP_MINUTES)
+        today = now.date()
+        shifts = ExamShift.objects.filter(
+            exam__is_finished=False, exam__start_date__lte=today, exam__finish_date__gte=today
+        ).values_list('exam_id', 'sm__number', 'access_time', 'expire_time')
+        keys = set()
+        for exam_id, sm, access_time, expire_time in shifts:
+            opens = datetime.datetime.combine(today, access_time) - lead
+            closes = datetime.datetime.combine(today, expire_time)
+            if opens <= now.replace(tzinfo=None) <= closes:
+                keys.add((exam_id, today, sm))
+        return keys
+
+    def sync(self) -> None:
+        """Kerakli smenalarni yuklash, yuklanganlarini yangilash, tugaganlarini o'chirish"""
+        keys = self.upcoming_keys()
+        for key in keys:
+            if key in self._shifts:
+                self.refresh(key)
+            else:
+                self.load(key)
+        with self._lock:
+            for key in [k for k in self._shifts if k not in keys]:
+                del self._shifts[key]
+
+    def start(self) -> None:
+        """Fon threadida davriy sinxronlashni ishga tushirish"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def _run():
+            while True:
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.error(f"[AdmissionIndex] sinxronlashda xatolik: {e}")
+                finally:
+                    close_old_connections()
+                time.sleep(settings.ADMISSION_INDEX_REFRESH_SECONDS)
+
+        self._thread = threading.Thread(target=_run, name="admission-index", daemon=True)
+        self._thread.start()
+
+
+admission_index = AdmissionIndex()
@@ -10,3 +10,4 @@ class AccessControlConfig(AppConfig):
     def ready(self):
         from config.admin_config import AdminLogDisabler
         AdminLogDisabler.disable_all()
+        import access_control.signals  # noqa: F401
@@ -65,4 +65,11 @@ class StudentAccessConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'type': 'student_access',
             'data': event['data']
-        }))
\ No newline at end of file
+        }))
+
+    # Fon rejimidagi yuz tekshiruvi natijasi
+    async def face_verification_event(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'face_verification',
+            'data': event['data']
+        }))
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+from django.conf import settings
+
+from access_control.loops import LoopLocal
+
+
+class _Entry:
+    __slots__ = ('future', 'expires_at')
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.expires_at = None
+
+
+class EventDeduplicator:
+    """
+    Qisqa oyna ichida bir xil kalit bilan kelgan eventlarni birlashtirish.
+    Birinchi event qayta ishlanadi, u tugaguncha yoki tugaganidan keyin window soniya
+    ichida kelgan takroriy eventlar xuddi shu natijani oladi (qaror o'zgarmaydi).
+    Futurelar loopga bog'langani uchun yozuvlar har bir event loop uchun alohida saqlanadi.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._loop_entries: LoopLocal[Dict[Hashable, _Entry]] = LoopLocal(dict)
+        self._calls = 0
+        self._stats = {'processed': 0, 'deduplicated': 0}
+
+    def stats(self) -> dict:
+        return {**self._stats, 'keys': sum(len(entries) for entries in self._loop_entries.values())}
+
+    def _purge(self, entries: Dict[Hashable, _Entry], now: float):
+        expired = [key for key, entry in entries.items()
+                   if entry.expires_at is not None and entry.expires_at <= now]
+        for key in expired:
+            del entries[key]
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """(natija, takrormi) qaytaradi"""
+        now = time.monotonic()
+        entries = self._loop_entries.get()
+        self._calls += 1
+        if self._calls % 500 == 0:
+            self._purge(entries, now)
+
+        entry = entries.get(key)
+        if entry is not None and (entry.expires_at is None or entry.expires_at > now):
+            self._stats['deduplicated'] += 1
+            return await asyncio.shield(entry.future), True
+
+        # Qayta ishlash alohida taskda: birinchi so'rov uzilsa (CancelledError) ham ish davom etadi
+        # va kutayotganlar natijani oladi, bekor qilinish ularga o'tmaydi
+        task = asyncio.ensure_future(factory())
+        entry = _Entry(task)
+        entries[key] = entry
+        task.add_done_callback(lambda done: self._finish(entries, key, entry, done))
+        return await asyncio.shield(task), False
+
+    def _finish(self, entries: Dict[Hashable, _Entry], key: Hashable, entry: _Entry, task: asyncio.Future):
+        if task.cancelled() or task.exception() is not None:
+            # Xatolik keshlanmaydi: kutayotganlar xatoni oladi, keyingi event qayta ishlanadi
+            if entries.get(key) is entry:
+                del entries[key]
+            return
+        entry.expires_at = time.monotonic() + self.window
+        self._stats['processed'] += 1
+
+
+event_deduplicator = EventDeduplicator(settings.WEBHOOK_DEDUP_WINDOW_SECONDS)
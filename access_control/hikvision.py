@@ -0,0 +1,106 @@
+import datetime
+import json
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from django.utils import timezone
+
+BOUNDARY_PATTERN = re.compile(rb'boundary="?([^";,\s]+)"?', re.IGNORECASE)
+NAME_PATTERN = re.compile(rb'name="([^"]+)"', re.IGNORECASE)
+HEADER_END = b'\r\n\r\n'
+
+EVENT_PART = b'AccessControllerEvent'
+PICTURE_PART = b'Picture'
+
+
+@dataclass
+class AccessEvent:
+    """Hikvision AccessControllerEvent ning webhook uchun kerakli qismi"""
+    ip_address: Optional[str]
+    mac_address: Optional[str]
+    door_no: Optional[int]
+    datetime: datetime.datetime
+    name: str
+    employee_no: str
+    user_type: str
+    image: Optional[bytes] = None
+    # Rasm omboridagi kalit (asl rasm; nusxalari fon pulida yaratiladi)
+    image_key: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, data_dict: dict) -> Optional['AccessEvent']:
+        # Faqat active AccessControllerEvent ni qayta ishlash
+        if data_dict.get("eventState") != "active" or data_dict.get("eventType") != "AccessControllerEvent":
+            return None
+
+        event = data_dict.get('AccessControllerEvent', {})
+
+        # Datetime ni to'g'ri parse qilish (mahalliy vaqt, tzinfo siz)
+        dt = datetime.datetime.fromisoformat(data_dict["dateTime"])
+        if dt.tzinfo:
+            dt = dt.astimezone(timezone.get_current_timezone())
+        dt = dt.replace(tzinfo=None)
+
+        return cls(
+            ip_address=data_dict.get("ipAddress"),
+            mac_address=data_dict.get("macAddress"),
+            door_no=event.get("doorNo"),
+            datetime=dt,
+            name=event.get("name", ""),
+            employee_no=event.get("employeeNoString", ""),
+            user_type=event.get("userType", ""),
+        )
+
+
+def _iter_parts(body: bytes, boundary: bytes):
+    """multipart tanasidan (name, baytlar) juftliklarini nusxalamasdan ajratish"""
+    delimiter = b'--' + boundary
+    body_view = memoryview(body)
+    position = body.find(delimiter)
+    while position != -1:
+        start = position + len(delimiter)
+        if body[start:start + 2] == b'--':
+            return
+        next_position = body.find(delimiter, start)
+        if next_position == -1:
+            next_position = len(body)
+        header_end = body.find(HEADER_END, start, next_position)
+        if header_end != -1:
+            match = NAME_PATTERN.search(body, start, header_end)
+            content_start = header_end + len(HEADER_END)
+            content_end = next_position
+            # Keyingi delimiter oldidagi CRLF qism tarkibiga kirmaydi
+            if body[content_end - 2:content_end] == b'\r\n':
+                content_end -= 2
+            if match:
+                yield match.group(1), body_view[content_start:content_end]
+        position = next_position if next_position < len(body) else -1
+
+
+def parse_access_event(body: bytes, content_type: str) -> Optional[AccessEvent]:
+    """
+    Hikvision webhook tanasini parse qilish. multipart/form-data bo'lsa JSON qismi va
+    rasm baytlari base64 ga o'girilmasdan olinadi; oddiy JSON ham qo'llab-quvvatlanadi.
+    """
+    content_type = content_type or ''
+    if content_type.startswith('application/json'):
+        return AccessEvent.from_json(json.loads(body))
+
+    match = BOUNDARY_PATTERN.search(content_type.encode())
+    if not match:
+        return None
+
+    event = None
+    image = None
+    for name, content in _iter_parts(body, match.group(1)):
+        if name == EVENT_PART:
+            event = AccessEvent.from_json(json.loads(bytes(content)))
+            if event is None:
+                return None
+        elif name == PICTURE_PART:
+            image = bytes(content)
+
+    if event is not None:
+        event.image = image
+    return event
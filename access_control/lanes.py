@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict
+
+from django.conf import settings
+
+from access_control.loops import LoopLocal
+
+logger = logging.getLogger(__name__)
+
+
+class LaneFull(Exception):
+    """Turniket navbati to'la — event qabul qilinmaydi (503)"""
+
+
+class LaneTimeout(Exception):
+    """Event navbatda belgilangan vaqt ichida qayta ishlanmadi"""
+
+
+class _LaneStats:
+    def __init__(self):
+        self.processed = 0
+        self.shed = 0
+        self.expired = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+
+    def record(self, elapsed_ms: float):
+        self.processed += 1
+        self.last_ms = elapsed_ms
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def as_dict(self, depth: int) -> dict:
+        return {
+            'depth': depth,
+            'processed': self.processed,
+            'shed': self.shed,
+            'expired': self.expired,
+            'last_ms': round(self.last_ms, 2),
+            'max_ms': round(self.max_ms, 2),
+            'avg_ms': round(self.total_ms / self.processed, 2) if self.processed else 0.0,
+        }
+
+
+class _Lane:
+    def __init__(self, mac_address: str, max_depth: int):
+        self.mac_address = mac_address
+        self.queue = asyncio.Queue(maxsize=max_depth)
+        self.worker = None
+
+
+class TurnstileLanes:
+    """
+    Har bir turniket (MAC) uchun alohida tartiblangan navbat: bitta qurilmaning eventlari
+    ketma-ket, turli qurilmalarniki esa parallel qayta ishlanadi.
+    Navbat chuqurligi cheklangan, to'lganda LaneFull ko'tariladi.
+
+    Navbatlar va workerlar event loopga bog'langan, shuning uchun har bir loop o'z navbatlarini
+    oladi (LoopLocal). Bitta loop ichida navbat yaratish, event qo'yish va bo'sh navbatni yopish
+    await'siz sinxron qadamlar — ular o'zaro atomar, qo'shimcha lock kerak emas.
+    """
+
+    def __init__(self, max_depth: int, idle_seconds: float, wait_seconds: float):
+        self.max_depth = max_depth
+        self.idle_seconds = idle_seconds
+        self.wait_seconds = wait_seconds
+        self._loop_lanes: LoopLocal[Dict[str, _Lane]] = LoopLocal(dict)
+        self._stats: Dict[str, _LaneStats] = {}
+        # Statistika barcha looplar uchun umumiy
+        self._stats_lock = threading.Lock()
+
+    def _lane_stats(self, mac_address: str) -> _LaneStats:
+        with self._stats_lock:
+            return self._stats.setdefault(mac_address, _LaneStats())
+
+    def stats(self) -> dict:
+        depths: Dict[str, int] = {}
+        for lanes in self._loop_lanes.values():
+            for mac, lane in list(lanes.items()):
+                depths[mac] = depths.get(mac, 0) + lane.queue.qsize()
+        with self._stats_lock:
+            return {mac: stats.as_dict(depths.get(mac, 0)) for mac, stats in self._stats.items()}
+
+    def _enqueue(self, mac_address: str, item) -> None:
+        stats = self._lane_stats(mac_address)
+        lanes = self._loop_lanes.get()
+        lane = lanes.get(mac_address)
+        if lane is None:
+            lane = _Lane(mac_address, self.max_depth)
+            lanes[mac_address] = lane
+            lane.worker = asyncio.get_running_loop().create_task(self._work(lanes, lane))
+        try:
+            lane.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            stats.shed += 1
+            logger.warning(f"Turniket navbati to'la: {mac_address} ({lane.queue.qsize()})")
+            raise LaneFull(mac_address)
+
+    @staticmethod
+    def _retire(lanes: Dict[str, _Lane], lane: _Lane) -> bool:
+        """Navbat bo'sh bo'lsagina uni ro'yxatdan olib tashlash; keyingi event yangi navbat ochadi"""
+        if not lane.queue.empty():
+            return False
+        if lanes.get(lane.mac_address) is lane:
+            del lanes[lane.mac_address]
+        return True
+
+    async def submit(self, mac_address: str, factory: Callable[[], Awaitable]):
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(mac_address, (factory, future))
+        try:
+            return await asyncio.wait_for(future, timeout=self.wait_seconds)
+        except asyncio.TimeoutError:
+            # Future bekor qilingan — worker bu eventni kechikib bajarmaydi
+            self._lane_stats(mac_address).expired += 1
+            raise LaneTimeout(mac_address)
+
+    async def _work(self, lanes: Dict[str, _Lane], lane: _Lane):
+        stats = self._lane_stats(lane.mac_address)
+        while True:
+            try:
+                factory, future = lane.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                try:
+                    factory, future = await asyncio.wait_for(lane.queue.get(), timeout=self.idle_seconds)
+                except asyncio.TimeoutError:
+                    if self._retire(lanes, lane):
+                        return
+                    continue
+
+            if future.done():
+                # Kutuvchi vaqt tugab ketgan — eskirgan eventni bajarish shart emas
+                lane.queue.task_done()
+                continue
+
+            start = time.perf_counter()
+            try:
+                result = await factory()
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                stats.record((time.perf_counter() - start) * 1000)
+                lane.queue.task_done()
+
+
+turnstile_lanes = TurnstileLanes(
+    settings.TURNSTILE_LANE_MAX_DEPTH,
+    settings.TURNSTILE_LANE_IDLE_SECONDS,
+    settings.TURNSTILE_LANE_WAIT_SECONDS,
+)
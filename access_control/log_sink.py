@@ -0,0 +1,163 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.image_store import offload_field
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class LogSink:
+    """
+    StudentLog / NormalUserLog yozuvlari uchun write-behind navbat.
+    Yozuvlar navbatga qo'yiladi va fon threadida har LOG_SINK_BATCH_SIZE ta yoki
+    har LOG_SINK_FLUSH_MS millisekundda bulk_create bilan yoziladi.
+    Process to'xtaganda (atexit) navbat oxirigacha yozib tugatiladi.
+    """
+
+    def __init__(self, batch_size: int, flush_ms: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'failed': 0,
+            'flushes': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'last_batch_size': 0,
+        }
+
+    def enqueue(self, obj, on_saved: Optional[Callable] = None):
+        """Yozuvni navbatga qo'yish; on_saved(obj) yozilgandan keyin (id bilan) chaqiriladi"""
+        self._ensure_started()
+        self._queue.put((obj, on_saved))
+        self._stats['enqueued'] += 1
+
+    def stats(self) -> dict:
+        return {**self._stats, 'queue_depth': self._queue.qsize(), 'running': self._is_running()}
+
+    def _is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _ensure_started(self):
+        if self._is_running():
+            return
+        with self._lock:
+            if not self._is_running():
+                self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+        # To'xtash: qolgan yozuvlarni ham yozib tugatish
+        self._drain()
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        close_old_connections()
+        by_model = defaultdict(list)
+        for obj, on_saved in batch:
+            by_model[type(obj)].append((obj, on_saved))
+
+        for model, items in by_model.items():
+            objs = [obj for obj, _ in items]
+            self._offload_images(objs)
+            try:
+                model.objects.bulk_create(objs)
+                self._stats['written'] += len(objs)
+            except Exception as e:
+                logger.error(f"[LogSink] {model.__name__} bulk_create xatolik: {e}. Bittalab yoziladi")
+                items = self._save_one_by_one(items)
+            for obj, on_saved in items:
+                if on_saved is not None and obj.pk:
+                    try:
+                        on_saved(obj)
+                    except Exception as e:
+                        logger.error(f"[LogSink] on_saved xatolik: {e}")
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._stats['flushes'] += 1
+        self._stats['last_flush_ms'] = round(elapsed_ms, 2)
+        self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], elapsed_ms), 2)
+        self._stats['last_batch_size'] = len(batch)
+
+    @staticmethod
+    def _offload_images(objs):
+        # Rasm bazaga base64 matn sifatida emas, omborga xom bayt sifatida yoziladi
+        for obj in objs:
+            if hasattr(obj, 'img_face_key'):
+                try:
+                    offload_field(obj, 'img_face', 'img_face_key')
+                except Exception as e:
+                    logger.error(f"[LogSink] rasmni omborga yozib bo'lmadi: {e}")
+
+    def _save_one_by_one(self, items):
+        saved = []
+        for obj, on_saved in items:
+            try:
+                obj.save(force_insert=True)
+                self._stats['written'] += 1
+                saved.append((obj, on_saved))
+            except Exception as e:
+                self._stats['failed'] += 1
+                logger.error(f"[LogSink] {type(obj).__name__} yozilmadi: {e}")
+        return saved
+
+    def stop(self, timeout: float = 10):
+        """Navbatni yozib tugatib, threadni to'xtatish"""
+        if not self._is_running():
+            self._drain()
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+
+log_sink = LogSink(settings.LOG_SINK_BATCH_SIZE, settings.LOG_SINK_FLUSH_MS)
+atexit.register(log_sink.stop)
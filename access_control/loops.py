@@ -0,0 +1,35 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Generic, List, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class LoopLocal(Generic[T]):
+    """
+    Event loopga bog'langan holat (Queue, Future, Task, asyncio.Lock) uchun saqlovchi:
+    har bir ishlayotgan loop o'z nusxasini oladi, yopilgan looplarning nusxalari tashlanadi.
+    ASGI da bitta doimiy loop bo'ladi; WSGI/async_to_sync da har so'rov yangi loop oladi va
+    boshqa loopdagi obyektlar ishlatilmaydi (region.isapi.AsyncISAPIClient bilan bir xil yondashuv).
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._values: Dict[int, Tuple[asyncio.AbstractEventLoop, T]] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """Joriy loop uchun nusxa (kerak bo'lsa yaratiladi); faqat loop ichida chaqiriladi"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._values.get(id(loop))
+            if entry is None or entry[0] is not loop:
+                for key in [key for key, (other, _) in self._values.items() if other.is_closed()]:
+                    del self._values[key]
+                entry = (loop, self._factory())
+                self._values[id(loop)] = entry
+            return entry[1]
+
+    def values(self) -> List[T]:
+        with self._lock:
+            return [value for loop, value in self._values.values() if not loop.is_closed()]
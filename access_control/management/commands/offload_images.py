@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from access_control.models import NormalUserLog
+from core.image_store import offload_field
+from exam.models import StudentLog
+from face.models import FaceIdentification
+
+# model -> [(base64 maydon, kalit maydon)]
+TARGETS = {
+    'student_log': (StudentLog, [('img_face', 'img_face_key')]),
+    'normal_user_log': (NormalUserLog, [('img_face', 'img_face_key')]),
+    'face_identification': (FaceIdentification, [('first_image', 'first_image_key'),
+                                                 ('second_image', 'second_image_key')]),
+}
+
+
+class Command(BaseCommand):
+    help = "Loglardagi base64 rasmlarni rasm omboriga ko'chirish (id bo'yicha partiyalab)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=list(TARGETS), action='append',
+                            help="Faqat shu jadval(lar)ni ko'chirish")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for name in options['model'] or list(TARGETS):
+            model, fields = TARGETS[name]
+            moved = self._offload(model, fields, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"{name}: {moved} ta rasm ko'chirildi"))
+
+    def _offload(self, model, fields, batch_size: int) -> int:
+        src_fields = [src for src, _ in fields]
+        key_fields = [key for _, key in fields]
+        last_id = 0
+        moved = 0
+        start = time.perf_counter()
+        while True:
+            ids = list(model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            objs = list(model.objects.filter(id__in=ids).only('id', *src_fields, *key_fields))
+            changed = []
+            for obj in objs:
+                if any([offload_field(obj, src, key) for src, key in fields]):
+                    changed.append(obj)
+            with transaction.atomic():
+                model.objects.bulk_update(changed, src_fields + key_fields, batch_size=batch_size)
+            moved += len(changed)
+            self.stdout.write(f"  {model.__name__}: id <= {last_id}, {moved} ta | {time.perf_counter() - start:.1f}s")
+        return moved
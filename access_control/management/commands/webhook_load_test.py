@@ -0,0 +1,142 @@
+import asyncio
+import itertools
+import json
+import statistics
+import time
+import uuid
+
+import aiohttp
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ("Turniket webhookiga parallel Hikvision eventlarini yuborib, "
+            "har bir parallellik darajasida throughput va kechikishni o'lchash")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/v1/access_control/face_event/',
+                            help="Webhook URL")
+        parser.add_argument('--mac', required=True,
+                            help="Turniket MAC manzillari (ExamZoneSwingBar, vergul bilan); so'rovlar ular bo'ylab taqsimlanadi")
+        parser.add_argument('--ip', default='127.0.0.1', help="Eventdagi qurilma IP manzili")
+        parser.add_argument('--employee-no', default='',
+                            help="Student JSHSHIRlari (vergul bilan, navbat bilan ishlatiladi); "
+                                 "berilmasa har bir so'rov uchun alohida raqam yaratiladi")
+        parser.add_argument('--user-type', default='visitor', choices=['visitor', 'normal'])
+        parser.add_argument('--image', help="Eventga qo'shiladigan JPEG fayl")
+        parser.add_argument('--levels', default='1,5,10,25,50,100,200',
+                            help="Parallellik darajalari (vergul bilan)")
+        parser.add_argument('--requests', type=int, default=200, help="Har bir darajada so'rovlar soni")
+        parser.add_argument('--max-p95', type=float, default=1000,
+                            help="p95 kechikish limiti (ms); oshganda test to'xtaydi")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['levels'].split(',')]
+        except ValueError:
+            raise CommandError("--levels faqat sonlardan iborat bo'lishi kerak")
+
+        macs = [mac.strip() for mac in options['mac'].split(',') if mac.strip()]
+        if not macs:
+            raise CommandError("--mac bo'sh bo'lmasligi kerak")
+        employee_nos = [no.strip() for no in options['employee_no'].split(',') if no.strip()]
+
+        image = b''
+        if options['image']:
+            with open(options['image'], 'rb') as f:
+                image = f.read()
+
+        # Har bir so'rov boshqa event bo'lishi kerak, aks holda deduplikator ularni birlashtiradi
+        self._serials = itertools.count(1)
+        self._macs = itertools.cycle(macs)
+        self._employee_nos = itertools.cycle(employee_nos) if employee_nos else None
+        asyncio.run(self._run(levels, image, options))
+
+    def _next_event_ids(self):
+        """(serialNo, employeeNo, macAddress) — har bir so'rov uchun alohida"""
+        serial = next(self._serials)
+        employee_no = next(self._employee_nos) if self._employee_nos else f"{serial:014d}"
+        return serial, employee_no, next(self._macs)
+
+    def _build_body(self, image: bytes, options):
+        boundary = uuid.uuid4().hex
+        serial, employee_no, mac = self._next_event_ids()
+        event = {
+            "ipAddress": options['ip'],
+            "macAddress": mac,
+            "dateTime": timezone.localtime().isoformat(),
+            "eventType": "AccessControllerEvent",
+            "eventState": "active",
+            "AccessControllerEvent": {
+                "doorNo": 1,
+                "name": "load-test",
+                "serialNo": serial,
+                "employeeNoString": employee_no,
+                "userType": options['user_type'],
+            },
+        }
+        parts = [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="AccessControllerEvent"\r\n'
+            f'Content-Type: application/json\r\n\r\n{json.dumps(event)}\r\n'.encode(),
+        ]
+        if image:
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="Picture"; filename="face.jpg"\r\n'
+                f'Content-Type: image/jpeg\r\n\r\n'.encode() + image + b'\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+    async def _run(self, levels, image, options):
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+            for level in levels:
+                result = await self._run_level(session, level, image, options)
+                self.stdout.write(
+                    f"concurrency={level:<4} ok={result['ok']:<5} errors={result['errors']:<4} "
+                    f"rps={result['rps']:8.1f}  p50={result['p50']:7.1f}ms  "
+                    f"p95={result['p95']:7.1f}ms  max={result['max']:7.1f}ms"
+                )
+                if result['errors'] or result['p95'] > options['max_p95']:
+                    self.stdout.write(self.style.WARNING(
+                        f"Parallellik chegarasi: {level} (p95 {result['p95']:.1f}ms, xatolar {result['errors']})"
+                    ))
+                    return
+        self.stdout.write(self.style.SUCCESS(f"Barcha darajalar limit ichida: {levels[-1]} gacha"))
+
+    async def _run_level(self, session, concurrency: int, image: bytes, options):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def _one():
+            nonlocal errors
+            body, content_type = self._build_body(image, options)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with session.post(options['url'], data=body,
+                                            headers={'Content-Type': content_type}) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                            return
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    return
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_one() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            'ok': len(latencies),
+            'errors': errors,
+            'rps': len(latencies) / elapsed if elapsed else 0,
+            'p50': statistics.median(latencies) if latencies else 0,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else 0,
+            'max': latencies[-1] if latencies else 0,
+        }
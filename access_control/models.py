@@ -2,6 +2,7 @@ from auditlog.registry import auditlog
 from django.db import models
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
+from core.image_store import image_src
 from core.models.base import BaseModel
 
 
@@ -33,6 +34,7 @@ class NormalUserLog(BaseModel):
     first_name = models.CharField(max_length=255, blank=True, verbose_name=_("Ism"))
     middle_name = models.CharField(max_length=255, blank=True, verbose_name=_("Sharif"))
     img_face = models.TextField(blank=True, null=True, verbose_name=_("O'tgandagi rasm"))
+    img_face_key = models.CharField(max_length=80, blank=True, null=True, verbose_name=_("O'tgandagi rasm kaliti"))
     door = models.PositiveSmallIntegerField(default=0, verbose_name=_("Kirdi|Chiqdi eshik"))
     pass_time = models.DateTimeField(verbose_name=_("O'tgan vaqt"), blank=True, null=True,)
     ip_address = models.GenericIPAddressField(verbose_name=_("IP address"), blank=True, null=True,)
@@ -49,10 +51,11 @@ class NormalUserLog(BaseModel):
     get_region.short_description = 'Viloyat'
 
     def image_tag(self):
-        if self.img_face:
+        src = image_src(self.img_face_key, self.img_face, variant='admin')
+        if src:
             return format_html(
                 '<img src="{}" style="max-width:100px; max-height:150px;" />',
-                self.img_face
+                src
             )
         return "(No Image)"
 
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from access_control.loops import LoopLocal
+from exam.models import ExamZoneSwingBar
+
+logger = logging.getLogger(__name__)
+
+
+class TurnstileRegistry:
+    """
+    MAC manzil -> faol ExamZoneSwingBar (sb, sb.zone va exam bilan birga) xaritasi.
+    Butun ro'yxat bitta so'rov bilan yuklanadi va process xotirasida saqlanadi;
+    model signallari yoki TTL tugashi bilan qayta yuklanadi. Eskirganda bir vaqtda kelgan
+    so'rovlardan faqat bittasi bazaga boradi, qolganlari uning natijasini kutadi.
+    """
+
+    def __init__(self):
+        self._by_mac: Dict[str, ExamZoneSwingBar] = {}
+        self._loaded_at: Optional[float] = None
+        # Yuklash paytida kelgan invalidate() yo'qolmasligi uchun
+        self._generation = 0
+        self._lock = threading.Lock()
+        # asyncio.Lock loopga bog'lanadi — har bir event loop uchun alohida yaratiladi
+        self._async_locks: LoopLocal[asyncio.Lock] = LoopLocal(asyncio.Lock)
+
+    @staticmethod
+    def _queryset():
+        return ExamZoneSwingBar.objects.filter(
+            status=True,
+            exam__is_finished=False
+        ).select_related('sb', 'sb__zone', 'exam').order_by('id')
+
+    def _build(self, items, generation: int):
+        by_mac = {}
+        for exam_sb in items:
+            # Bir MAC uchun bir nechta yozuv bo'lsa, birinchisi olinadi
+            by_mac.setdefault(exam_sb.sb.mac_address, exam_sb)
+        self._by_mac = by_mac
+        if generation == self._generation:
+            self._loaded_at = time.monotonic()
+        logger.info(f"Turniket registri yuklandi: {len(by_mac)} ta")
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= settings.TURNSTILE_REGISTRY_TTL
+
+    def reload(self):
+        with self._lock:
+            generation = self._generation
+            self._build(list(self._queryset()), generation)
+
+    async def areload(self):
+        generation = self._generation
+        self._build([exam_sb async for exam_sb in self._queryset()], generation)
+
+    def get(self, mac_address: str) -> Optional[ExamZoneSwingBar]:
+        if self._is_stale():
+            with self._lock:
+                # Lock kutilgan paytda boshqa thread yuklab qo'ygan bo'lishi mumkin
+                if self._is_stale():
+                    self._build(list(self._queryset()), self._generation)
+        return self._by_mac.get(mac_address)
+
+    async def aget(self, mac_address: str) -> Optional[ExamZoneSwingBar]:
+        if self._is_stale():
+            async with self._async_locks.get():
+                if self._is_stale():
+                    await self.areload()
+        return self._by_mac.get(mac_address)
+
+    def invalidate(self):
+        self._generation += 1
+        self._loaded_at = None
+
+
+turnstile_registry = TurnstileRegistry()
+
+
+def warm_turnstile_registry_in_background():
+    """ASGI ishga tushganda registrni alohida threadda yuklash"""
+    def _run():
+        try:
+            turnstile_registry.reload()
+        except Exception as e:
+            logger.error(f"Turniket registrini yuklab bo'lmadi: {e}")
+
+    threading.Thread(target=_run, name="turnstile-registry-warmup", daemon=True).start()
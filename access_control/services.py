@@ -1,12 +1,22 @@
 # ============= access_control/services.py =============
 
+import asyncio
 import logging
+import aiohttp
 import requests
 from requests.auth import HTTPDigestAuth
 import xml.etree.ElementTree as ET
 
+from region.isapi import AsyncISAPIClient
+
 logger = logging.getLogger('access_control')
 
+OPEN_DOOR_XML = """<?xml version="1.0" encoding="UTF-8"?>
+                <RemoteControlDoor>
+                    <cmd>open</cmd>
+                </RemoteControlDoor>"""
+OPEN_DOOR_SUCCESS = "<statusCode>1</statusCode>"
+
 
 class BarrierControlService:
     """Hikvision barrier bilan ishlash servisi"""
@@ -28,22 +38,15 @@ class BarrierControlService:
             if approve:
                 url = f"{self.base_url}/ISAPI/AccessControl/RemoteControl/door/{self.door_n}"
 
-                xml_data = """<?xml version="1.0" encoding="UTF-8"?>
-                <RemoteControlDoor>
-                    <cmd>open</cmd>
-                </RemoteControlDoor>"""
-
                 response = requests.put(
                     url,
-                    data=xml_data,
+                    data=OPEN_DOOR_XML,
                     auth=self.auth,
                     headers={'Content-Type': 'application/xml'},
                     timeout=5
                 )
 
-                res_status = "<statusCode>1</statusCode>"
-
-                if response.status_code == 200 and (res_status in response.text):
+                if response.status_code == 200 and (OPEN_DOOR_SUCCESS in response.text):
                     logger.info(f"✅ Barrier opened for request: {request_id}")
                     return True
                 else:
@@ -88,4 +91,39 @@ class BarrierControlService:
             return {
                 'success': False,
                 'error': str(e)
-            }
\ No newline at end of file
+            }
+
+
+class AsyncBarrierControlService:
+    """Hikvision barrier bilan async ishlash (qurilma bo'yicha umumiy ulanishlar puli)"""
+
+    def __init__(self, ip, username, password, door_n):
+        self.door_n = door_n
+        self.client = AsyncISAPIClient.for_device(ip, username, password)
+
+    async def open_door(self, request_id: str = "123") -> bool:
+        try:
+            status_code, text = await self.client.request(
+                'PUT',
+                f"/ISAPI/AccessControl/RemoteControl/door/{self.door_n}",
+                data=OPEN_DOOR_XML,
+                headers={'Content-Type': 'application/xml'},
+            )
+            if status_code == 200 and OPEN_DOOR_SUCCESS in text:
+                logger.info(f"✅ Barrier opened for request: {request_id}")
+                return True
+            logger.error(f"❌ Barrier open failed. Status: {status_code}")
+            return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Barrier communication error: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error in open_door: {e}")
+            return False
+
+    async def send_approval(self, request_id: str = "123", approve: bool = True, reason: str = "") -> bool:
+        if approve:
+            return await self.open_door(request_id)
+        # Rad etish - eshikni ochmaslik kifoya
+        logger.info(f"🚫 Access denied for request: {request_id}. Reason: {reason}")
+        return True
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from access_control.admission import admission_index
+from access_control.registry import turnstile_registry
+from access_control.timetable import shift_timetables
+from exam.models import Exam, ExamShift, ExamZoneSwingBar, Shift, Student
+from region.models import SwingBarrier, Zone
+
+
+@receiver([post_save, post_delete], sender=ExamZoneSwingBar)
+@receiver([post_save, post_delete], sender=SwingBarrier)
+@receiver([post_save, post_delete], sender=Zone)
+@receiver([post_save, post_delete], sender=Exam)
+def turnstile_changed(sender, **kwargs):
+    turnstile_registry.invalidate()
+
+
+@receiver([post_save, post_delete], sender=ExamShift)
+def exam_shift_changed(sender, instance, **kwargs):
+    shift_timetables.invalidate(instance.exam_id)
+
+
+@receiver([post_save, post_delete], sender=Shift)
+def shift_changed(sender, **kwargs):
+    shift_timetables.invalidate()
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, **kwargs):
+    # Chetlatish (exclude_student_view) va boshqa o'zgarishlar kirish indeksiga darhol qo'llanadi
+    admission_index.apply_student(instance)
+    admission_index.bump_version()
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    admission_index.remove_student(instance)
+    admission_index.bump_version()
@@ -0,0 +1,51 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+
+from core.image_store import get_image_store, has_variant, image_src, put_variants
+
+logger = logging.getLogger(__name__)
+
+MONITOR_VARIANT = 'monitor'
+
+_executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+# Navbatdagi ishlar soni cheklangan; to'lib qolsa nusxa yaratilmaydi, so'rov kutib qolmaydi
+_slots = threading.BoundedSemaphore(settings.THUMBNAIL_MAX_PENDING)
+
+
+def _store_variants(key: str, image: bytes):
+    try:
+        put_variants(key, image)
+    except Exception as e:
+        logger.error(f"[thumbnails] {key} nusxalari yaratilmadi: {e}")
+    finally:
+        _slots.release()
+
+
+def submit_capture(image: Optional[bytes]) -> Optional[str]:
+    """
+    Turniket rasmini omborga yozish: asl rasm darhol (monitorga yuborishdan oldin) saqlanadi,
+    faqat kichraytirish fon puliga beriladi. Pul to'la bo'lsa ham asl rasm yo'qolmaydi.
+    """
+    if not image:
+        return None
+    store = get_image_store()
+    try:
+        key = store.put_as(store.make_key(image), image)
+    except Exception as e:
+        logger.error(f"[thumbnails] rasm saqlanmadi: {e}")
+        return None
+    if not _slots.acquire(blocking=False):
+        logger.warning(f"Rasm navbati to'la, {key} nusxalari yaratilmadi")
+        return key
+    _executor.submit(_store_variants, key, image)
+    return key
+
+
+def monitor_image_url(key: Optional[str]) -> str:
+    """monitor nusxasi hali tayyor bo'lmasa asl rasm havolasi qaytadi (omborga so'rovsiz)"""
+    ready = bool(key) and has_variant(key, MONITOR_VARIANT, check_store=False)
+    return image_src(key, variant=MONITOR_VARIANT if ready else None) or ''
@@ -0,0 +1,88 @@
+import datetime
+import threading
+import time
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from exam.models import ExamShift
+
+
+class ShiftTimetable:
+    """
+    Bitta tadbirning smena jadvali, oldindan kesishmaydigan segmentlarga kompilyatsiya qilingan.
+    Har bir chegara nuqtasi va undan keyingi oraliq uchun ochiq smena oldindan aniqlanadi,
+    shuning uchun "t vaqtda qaysi smena ochiq" bitta bisect bilan topiladi.
+    Bir nechta smena kesishsa, eng kichik raqamli smena olinadi (avvalgi chiziqli qidiruv kabi).
+    """
+
+    def __init__(self, intervals: List[Tuple[datetime.time, datetime.time, int, str]]):
+        # intervals: (access_time, expire_time, sm_number, sm_name)
+        intervals = sorted(intervals, key=lambda item: item[2])
+        self.names: Dict[int, str] = {number: name for _, _, number, name in intervals}
+
+        self._points = sorted({t for access, expire, _, _ in intervals for t in (access, expire)})
+        self._at_point: List[Optional[int]] = []
+        self._after_point: List[Optional[int]] = []
+        for i, point in enumerate(self._points):
+            next_point = self._points[i + 1] if i + 1 < len(self._points) else None
+            self._at_point.append(next(
+                (number for access, expire, number, _ in intervals if access <= point <= expire), None))
+            self._after_point.append(None if next_point is None else next(
+                (number for access, expire, number, _ in intervals if access <= point and next_point <= expire), None))
+
+    def current_shift(self, current_time: datetime.time) -> Optional[int]:
+        i = bisect_right(self._points, current_time) - 1
+        if i < 0:
+            return None
+        if self._points[i] == current_time:
+            return self._at_point[i]
+        return self._after_point[i]
+
+    def shift_name(self, number: int) -> Optional[str]:
+        return self.names.get(number)
+
+
+class ShiftTimetableCache:
+    """Tadbir bo'yicha kompilyatsiya qilingan jadvallar; ExamShift o'zgarsa yoki TTL tugasa qayta yuklanadi"""
+
+    def __init__(self):
+        self._entries: Dict[int, Tuple[ShiftTimetable, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _queryset(exam_id: int):
+        return ExamShift.objects.filter(exam_id=exam_id).select_related('sm').values_list(
+            'access_time', 'expire_time', 'sm__number', 'sm__name')
+
+    def _fresh(self, exam_id: int) -> Optional[ShiftTimetable]:
+        entry = self._entries.get(exam_id)
+        if entry is None or time.monotonic() - entry[1] >= settings.SHIFT_TIMETABLE_TTL:
+            return None
+        return entry[0]
+
+    def _store(self, exam_id: int, intervals) -> ShiftTimetable:
+        timetable = ShiftTimetable(list(intervals))
+        with self._lock:
+            self._entries[exam_id] = (timetable, time.monotonic())
+        return timetable
+
+    def get(self, exam_id: int) -> ShiftTimetable:
+        return self._fresh(exam_id) or self._store(exam_id, self._queryset(exam_id))
+
+    async def aget(self, exam_id: int) -> ShiftTimetable:
+        timetable = self._fresh(exam_id)
+        if timetable is None:
+            timetable = self._store(exam_id, [row async for row in self._queryset(exam_id)])
+        return timetable
+
+    def invalidate(self, exam_id: int = None):
+        with self._lock:
+            if exam_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(exam_id, None)
+
+
+shift_timetables = ShiftTimetableCache()
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from access_control.views import (
-    HikvisionWebhookView, student_access_monitor, TurnstileListView, ActiveExamListView, ZoneListView
+    HikvisionWebhookView, student_access_monitor, student_photo, LogSinkStatsView, WebhookStatsView, TurnstileListView, ActiveExamListView, ZoneListView
 )
 
 urlpatterns = [
@@ -9,4 +9,7 @@ urlpatterns = [
     path('zone-list/', ZoneListView.as_view(), name='zone-list'),
     path('turnstile-list/', TurnstileListView.as_view(), name='turnstile-list'),
     path('monitor/', student_access_monitor, name='student-monitor'),
+    path('student-photo/<str:token>/', student_photo, name='student-photo'),
+    path('log-sink-stats/', LogSinkStatsView.as_view(), name='log-sink-stats'),
+    path('webhook-stats/', WebhookStatsView.as_view(), name='webhook-stats'),
 ]
\ No newline at end of file
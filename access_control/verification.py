@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Navbatdagi + bajarilayotgan tekshiruvlar soni cheklangan, ortiqchasi tashlab yuboriladi
+_slots = threading.BoundedSemaphore(settings.FACE_VERIFICATION_MAX_PENDING)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.FACE_VERIFICATION_WORKERS,
+                    thread_name_prefix="face-verify",
+                )
+    return _executor
+
+
+def submit_verification(log_id: int, student, live_image: bytes, turnstile_id) -> bool:
+    """
+    Turniket rasmini passport embeddingi bilan solishtirishni fonga yuborish.
+    Eshik ochish qarori bu natijani kutmaydi.
+    """
+    if not settings.FACE_VERIFICATION_ENABLED or not log_id or not live_image or student is None:
+        return False
+
+    if not _slots.acquire(blocking=False):
+        logger.warning(f"Yuz tekshiruvi navbati to'la, log #{log_id} o'tkazib yuborildi")
+        return False
+
+    deadline = time.monotonic() + settings.FACE_VERIFICATION_BUDGET_MS / 1000
+    try:
+        _get_executor().submit(_verify, log_id, student, live_image, turnstile_id, deadline)
+    except RuntimeError:
+        _slots.release()
+        return False
+    return True
+
+
+def _stored_embedding(student):
+    """Passport embeddingi: avval smena matritsasidan, bo'lmasa bazadan"""
+    from exam.models import StudentPsData
+    from face.matrix_cache import shift_matrix_cache
+
+    embedding = shift_matrix_cache.get_embedding(student)
+    if embedding is not None:
+        return embedding
+    return StudentPsData.objects.filter(student_id=student.id, embedding__isnull=False).values_list(
+        'embedding', flat=True).first()
+
+
+def _verify(log_id: int, student, live_image: bytes, turnstile_id, deadline: float):
+    from exam.models import StudentLog
+    from face.face_embedder import FaceEmbedder
+
+    try:
+        if time.monotonic() > deadline:
+            logger.warning(f"Yuz tekshiruvi kechikdi (navbatda), log #{log_id}")
+            return
+
+        stored = _stored_embedding(student)
+        if stored is None:
+            return
+
+        face_embedder = FaceEmbedder()
+        live = face_embedder.get_embedding(face_embedder.decode_bytes(live_image))
+        if live is None:
+            score = 0
+        else:
+            score = max(face_embedder.compare_faces(live, stored), 0)
+
+        if time.monotonic() > deadline:
+            logger.warning(f"Yuz tekshiruvi vaqt limitidan oshdi, log #{log_id}: {score}%")
+            return
+
+        requires_verification = score < settings.FACE_MATCH_THRESHOLD
+        StudentLog.objects.filter(id=log_id).update(accuracy=score, requires_verification=requires_verification)
+        _send_verification_message(turnstile_id, {
+            'log_id': log_id,
+            'student_id': student.id,
+            'accuracy': score,
+            'requires_verification': requires_verification,
+        })
+    except Exception as e:
+        logger.error(f"[face_verification] log #{log_id}: {e}")
+    finally:
+        close_old_connections()
+        _slots.release()
+
+
+def _send_verification_message(turnstile_id, data):
+    if not turnstile_id:
+        return
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            f'turnstile_{turnstile_id}',
+            {
+                'type': 'face_verification_event',
+                'data': data
+            }
+        )
+    except Exception as e:
+        logger.error(f"WebSocket yuborishda xatolik: {str(e)}")
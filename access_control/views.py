@@ -1,71 +1,154 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
+from django.conf import settings
+from django.core import signing
+from django.db.models import BooleanField, Case, Value, When
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 import logging
+import re
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 import json
 import base64
-import datetime
 from django.utils import timezone
-from email import message_from_bytes
-from email.policy import default
 
 from supervisor.models import Supervisor, EventSupervisor
 from access_control.models import NormalUserLog
-from access_control.utils import resize_base64_image
+from access_control.admission import admission_index, AdmissionFacts
+from access_control.dedup import event_deduplicator
+from access_control.lanes import turnstile_lanes, LaneFull, LaneTimeout
+from access_control.log_sink import log_sink
+from access_control.registry import turnstile_registry
+from access_control.services import AsyncBarrierControlService
+from access_control.timetable import shift_timetables
+from access_control.hikvision import parse_access_event
+from access_control.thumbnails import submit_capture, monitor_image_url
+from access_control.verification import submit_verification
 from exam.models import ExamZoneSwingBar, StudentLog, Exam
 from region.models import Region, Zone
 
 logger = logging.getLogger(__name__)
 
+STUDENT_PHOTO_SALT = 'access_control.student_photo'
+
 
 def student_access_monitor(request):
     """Student access monitor page"""
     return render(request, 'access_control/monitor_page.html')
 
 
-class HikvisionWebhookView(APIView):
-    authentication_classes = []
-    permission_classes = []
+def student_photo_url(student_id):
+    """Monitor sahifasi uchun student rasmining imzolangan havolasi"""
+    token = signing.dumps(student_id, salt=STUDENT_PHOTO_SALT)
+    return reverse('student-photo', kwargs={'token': token})
+
+
+def student_photo(request, token):
+    """Imzolangan havola bo'yicha student passport rasmini qaytarish"""
+    from exam.models import StudentPsData
+
+    try:
+        student_id = signing.loads(token, salt=STUDENT_PHOTO_SALT, max_age=settings.STUDENT_PHOTO_URL_MAX_AGE)
+    except signing.BadSignature:
+        raise Http404
+
+    img_b64 = StudentPsData.objects.filter(student_id=student_id).values_list('img_b64', flat=True).first()
+    if not img_b64:
+        raise Http404
+
+    header, _, encoded = img_b64.rpartition(',')
+    match = re.match(r"^data:(image/\w+);base64$", header)
+    response = HttpResponse(base64.b64decode(encoded), content_type=match.group(1) if match else 'image/jpeg')
+    response['Cache-Control'] = f'private, max-age={settings.STUDENT_PHOTO_URL_MAX_AGE}'
+    return response
 
-    def post(self, request):
+
+@method_decorator(csrf_exempt, name='dispatch')
+class HikvisionWebhookView(View):
+    """
+    Hikvision webhook (async). ORM so'rovlari, eshik ochish va WebSocket xabari
+    event loopda bajariladi, har bir event uchun alohida thread band qilinmaydi.
+
+    Faqat ASGI (config.asgi) orqali xizmat qilinishi kerak: turniket navbatlari, deduplikatsiya
+    va registr lock'i bitta doimiy event loopga bog'langan. WSGI da har so'rov yangi loopda
+    bajariladi — holat loop bo'yicha ajratilgani uchun xato bermaydi, lekin bitta turniket
+    eventlarining ketma-ketligi va takrorlarni birlashtirish ishlamaydi.
+    """
+    _wsgi_warned = False
+
+    def _warn_if_not_asgi(self, request):
+        if not HikvisionWebhookView._wsgi_warned and not hasattr(request, 'scope'):
+            HikvisionWebhookView._wsgi_warned = True
+            logger.warning("Webhook ASGI da ishlamayapti: navbat va deduplikatsiya har so'rov uchun alohida bo'ladi")
+
+    async def post(self, request):
         """Hikvision webhook handler with WebSocket broadcast"""
+        self._warn_if_not_asgi(request)
         try:
             # Webhook ma'lumotlarini parse qilish
-            parsed_data = self._parse_webhook_data(request)
+            parsed_data = await self._parse_webhook_data(request)
             if not parsed_data:
                 return self._error_response("Kamera oldida shaxs topilmadi!")
 
+            # Bir odam uchun qisqa vaqtda takror kelgan eventlar bitta qarorga birlashtiriladi
+            key = (parsed_data.mac_address, parsed_data.employee_no, parsed_data.door_no)
+            # Bitta turniket eventlari o'z navbatida ketma-ket qayta ishlanadi
+            (content, status_code), is_duplicate = await event_deduplicator.run(
+                key, lambda: turnstile_lanes.submit(parsed_data.mac_address, lambda: self._handle_event(parsed_data)))
+            if is_duplicate:
+                logger.debug(f"Takroriy event: {key}")
+            return HttpResponse(content, status=status_code, content_type='application/json')
+        except LaneFull:
+            return JsonResponse({
+                'status': 'error',
+                'message': "Turniket navbati to'la"
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except LaneTimeout:
+            return self._error_response("Turniket navbatida kutish vaqti tugadi")
+        except Exception as e:
+            logger.exception(f"Webhook xatolik: {str(e)}")
+            return self._error_response(f"Tizim xatoligi: {str(e)}")
+
+    async def _handle_event(self, parsed_data):
+        """Eventni qayta ishlash; javob (tana, status) ko'rinishida qaytadi, takrorlarga ham beriladi"""
+        response = await self._process_event(parsed_data)
+        return response.content, response.status_code
+
+    async def _process_event(self, parsed_data):
+        try:
             # Turniketni tekshirish
-            turnstile_result = self._validate_turnstile(parsed_data)
+            turnstile_result = await self._validate_turnstile(parsed_data)
             if turnstile_result['error']:
-                self._send_websocket_error(0, parsed_data, turnstile_result['message'])
+                await self._send_websocket_error(0, parsed_data, turnstile_result['message'])
                 return self._error_response(turnstile_result['message'])
 
             exam_sb = turnstile_result['exam_sb']
             turnstile_id = exam_sb.sb.id
 
-            shift_number = self._get_current_shift(exam_sb.exam, parsed_data['datetime'])
+            shift_number = await self._get_current_shift(exam_sb.exam, parsed_data.datetime)
             if not shift_number:
                 message = "Hozir kirish vaqti emas!"
-                self._send_websocket_error(turnstile_id, parsed_data, message)
+                await self._send_websocket_error(turnstile_id, parsed_data, message)
                 return self._error_response(message)
 
-            if parsed_data['user_type'] == 'visitor':
+            if parsed_data.user_type == 'visitor':
                 # Talabani tekshirish va ruxsat berish
-                return self._process_student_access(
+                return await self._process_student_access(
                     exam_sb,
                     turnstile_id,
                     shift_number,
                     parsed_data
                 )
             # Faqat staff yoki nazoratchi uchun tekshirish
-            if parsed_data['user_type'] == "normal":
-                print(f"Normal user keldi: {parsed_data.get('name')}")
-                logger.info(f"Normal user keldi: {parsed_data.get('name')}")
-                return self._process_normal_user_access(
+            if parsed_data.user_type == "normal":
+                logger.info(f"Normal user keldi: {parsed_data.name}")
+                return await self._process_normal_user_access(
                     exam_sb,
                     turnstile_id,
                     shift_number,
@@ -78,69 +161,27 @@ class HikvisionWebhookView(APIView):
             return self._error_response(f"Tizim xatoligi: {str(e)}")
 
     @staticmethod
-    def _parse_webhook_data(request):
+    async def _parse_webhook_data(request):
         """Webhook ma'lumotlarini parse qilish"""
         try:
-            raw_data = request.body
-            content_type = request.content_type or ''
-
-            msg = message_from_bytes(
-                b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + raw_data,
-                policy=default
-            )
-            data = {}
-            for part in msg.iter_parts():
-                content_disposition = part.get('Content-Disposition', '')
-
-                if 'name="AccessControllerEvent"' in content_disposition:
-                    json_data = part.get_content()
-                    data_dict = json.loads(json_data)
-
-                    # Faqat active AccessControllerEvent ni qayta ishlash
-                    if (data_dict.get("eventState") != "active" or
-                            data_dict.get("eventType") != "AccessControllerEvent"):
-                        return None
-
-                    event = data_dict.get('AccessControllerEvent', {})
-
-                    # Datetime ni to'g'ri parse qilish
-                    dt = datetime.datetime.fromisoformat(data_dict["dateTime"])
-                    if dt.tzinfo:
-                        dt = dt.astimezone(timezone.get_current_timezone()).replace(tzinfo=None)
-                    else:
-                        dt = dt.replace(tzinfo=None)
-                    data = {
-                        'ip_address': data_dict.get("ipAddress"),
-                        'mac_address': data_dict.get("macAddress"),
-                        'door_no': event.get("doorNo"),
-                        'datetime': dt,
-                        'name': event.get("name", ""),
-                        'employee_no': event.get("employeeNoString", ""),
-                        'user_type': event.get("userType", ""),
-                    }
-                elif 'name="Picture"' in content_disposition:
-                    image_data = part.get_content()
-                    base64_string = base64.b64encode(image_data).decode('utf-8')
-                    base64_string = resize_base64_image(base64_string)
-                    data['live_image'] = base64_string
-            return data
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            # boundary parametri bilan to'liq Content-Type kerak
+            event = parse_access_event(request.body, request.META.get('CONTENT_TYPE', ''))
+            if event is None:
+                return None
+
+            # Asl rasm shu yerda saqlanadi, nusxalari esa fon pulida yaratiladi
+            event.image_key = await sync_to_async(submit_capture, thread_sensitive=False)(event.image)
+            return event
+        except (json.JSONDecodeError, KeyError, ValueError, OSError) as e:
             logger.error(f"Parse xatolik: {str(e)}")
             return None
 
     @staticmethod
-    def _validate_turnstile(parsed_data):
-        """Turniketni tekshirish"""
-        from exam.models import ExamZoneSwingBar
-
-        mac_address = parsed_data['mac_address']
-        exam_sb_objects = ExamZoneSwingBar.objects.filter(
-            sb__mac_address=mac_address,
-            status=True,
-            exam__is_finished=False
-        ).select_related('sb', 'sb__zone', 'exam')
-
-        if not exam_sb_objects.exists():
+    async def _validate_turnstile(parsed_data):
+        """Turniketni tekshirish (registr xotirasidan, bazaga so'rovsiz)"""
+        exam_sb = await turnstile_registry.aget(parsed_data.mac_address)
+
+        if exam_sb is None:
             return {
                 'error': True,
                 'message': 'Bu turniket topilmadi!',
@@ -150,48 +191,110 @@ class HikvisionWebhookView(APIView):
         return {
             'error': False,
             'message': None,
-            'exam_sb': exam_sb_objects.first()
+            'exam_sb': exam_sb
         }
 
     @staticmethod
-    def _get_current_shift(exam, current_datetime):
-        """Joriy shift raqamini aniqlash"""
-        from exam.models import ExamShift
+    async def _get_current_shift(exam, current_datetime):
+        """Joriy shift raqamini aniqlash (kompilyatsiya qilingan jadval bo'yicha)"""
+        timetable = await shift_timetables.aget(exam.id)
+        return timetable.current_shift(current_datetime.time())
 
-        shift_objects = ExamShift.objects.filter(
-            exam=exam
-        ).select_related('sm').order_by('sm__number')
+    @staticmethod
+    def _direction(door_no):
+        return 'entry' if door_no == 1 else 'exit' if door_no == 2 else 'unknown'
+
+    @classmethod
+    def _build_student_log(cls, student, parsed_data, log_status):
+        return StudentLog(
+            student_id=student.id,
+            door=parsed_data.door_no,
+            ip_address=parsed_data.ip_address,
+            mac_address=parsed_data.mac_address,
+            employee_no=parsed_data.employee_no,
+            direction=cls._direction(parsed_data.door_no),
+            requires_verification=True,
+            img_face_key=parsed_data.image_key,
+            status=log_status,
+            pass_time=parsed_data.datetime
+        )
 
-        current_date = current_datetime.date()
-        current_time = current_datetime.time()
+    @classmethod
+    def _build_normal_user_log(cls, e_supervisor, normal_user, exam_sb, parsed_data, log_status):
+        return NormalUserLog(
+            normal_user_id=e_supervisor.id,
+            normal_user_type=normal_user.supervisor.role,
+            zone=exam_sb.sb.zone,
+            employee_no=parsed_data.employee_no,
+            last_name=normal_user.supervisor.last_name,
+            first_name=normal_user.supervisor.first_name,
+            middle_name=normal_user.supervisor.middle_name,
+            img_face_key=parsed_data.image_key,
+            door=parsed_data.door_no,
+            pass_time=parsed_data.datetime,
+            ip_address=parsed_data.ip_address,
+            mac_address=parsed_data.mac_address,
+            direction=cls._direction(parsed_data.door_no),
+            status=log_status,
+        )
 
-        for shift in shift_objects:
-            # Vaqtni to'g'ri solishtirish
-            if shift.access_time <= current_time <= shift.expire_time:
-                return shift.sm.number
+    @classmethod
+    def _create_student_log(cls, student, parsed_data, log_status, turnstile_id):
+        """StudentLog ni write-behind navbatga qo'yish; yozilgach yuz tekshiruviga yuboriladi"""
+        live_image = parsed_data.image
+        log_sink.enqueue(
+            cls._build_student_log(student, parsed_data, log_status),
+            on_saved=lambda log: submit_verification(log.id, student, live_image, turnstile_id),
+        )
 
-        return None
+    @classmethod
+    def _create_normal_user_log(cls, e_supervisor, normal_user, exam_sb, parsed_data, log_status):
+        """NormalUserLog ni write-behind navbatga qo'yish"""
+        log_sink.enqueue(cls._build_normal_user_log(e_supervisor, normal_user, exam_sb, parsed_data, log_status))
 
-    def _process_student_access(self, exam_sb, turnstile_id, shift_number, parsed_data):
+    @staticmethod
+    async def _find_student(exam, employee_no, current_date, shift_number):
+        """
+        Talabani bitta so'rov bilan topish: joriy smenadagi yozuv birinchi keladi,
+        bo'lmasa shu tadbirdagi boshqa smena yozuvi qaytadi (is_current_shift=False).
+        """
+        from exam.models import Student
+
+        return await Student.objects.filter(
+            exam=exam, imei=employee_no
+        ).select_related('exam', 'zone').annotate(
+            is_current_shift=Case(
+                When(e_date=current_date, sm=shift_number, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        ).order_by('-is_current_shift', 'id').afirst()
+
+    async def _lookup_student(self, exam_sb, employee_no, current_date, shift_number):
+        """
+        Avval smena indeksidan (bazasiz), topilmasa bazadan qidirish.
+        (AdmissionFacts | None, joriy smenadami) qaytaradi.
+        """
+        # Boshqa processdagi chetlatish va o'zgarishlar (versiya kaliti orqali)
+        await admission_index.aensure_current()
+        facts = admission_index.lookup(exam_sb.exam_id, current_date, shift_number, employee_no)
+        if facts is not None:
+            return facts, True
+
+        student = await self._find_student(exam_sb.exam, employee_no, current_date, shift_number)
+        if student is None:
+            return None, False
+        zone_name = student.zone.name if student.zone else ''
+        return AdmissionFacts.from_student(student, zone_name=zone_name), student.is_current_shift
+
+    async def _process_student_access(self, exam_sb, turnstile_id, shift_number, parsed_data):
         """Talabaning kirishini qayta ishlash"""
-        from exam.models import Student, StudentPsData, ExamShift
-
-        current_date = parsed_data['datetime'].date()
-        employee_no = parsed_data['employee_no']
+        current_date = parsed_data.datetime.date()
+        employee_no = parsed_data.employee_no
 
         # Talabani topish
-        try:
-            student = Student.objects.select_related(
-                'exam', 'zone'
-            ).get(
-                exam=exam_sb.exam,
-                imei=employee_no,
-                e_date=current_date,
-                sm=shift_number
-            )
-        except Student.DoesNotExist:
-            queryset = Student.objects.filter(exam=exam_sb.exam, imei=employee_no).order_by('id')
-
+        student, is_current_shift = await self._lookup_student(exam_sb, employee_no, current_date, shift_number)
+        if not is_current_shift:
             ws_data = {
                 'status': 'error',
                 'access_granted': False,
@@ -203,46 +306,19 @@ class HikvisionWebhookView(APIView):
                 'timestamp': timezone.now().isoformat()
             }
             message = 'Joriy smenada topilmadi!'
-            if not queryset.exists():
+            if student is None:
                 message = 'Bu testda topilmadi!'
                 ws_data['message'] = message
             else:
-                student = queryset.first()
-                student_ps_data = StudentPsData.objects.get(student=student)
                 ws_data['message'] = message
-                ws_data['student'] = self._get_student_info(student, student_ps_data, f"{student.sm}-smena")
-
-                try:
-                    StudentLog.objects.create(
-                        student=student,
-                        door=parsed_data['door_no'],
-                        ip_address=parsed_data['ip_address'],
-                        mac_address=parsed_data['mac_address'],
-                        employee_no=parsed_data['employee_no'],
-                        direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data[
-                                                                                            'door_no'] == 2 else 'unknown',
-                        requires_verification=True,
-                        img_face=parsed_data['live_image'],
-                        status='denied',
-                        pass_time=parsed_data['datetime']
-                    )
-                except Exception as e:
-                    print(e)
-
-            self._send_websocket_message(turnstile_id, ws_data)
+                ws_data['student'] = self._get_student_info(student, f"{student.sm}-smena")
+                self._create_student_log(student, parsed_data, 'denied', turnstile_id)
+
+            await self._send_websocket_message(turnstile_id, ws_data)
             return self._error_response(message)
 
         # Shift nomini olish
-        shift_name = ExamShift.objects.get(
-            exam=exam_sb.exam,
-            sm__number=shift_number
-        ).sm.name
-
-        # Talaba ma'lumotlarini olish
-        try:
-            student_ps_data = StudentPsData.objects.get(student=student)
-        except StudentPsData.DoesNotExist:
-            student_ps_data = None
+        shift_name = (await shift_timetables.aget(exam_sb.exam_id)).shift_name(shift_number)
 
         # Tekshiruvlar
         is_same_zone = (student.zone_id == exam_sb.sb.zone_id)
@@ -250,78 +326,35 @@ class HikvisionWebhookView(APIView):
 
         # Ruxsat berish shartlari
         if is_same_zone and is_not_cheating:
-            is_opened = self._grant_access(
-                exam_sb, turnstile_id, student,
-                student_ps_data, shift_name, parsed_data
+            is_opened = await self._grant_access(
+                exam_sb, turnstile_id, student, shift_name, parsed_data
             )
             if is_opened:
-                try:
-                    StudentLog.objects.create(
-                        student=student,
-                        door=parsed_data['door_no'],
-                        ip_address=parsed_data['ip_address'],
-                        mac_address=parsed_data['mac_address'],
-                        employee_no=parsed_data['employee_no'],
-                        direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data['door_no'] == 2 else 'unknown',
-                        requires_verification=True,
-                        img_face=parsed_data['live_image'],
-                        status='approved',
-                        pass_time=parsed_data['datetime']
-                    )
-                except Exception as e:
-                    print(e)
+                self._create_student_log(student, parsed_data, 'approved', turnstile_id)
                 return self._success_response()
             else:
-                try:
-                    StudentLog.objects.create(
-                        student=student,
-                        door=parsed_data['door_no'],
-                        ip_address=parsed_data['ip_address'],
-                        mac_address=parsed_data['mac_address'],
-                        employee_no=parsed_data['employee_no'],
-                        direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data['door_no'] == 2 else 'unknown',
-                        requires_verification=True,
-                        img_face=parsed_data['live_image'],
-                        status='not_open',
-                        pass_time=parsed_data['datetime']
-                    )
-                except Exception as e:
-                    print(e)
+                self._create_student_log(student, parsed_data, 'not_open', turnstile_id)
                 return self._error_response("Eshik ochilmadi")
         else:
-            try:
-                StudentLog.objects.create(
-                    student=student,
-                    door=parsed_data['door_no'],
-                    ip_address=parsed_data['ip_address'],
-                    mac_address=parsed_data['mac_address'],
-                    employee_no=parsed_data['employee_no'],
-                    direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data[
-                                                                                        'door_no'] == 2 else 'unknown',
-                    requires_verification=True,
-                    img_face=parsed_data['live_image'],
-                    status='denied',
-                    pass_time=parsed_data['datetime']
-                )
-            except Exception as e:
-                print(e)
-
-            return self._deny_access(
-                turnstile_id, student, student_ps_data,
-                shift_name, parsed_data, is_same_zone, is_not_cheating
+            self._create_student_log(student, parsed_data, 'denied', turnstile_id)
+            return await self._deny_access(
+                turnstile_id, student, shift_name, parsed_data, is_same_zone, is_not_cheating
             )
 
-    def _process_normal_user_access(self, exam_sb, turnstile_id, shift_number, parsed_data):
+    async def _process_normal_user_access(self, exam_sb, turnstile_id, shift_number, parsed_data):
         """Normal user kirishini qayta ishlash"""
-        employee_no = parsed_data['employee_no']
-        current_datetime = parsed_data['datetime']
+        employee_no = parsed_data.employee_no
+        current_datetime = parsed_data.datetime
         current_date = current_datetime.date()
         exam = exam_sb.exam
 
-        e_supervisor_queryset = EventSupervisor.objects.filter(supervisor__imei=employee_no, exam=exam, supervisor__status=True)
+        e_supervisor_queryset = EventSupervisor.objects.filter(
+            supervisor__imei=employee_no, exam=exam, supervisor__status=True
+        ).select_related('supervisor', 'zone', 'zone__region')
         role = 'unknown'
 
-        if not e_supervisor_queryset.exists():
+        normal_user = await e_supervisor_queryset.afirst()
+        if normal_user is None:
             message = "Siz topilmadingiz!"
             ws_data = {
                 'status': 'error',
@@ -336,88 +369,27 @@ class HikvisionWebhookView(APIView):
                 'timestamp': timezone.now().isoformat()
             }
 
-            self._send_websocket_message(turnstile_id, ws_data)
+            await self._send_websocket_message(turnstile_id, ws_data)
             return self._error_response(message)
 
-        normal_user = e_supervisor_queryset.first()
-
         if normal_user.supervisor.role == 'supervisor':
-            q_supervisor = e_supervisor_queryset.filter(test_date=current_date, sm=shift_number)
-            if q_supervisor.exists():
-                supervisor_ob = q_supervisor.first()
-
-                is_opened = self._grant_access_normal_user(
+            supervisor_ob = await e_supervisor_queryset.filter(test_date=current_date, sm=shift_number).afirst()
+            if supervisor_ob is not None:
+                is_opened = await self._grant_access_normal_user(
                     exam_sb, turnstile_id, supervisor_ob, parsed_data
                 )
 
                 supervisor_ob.is_participated = True
-                supervisor_ob.save()
+                await supervisor_ob.asave()
 
                 if is_opened:
-                    try:
-                        NormalUserLog.objects.create(
-                            normal_user_id=supervisor_ob.id,
-                            normal_user_type=normal_user.supervisor.role,
-                            zone = exam_sb.sb.zone,
-                            employee_no=employee_no,
-                            last_name=normal_user.supervisor.last_name,
-                            first_name=normal_user.supervisor.first_name,
-                            middle_name=normal_user.supervisor.middle_name,
-                            img_face=parsed_data['live_image'],
-                            door=parsed_data['door_no'],
-                            pass_time=parsed_data['datetime'],
-                            ip_address=parsed_data['ip_address'],
-                            mac_address=parsed_data['mac_address'],
-                            direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data[
-                                                                                                'door_no'] == 2 else 'unknown',
-                            status='approved',
-                        )
-                    except Exception as e:
-                        print(e)
+                    self._create_normal_user_log(supervisor_ob, normal_user, exam_sb, parsed_data, 'approved')
                     return self._success_response()
                 else:
-                    try:
-                        NormalUserLog.objects.create(
-                            normal_user_id=normal_user.id,
-                            normal_user_type=normal_user.supervisor.role,
-                            zone = exam_sb.sb.zone,
-                            employee_no=employee_no,
-                            last_name=normal_user.supervisor.last_name,
-                            first_name=normal_user.supervisor.first_name,
-                            middle_name=normal_user.supervisor.middle_name,
-                            img_face=parsed_data['live_image'],
-                            door=parsed_data['door_no'],
-                            pass_time=parsed_data['datetime'],
-                            ip_address=parsed_data['ip_address'],
-                            mac_address=parsed_data['mac_address'],
-                            direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data[
-                                                                                                'door_no'] == 2 else 'unknown',
-                            status='not_open',
-                        )
-                    except Exception as e:
-                        print(e)
+                    self._create_normal_user_log(normal_user, normal_user, exam_sb, parsed_data, 'not_open')
                     return self._error_response("Eshik ochilmadi")
             else:
-                try:
-                    NormalUserLog.objects.create(
-                        normal_user_id=normal_user.id,
-                        normal_user_type=normal_user.supervisor.role,
-                        zone = exam_sb.sb.zone,
-                        employee_no=employee_no,
-                        last_name=normal_user.supervisor.last_name,
-                        first_name=normal_user.supervisor.first_name,
-                        middle_name=normal_user.supervisor.middle_name,
-                        img_face=parsed_data['live_image'],
-                        door=parsed_data['door_no'],
-                        pass_time=parsed_data['datetime'],
-                        ip_address=parsed_data['ip_address'],
-                        mac_address=parsed_data['mac_address'],
-                        direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data[
-                                                                                            'door_no'] == 2 else 'unknown',
-                        status='not_open',
-                    )
-                except Exception as e:
-                    print(e)
+                self._create_normal_user_log(normal_user, normal_user, exam_sb, parsed_data, 'not_open')
 
                 ws_data = {
                     'status': 'error',
@@ -429,76 +401,38 @@ class HikvisionWebhookView(APIView):
                     'message': '',
                     'timestamp': timezone.now().isoformat()
                 }
-                self._send_websocket_message(turnstile_id, ws_data)
+                await self._send_websocket_message(turnstile_id, ws_data)
                 return self._error_response("Eshik ochilmadi")
         elif normal_user.supervisor.role == 'staff':
-            is_opened = self._grant_access_normal_user(
+            is_opened = await self._grant_access_normal_user(
                 exam_sb, turnstile_id, normal_user, parsed_data
             )
 
             normal_user.is_participated = True
-            normal_user.save()
+            await normal_user.asave()
 
             if is_opened:
-                try:
-                    NormalUserLog.objects.create(
-                        normal_user_id=normal_user.id,
-                        normal_user_type=normal_user.supervisor.role,
-                        zone = exam_sb.sb.zone,
-                        employee_no = employee_no,
-                        last_name = normal_user.supervisor.last_name,
-                        first_name = normal_user.supervisor.first_name,
-                        middle_name = normal_user.supervisor.middle_name,
-                        img_face=parsed_data['live_image'],
-                        door=parsed_data['door_no'],
-                        pass_time=parsed_data['datetime'],
-                        ip_address=parsed_data['ip_address'],
-                        mac_address=parsed_data['mac_address'],
-                        direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data['door_no'] == 2 else 'unknown',
-                        status='approved',
-                    )
-                except Exception as e:
-                    print(e)
+                self._create_normal_user_log(normal_user, normal_user, exam_sb, parsed_data, 'approved')
                 return self._success_response()
             else:
-                try:
-                    NormalUserLog.objects.create(
-                        normal_user_id=normal_user.id,
-                        normal_user_type=normal_user.supervisor.role,
-                        zone = exam_sb.sb.zone,
-                        employee_no=employee_no,
-                        last_name=normal_user.supervisor.last_name,
-                        first_name=normal_user.supervisor.first_name,
-                        middle_name=normal_user.supervisor.middle_name,
-                        img_face=parsed_data['live_image'],
-                        door=parsed_data['door_no'],
-                        pass_time=parsed_data['datetime'],
-                        ip_address=parsed_data['ip_address'],
-                        mac_address=parsed_data['mac_address'],
-                        direction='entry' if parsed_data['door_no'] == 1 else 'exit' if parsed_data[
-                                                                                            'door_no'] == 2 else 'unknown',
-                        status='not_open',
-                    )
-                except Exception as e:
-                    print(e)
+                self._create_normal_user_log(normal_user, normal_user, exam_sb, parsed_data, 'not_open')
                 return self._error_response("Eshik ochilmadi")
-        else:
-            pass
+        return self._error_response("Noma'lum foydalanuvchi turi!")
 
-
-    def _grant_access(self, exam_sb, turnstile_id, student, student_ps_data, shift_name, parsed_data):
-        """Ruxsat berish va eshikni ochish"""
-        from access_control.services import BarrierControlService
-
-        # Eshikni ochish
-        sb_config = BarrierControlService(
-            parsed_data['ip_address'],
+    @staticmethod
+    async def _open_door(exam_sb, parsed_data):
+        """Eshikni ochish (qurilma bo'yicha umumiy async ulanish orqali)"""
+        barrier = AsyncBarrierControlService(
+            parsed_data.ip_address,
             exam_sb.sb.username,
             exam_sb.sb.password,
-            parsed_data['door_no']
+            parsed_data.door_no
         )
+        return await barrier.send_approval(approve=True)
 
-        is_opened = sb_config.send_approval(approve=True)
+    async def _grant_access(self, exam_sb, turnstile_id, student, shift_name, parsed_data):
+        """Ruxsat berish va eshikni ochish"""
+        is_opened = await self._open_door(exam_sb, parsed_data)
 
         # WebSocket xabari
         ws_data = {
@@ -506,13 +440,13 @@ class HikvisionWebhookView(APIView):
             'access_granted': is_opened,
             'turnstile_id': turnstile_id,
             'turnstile_info': self._get_turnstile_info(parsed_data),
-            'student': self._get_student_info(student, student_ps_data, shift_name),
+            'student': self._get_student_info(student, shift_name),
             'event': self._get_event_info(parsed_data),
             'message': 'Ruxsat' if is_opened else 'Eshik ochilmadi',
             'timestamp': timezone.now().isoformat()
         }
 
-        self._send_websocket_message(turnstile_id, ws_data)
+        await self._send_websocket_message(turnstile_id, ws_data)
 
         logger.info(
             f"Student {student.id} - {'Kirdi' if is_opened else 'Eshik ochilmadi'} "
@@ -520,19 +454,9 @@ class HikvisionWebhookView(APIView):
         )
         return is_opened
 
-    def _grant_access_normal_user(self, exam_sb, turnstile_id, normal_user, parsed_data):
+    async def _grant_access_normal_user(self, exam_sb, turnstile_id, normal_user, parsed_data):
         """Normal user uchun ruxsat berish va eshikni ochish"""
-        from access_control.services import BarrierControlService
-
-        # Eshikni ochish
-        sb_config = BarrierControlService(
-            parsed_data['ip_address'],
-            exam_sb.sb.username,
-            exam_sb.sb.password,
-            parsed_data['door_no']
-        )
-
-        is_opened = sb_config.send_approval(approve=True)
+        is_opened = await self._open_door(exam_sb, parsed_data)
 
         # WebSocket xabari
         ws_data = {
@@ -549,7 +473,7 @@ class HikvisionWebhookView(APIView):
             'timestamp': timezone.now().isoformat()
         }
 
-        self._send_websocket_message(turnstile_id, ws_data)
+        await self._send_websocket_message(turnstile_id, ws_data)
 
         logger.info(
             f"NormalUser {normal_user.supervisor.imei} - {'Kirdi' if is_opened else 'Eshik ochilmadi'} "
@@ -557,7 +481,7 @@ class HikvisionWebhookView(APIView):
         )
         return is_opened
 
-    def _deny_access(self, turnstile_id, student, student_ps_data, shift_name, parsed_data, is_same_zone, is_not_cheating):
+    async def _deny_access(self, turnstile_id, student, shift_name, parsed_data, is_same_zone, is_not_cheating):
         """Ruxsat rad etish"""
         if not is_not_cheating:
             message = "Chetlashtirilgan!"
@@ -571,78 +495,60 @@ class HikvisionWebhookView(APIView):
             'access_granted': False,
             'turnstile_id': turnstile_id,
             'turnstile_info': self._get_turnstile_info(parsed_data),
-            'student': self._get_student_info(student, student_ps_data, shift_name),
+            'student': self._get_student_info(student, shift_name),
             'event': self._get_event_info(parsed_data),
             'role': 'visitor',
             'message': message,
             'timestamp': timezone.now().isoformat()
         }
 
-        self._send_websocket_message(turnstile_id, ws_data)
+        await self._send_websocket_message(turnstile_id, ws_data)
         logger.warning(f"Student {student.id} - {message} - Turniket #{turnstile_id}")
 
         return self._error_response('Access denied')
 
-    def _deny_access_normal_user(self, turnstile_id, normal_user, message, parsed_data):
-        """Normal user uchun ruxsat rad etish"""
-        ws_data = {
-            'status': 'error3',
-            'access_granted': False,
-            'turnstile_id': turnstile_id,
-            'turnstile_info': self._get_turnstile_info(parsed_data),
-            'student': None,
-            'event': self._get_event_info(parsed_data),
-            'role': normal_user.supervisor.role,
-            'zone': normal_user.zone.name,
-            'message': message,
-            'timestamp': timezone.now().isoformat()
-        }
-
-        self._send_websocket_message(turnstile_id, ws_data)
-        logger.warning(f"NormalUser {normal_user.id} - {message} - Turniket #{turnstile_id}")
-
-        return self._error_response('Access denied')
-
     @staticmethod
     def _get_turnstile_info(parsed_data):
         """Turniket ma'lumotlari"""
         return {
-            'ip': parsed_data['ip_address'],
-            'mac': parsed_data['mac_address'],
-            'door_no': parsed_data['door_no'],
+            'ip': parsed_data.ip_address,
+            'mac': parsed_data.mac_address,
+            'door_no': parsed_data.door_no,
         }
 
     @staticmethod
-    def _get_student_info(student, student_ps_data, shift_name):
+    def _get_student_info(student, shift_name):
         """Talaba ma'lumotlari"""
         return {
             'id': student.id,
             'name': student.fio if student else "",
             'employee_no': student.imei,
-            'exam': student.exam.name if hasattr(student.exam, 'name') else str(student.exam.id),
-            'zone': student.zone.name if hasattr(student.zone, 'name') else str(student.zone.id),
+            'exam': str(student.exam_id),
+            'zone': student.zone_name or str(student.zone_id),
             'test_day': str(student.e_date),
             'sm': shift_name,
             'group_number': getattr(student, 'gr_n', 'N/A'),
             'is_warning': getattr(student, 'is_blacklist', False),
-            'photo': student_ps_data.img_b64 if student_ps_data else "",
+            # Rasmning o'zi emas, imzolangan havola yuboriladi (img_b64 bazadan o'qilmaydi)
+            'photo': student_photo_url(student.id) if student.is_image else "",
         }
 
     @staticmethod
     def _get_event_info(parsed_data):
         """Event ma'lumotlari"""
         return {
-            'datetime': parsed_data['datetime'].isoformat(),
-            'door_no': parsed_data['door_no'],
-            'ip_address': parsed_data['ip_address'],
-            'mac_address': parsed_data['mac_address'],
-            'employee_no': parsed_data.get('employee_no', ''),
-            'name': parsed_data.get('name', ''),
-            'user_type': parsed_data.get('user_type', ''),
+            'datetime': parsed_data.datetime.isoformat(),
+            'image': monitor_image_url(parsed_data.image_key),
+            'door_no': parsed_data.door_no,
+            'ip_address': parsed_data.ip_address,
+            'mac_address': parsed_data.mac_address,
+            'employee_no': parsed_data.employee_no,
+            'name': parsed_data.name,
+            'user_type': parsed_data.user_type,
         }
 
     @staticmethod
-    def _send_websocket_message(turnstile_id, data):
+    async def _send_websocket_message(turnstile_id, data):
         """WebSocket orqali xabar yuborish"""
         if not turnstile_id:
             logger.warning("Turniket ID topilmadi, WebSocket'ga yuborilmadi")
@@ -652,7 +558,7 @@ class HikvisionWebhookView(APIView):
             channel_layer = get_channel_layer()
             group_name = f'turnstile_{turnstile_id}'
 
-            async_to_sync(channel_layer.group_send)(
+            await channel_layer.group_send(
                 group_name,
                 {
                     'type': 'student_access_event',
@@ -663,9 +569,9 @@ class HikvisionWebhookView(APIView):
         except Exception as e:
             logger.error(f"WebSocket yuborishda xatolik: {str(e)}")
 
-    def _send_websocket_error(self, turnstile_id, parsed_data, message):
+    async def _send_websocket_error(self, turnstile_id, parsed_data, message):
         """WebSocket orqali xato xabari yuborish"""
-        self._send_websocket_message(turnstile_id, {
+        await self._send_websocket_message(turnstile_id, {
             'status': 'error1',
             'access_granted': False,
             'turnstile_id': turnstile_id,
@@ -678,7 +584,7 @@ class HikvisionWebhookView(APIView):
     @staticmethod
     def _success_response():
         """Muvaffaqiyatli javob"""
-        return Response({
+        return JsonResponse({
             'status': 'success',
             'message': 'Access granted'
         }, status=status.HTTP_200_OK)
@@ -686,13 +592,36 @@ class HikvisionWebhookView(APIView):
     @staticmethod
     def _error_response(message):
         """Xato javobi"""
-        print(message)
-        return Response({
+        logger.info(message)
+        return JsonResponse({
             'status': 'error',
             'message': message
         }, status=status.HTTP_200_OK)
 
 
+class LogSinkStatsView(APIView):
+    """Write-behind log navbati holati: chuqurlik, yozilganlar soni, flush kechikishi"""
+
+    def get(self, request):
+        return Response({
+            'status': 'success',
+            'data': log_sink.stats()
+        }, status=status.HTTP_200_OK)
+
+
+class WebhookStatsView(APIView):
+    """Webhook navbatlari holati: turniketlar bo'yicha navbat chuqurligi va qayta ishlash vaqti"""
+
+    def get(self, request):
+        return Response({
+            'status': 'success',
+            'data': {
+                'lanes': turnstile_lanes.stats(),
+                'dedup': event_deduplicator.stats(),
+            }
+        }, status=status.HTTP_200_OK)
+
+
 class ActiveExamListView(APIView):
     """Regionlar ro'yxatini qaytarish"""
 
@@ -7,7 +7,17 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 django_asgi_app = get_asgi_application()
 
+from django.conf import settings
 from access_control.routing import websocket_urlpatterns
+from access_control.admission import admission_index
+from access_control.registry import warm_turnstile_registry_in_background
+from face.matrix_cache import warm_shift_matrices_in_background
+
+warm_turnstile_registry_in_background()
+admission_index.start()
+
+if settings.FACE_MATRIX_WARM_ON_START:
+    warm_shift_matrices_in_background()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
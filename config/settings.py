@@ -96,6 +96,8 @@ TEMPLATES = [
     },
 ]
 
+# Faqat boshqaruv buyruqlari / sinxron sahifalar uchun; turniket webhooki (HikvisionWebhookView)
+# loopga bog'langan holat ishlatadi va ASGI_APPLICATION orqali xizmat qilinishi kerak
 WSGI_APPLICATION = 'config.wsgi.application'
 
 # ASGI sozlamalari (Agar WebSocket yoki async ishlatilsa)
@@ -495,6 +497,79 @@ UNFOLD = {
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
 
 
+# Face model (InsightFace) sozlamalari
+FACE_MODEL_NAME = env("FACE_MODEL_NAME", "buffalo_l")
+FACE_MODEL_ROOT = env("FACE_MODEL_ROOT", os.path.expanduser("~/.insightface"))
+FACE_MODEL_PROVIDERS = ['CPUExecutionProvider']
+FACE_MODEL_CTX_ID = int(env("FACE_MODEL_CTX_ID", -1))
+FACE_MODEL_DET_SIZE = (640, 640)
+FACE_WORKER_COUNT = int(env("FACE_WORKER_COUNT", 20))
+FACE_RECOGNITION_BATCH_SIZE = 32
+FACE_WORKER_BATCH_SIZE = 64
+FACE_STREAM_PAGE_SIZE = 2000
+FACE_EMBEDDING_CACHE_MAX_SIZE = int(env("FACE_EMBEDDING_CACHE_MAX_SIZE", 2_000_000))
+FACE_EMBEDDING_CACHE_EVICT_EVERY = 10_000
+FACE_EMBEDDING_CACHE_TOUCH_SECONDS = 60
+FACE_EMBEDDING_CACHE_TOUCH_BATCH = 5000
+FACE_MATCH_THRESHOLD = 40
+FACE_MATRIX_REFRESH_SECONDS = 15
+FACE_MATRIX_WARM_ON_START = env("FACE_MATRIX_WARM_ON_START", "True") == "True"
+FACE_VERIFICATION_ENABLED = env("FACE_VERIFICATION_ENABLED", "False") == "True"
+FACE_VERIFICATION_WORKERS = 2
+FACE_VERIFICATION_MAX_PENDING = 64
+FACE_VERIFICATION_BUDGET_MS = 1500
+
+# Hikvision ISAPI ulanishlari
+ISAPI_POOL_SIZE = 8
+ISAPI_KEEPALIVE_SECONDS = 60
+ISAPI_TIMEOUT_SECONDS = 5
+
+# Turniketlarga ma'lumot yuklash (region.push_engine)
+PUSH_MAX_DEVICES = 100
+PUSH_INITIAL_CONCURRENCY = 2
+PUSH_MAX_CONCURRENCY = 6
+PUSH_TARGET_LATENCY_MS = 800
+PUSH_RETRY_ATTEMPTS = 2
+PUSH_BATCH_SIZE = 20
+PUSH_DIFFERENTIAL_SYNC = env("PUSH_DIFFERENTIAL_SYNC", "True") == "True"
+
+# Fon jarayonlari (exam.jobs, manage.py run_jobs)
+JOB_POLL_SECONDS = 2
+JOB_PROGRESS_FLUSH_SECONDS = 1
+JOB_STALE_SECONDS = 120
+
+# Turniket webhooki keshlari
+TURNSTILE_REGISTRY_TTL = 60
+SHIFT_TIMETABLE_TTL = 300
+STUDENT_PHOTO_URL_MAX_AGE = 60 * 60 * 12
+ADMISSION_WARMUP_MINUTES = 30
+ADMISSION_INDEX_REFRESH_SECONDS = 30
+# Boshqa processlardagi Student o'zgarishlari (chetlatish) versiya kaliti orqali shu oraliqda tekshiriladi
+ADMISSION_VERSION_CHECK_SECONDS = float(env("ADMISSION_VERSION_CHECK_SECONDS", "1"))
+LOG_SINK_BATCH_SIZE = 200
+LOG_SINK_FLUSH_MS = 250
+WEBHOOK_DEDUP_WINDOW_SECONDS = 2
+TURNSTILE_LANE_MAX_DEPTH = 20
+TURNSTILE_LANE_IDLE_SECONDS = 300
+TURNSTILE_LANE_WAIT_SECONDS = 10
+
+# Rasmlar ombori: "local" (MEDIA_ROOT) yoki "s3" (MinIO)
+IMAGE_STORE_BACKEND = env("IMAGE_STORE_BACKEND", "local")
+IMAGE_STORE_DIR = "faces"
+IMAGE_STORE_S3_BUCKET = env("IMAGE_STORE_S3_BUCKET", "faces")
+IMAGE_STORE_S3_ENDPOINT = env("IMAGE_STORE_S3_ENDPOINT")
+IMAGE_STORE_S3_ACCESS_KEY = env("IMAGE_STORE_S3_ACCESS_KEY")
+IMAGE_STORE_S3_SECRET_KEY = env("IMAGE_STORE_S3_SECRET_KEY")
+THUMBNAIL_VARIANTS = {
+    'monitor': (297, 382),
+    'admin': (100, 150),
+}
+THUMBNAIL_JPEG_QUALITY = 85
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_MAX_PENDING = 256
+DEVICE_IMAGE_CACHE_SIZE = 512
+
+
 # Channels Layer (Redis)
 REDIS_HOST = os.environ.get('REDIS_HOST', '127.0.0.1')
 REDIS_PORT = os.environ.get('REDIS_PORT', 6379)
@@ -4,6 +4,8 @@ from django.conf.urls.static import static
 from django.conf import settings
 from django.views.static import serve
 
+from exam.views import job_status
+
 urlpatterns = [
     re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
     re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT}),
@@ -11,6 +13,7 @@ urlpatterns = [
 
 urlpatterns += [
     path('admin/', admin.site.urls),
+    path('task-status/<int:job_id>/', job_status, name='task-status'),
     path('api/v1/users/', include('users.urls')),
     path('api/v1/face/', include('face.urls')),
     path('api/v1/exam/', include('exam.urls')),
@@ -0,0 +1,264 @@
+import abc
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DATA_URI_PATTERN = re.compile(r"^data:image/(\w+);base64,")
+EXTENSIONS = {'jpeg': 'jpg', 'jpg': 'jpg', 'png': 'png', 'gif': 'gif', 'bmp': 'bmp'}
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif', 'bmp': 'image/bmp'}
+KNOWN_VARIANTS_LIMIT = 8192
+
+# Mavjudligi aniq bo'lgan nusxa kalitlari (oxirgi KNOWN_VARIANTS_LIMIT tasi): omborga qayta so'rov yuborilmaydi
+_known_variants = OrderedDict()
+_known_variants_lock = threading.Lock()
+
+
+class ImageStore(abc.ABC):
+    """
+    Rasmlar uchun kontent bo'yicha manzillangan (content-addressed) ombor.
+    Kalit = sha256(baytlar) + kengaytma, shuning uchun bir xil rasm bir marta saqlanadi.
+    """
+
+    @staticmethod
+    def make_key(data: bytes, ext: str = 'jpg') -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+    @staticmethod
+    def variant_key(key: str, variant: str) -> str:
+        """Kichraytirilgan nusxa kaliti: ab/cd/<sha>.jpg -> ab/cd/<sha>_<variant>.jpg"""
+        return f"{key.rsplit('.', 1)[0]}_{variant}.jpg"
+
+    def put(self, data: bytes, ext: str = 'jpg') -> str:
+        return self.put_as(self.make_key(data, ext), data)
+
+    @abc.abstractmethod
+    def put_as(self, key: str, data: bytes) -> str:
+        """Berilgan kalit bilan yozish (kalit mavjud bo'lsa qayta yozilmaydi)"""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Rasm baytlari; topilmasa None"""
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool:
+        """Kalit omborda bormi"""
+
+    @abc.abstractmethod
+    def url(self, key: str) -> str:
+        """Brauzer uchun havola (lokal /media/ yoki imzolangan S3 havola)"""
+
+
+class LocalImageStore(ImageStore):
+    """MEDIA_ROOT ostidagi fayl tizimi; /media/ orqali beriladi"""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/') + '/'
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put_as(self, key: str, data: bytes) -> str:
+        path = self._path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Yarim yozilgan fayl ko'rinmasligi uchun avval vaqtinchalik faylga yoziladi
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}{key}"
+
+
+class S3ImageStore(ImageStore):
+    """MinIO / S3-mos ombor (boto3 o'rnatilgan bo'lishi kerak)"""
+
+    def __init__(self, bucket: str, endpoint_url: str, access_key: str, secret_key: str, url_expire: int = 3600):
+        import boto3
+
+        self.bucket = bucket
+        self.url_expire = url_expire
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+        )
+
+    def put_as(self, key: str, data: bytes) -> str:
+        if not self.exists(key):
+            ext = key.rsplit('.', 1)[-1]
+            self.client.put_object(
+                Bucket=self.bucket, Key=key, Body=data, ContentType=CONTENT_TYPES.get(ext, 'image/jpeg'))
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    def url(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=self.url_expire)
+
+
+_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    global _store
+    if _store is None:
+        if settings.IMAGE_STORE_BACKEND == 's3':
+            _store = S3ImageStore(
+                bucket=settings.IMAGE_STORE_S3_BUCKET,
+                endpoint_url=settings.IMAGE_STORE_S3_ENDPOINT,
+                access_key=settings.IMAGE_STORE_S3_ACCESS_KEY,
+                secret_key=settings.IMAGE_STORE_S3_SECRET_KEY,
+            )
+        else:
+            _store = LocalImageStore(
+                os.path.join(settings.MEDIA_ROOT, settings.IMAGE_STORE_DIR),
+                f"{settings.MEDIA_URL}{settings.IMAGE_STORE_DIR}/",
+            )
+    return _store
+
+
+def make_thumbnail(data: bytes, size) -> bytes:
+    """Nisbatni saqlagan holda kichraytirilgan JPEG nusxa"""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    img.thumbnail(size)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=settings.THUMBNAIL_JPEG_QUALITY)
+    return output.getvalue()
+
+
+def _remember_variant(variant_key: str):
+    with _known_variants_lock:
+        _known_variants[variant_key] = True
+        _known_variants.move_to_end(variant_key)
+        while len(_known_variants) > KNOWN_VARIANTS_LIMIT:
+            _known_variants.popitem(last=False)
+
+
+def has_variant(key: str, variant: str, check_store: bool = True) -> bool:
+    """
+    Kichraytirilgan nusxa yozilganmi. Avval xotiradagi ro'yxat, kerak bo'lsa ombor tekshiriladi;
+    check_store=False da omborga murojaat qilinmaydi (hot path uchun).
+    """
+    variant_key = get_image_store().variant_key(key, variant)
+    with _known_variants_lock:
+        if variant_key in _known_variants:
+            return True
+    if not check_store:
+        return False
+    try:
+        exists = get_image_store().exists(variant_key)
+    except Exception as e:
+        logger.warning(f"[image_store] {variant_key} tekshirilmadi: {e}")
+        return False
+    if exists:
+        _remember_variant(variant_key)
+    return exists
+
+
+def put_variants(key: str, data: bytes) -> list:
+    """Saqlangan rasmning kichraytirilgan nusxalarini (THUMBNAIL_VARIANTS) yozish; yaratilganlar ro'yxati"""
+    store = get_image_store()
+    created = []
+    for variant, size in settings.THUMBNAIL_VARIANTS.items():
+        try:
+            variant_key = store.put_as(store.variant_key(key, variant), make_thumbnail(data, size))
+            _remember_variant(variant_key)
+            created.append(variant)
+        except Exception as e:
+            logger.error(f"[image_store] {variant} nusxa yaratilmadi ({key}): {e}")
+    return created
+
+
+def put_image(data: bytes, ext: str = 'jpg', key: str = None) -> str:
+    """Asl rasmni va uning barcha kichraytirilgan nusxalarini (THUMBNAIL_VARIANTS) omborga yozish"""
+    store = get_image_store()
+    key = store.put_as(key or store.make_key(data, ext), data)
+    put_variants(key, data)
+    return key
+
+
+def decode_data_uri(data_uri: str):
+    """data:image/...;base64,... -> (baytlar, kengaytma); noto'g'ri bo'lsa (None, None)"""
+    match = DATA_URI_PATTERN.match(data_uri or '')
+    ext = EXTENSIONS.get(match.group(1).lower(), 'jpg') if match else 'jpg'
+    try:
+        return base64.b64decode(data_uri.split(',')[-1]), ext
+    except (binascii.Error, ValueError, AttributeError):
+        return None, None
+
+
+def put_data_uri(data_uri: str) -> Optional[str]:
+    """Base64 data URI ni xom bayt ko'rinishida omborga yozib, kalitni qaytarish"""
+    data, ext = decode_data_uri(data_uri)
+    if not data:
+        return None
+    return put_image(data, ext)
+
+
+def offload_field(obj, src_field: str, key_field: str) -> bool:
+    """Obyektdagi base64 maydonni omborga ko'chirish: key_field to'ldiriladi, src_field tozalanadi"""
+    data_uri = getattr(obj, src_field)
+    if not data_uri or getattr(obj, key_field):
+        return False
+    key = put_data_uri(data_uri)
+    if key is None:
+        return False
+    setattr(obj, key_field, key)
+    setattr(obj, src_field, None)
+    return True
+
+
+def image_src(key: Optional[str], data_uri: Optional[str] = None, variant: str = None) -> Optional[str]:
+    """
+    <img src> uchun manba: ombor havolasi yoki (ko'chirilmagan eski yozuvlar uchun) data URI.
+    So'ralgan nusxa yaratilmagan bo'lsa (masalan, navbat to'lgan), asl rasm havolasi qaytadi.
+    """
+    if key:
+        store = get_image_store()
+        if variant and has_variant(key, variant):
+            return store.url(store.variant_key(key, variant))
+        return store.url(key)
+    return data_uri or None
@@ -13,15 +13,14 @@ from unfold.decorators import action, display
 from django.urls import reverse_lazy, path, reverse
 from django.utils.translation import gettext_lazy as _
 
-from asgiref.sync import async_to_sync
 from unfold.enums import ActionVariant
 from unfold.paginator import InfinitePaginator
 
-from exam import services
 from exam.forms import ExclusionStudentForm
-from exam.models import Exam, Test, ExamState, Student, Shift, StudentPsData, StudentLog, ExamShift, Reason, Cheating, StudentBlacklist, ExamZoneSwingBar
+from exam.jobs import enqueue_job_redirect, job_progress_url
+from exam.models import Exam, Test, ExamState, Student, Shift, StudentPsData, StudentLog, ExamShift, Reason, Cheating, StudentBlacklist, ExamZoneSwingBar, BackgroundJob
 from region.models import SwingBarrier
-from region.utils import push_data_main_worker, add_user_to_swing_barr, upload_single_user_face_image
+from region.utils import add_user_to_swing_barr, upload_single_user_face_image
 from users.models import User
 
 admin.site.disable_action('delete_selected')
@@ -82,6 +81,11 @@ class ExamAdmin(ModelAdmin):
                 self.admin_site.admin_view(self.exclude_student_view),
                 name='exam_exam_exclude_student',
             ),
+            path(
+                'job-progress/',
+                self.admin_site.admin_view(self.job_progress_view),
+                name='exam_exam_job_progress',
+            ),
         ]
         return custom_urls + urls
 
@@ -148,19 +152,7 @@ class ExamAdmin(ModelAdmin):
             if not state_key == 'new':
                 messages.warning(request, f"Ma'lumot yuklab olish holatida emas!")
                 return redirect("admin:exam_exam_changelist")
-            t = async_to_sync(services.get_all_users_cefr)(exam_object)
-            if t == 0:
-                messages.error(request, _(f"Ma'lumot yozilmadi."))
-                return redirect(
-                    reverse_lazy("admin:exam_exam_changelist")
-                )
-            exam_object.status = ExamState.objects.get(key='load_data')
-            exam_object.total_taker = t
-            exam_object.save()
-            messages.success(request, _(f"Jarayon yakunlandi."))
-            return redirect(
-                reverse_lazy("admin:exam_exam_changelist")
-            )
+            return enqueue_job_redirect(request, BackgroundJob.KIND_LOAD_DATA, exam_id=exam_object.id, source='cefr')
         except Exception as e:
             messages.error(request, str(e))
             return redirect("admin:exam_exam_changelist")
@@ -179,19 +171,7 @@ class ExamAdmin(ModelAdmin):
             if not state_key == 'new':
                 messages.warning(request, f"Ma'lumot yuklab olish holatida emas!")
                 return redirect("admin:exam_exam_changelist")
-            t = async_to_sync(services.get_all_users_nct)(exam_object)
-            if t == 0:
-                messages.error(request, _(f"Ma'lumot yozilmadi."))
-                return redirect(
-                    reverse_lazy("admin:exam_exam_changelist")
-                )
-            exam_object.status = ExamState.objects.get(key='load_data')
-            exam_object.total_taker = t
-            exam_object.save()
-            messages.success(request, _(f"Jarayon yakunlandi."))
-            return redirect(
-                reverse_lazy("admin:exam_exam_changelist")
-            )
+            return enqueue_job_redirect(request, BackgroundJob.KIND_LOAD_DATA, exam_id=exam_object.id, source='nct')
         except Exception as e:
             messages.error(request, str(e))
             return redirect("admin:exam_exam_changelist")
@@ -210,19 +190,7 @@ class ExamAdmin(ModelAdmin):
             if not state_key == 'new':
                 messages.warning(request, f"Ma'lumot yuklab olish holatida emas!")
                 return redirect("admin:exam_exam_changelist")
-            t = async_to_sync(services.get_all_users_iiv)(exam_object)
-            if t == 0:
-                messages.error(request, _(f"Ma'lumot yozilmadi."))
-                return redirect(
-                    reverse_lazy("admin:exam_exam_changelist")
-                )
-            exam_object.status = ExamState.objects.get(key='load_data')
-            exam_object.total_taker = t
-            exam_object.save()
-            messages.success(request, _(f"Jarayon yakunlandi."))
-            return redirect(
-                reverse_lazy("admin:exam_exam_changelist")
-            )
+            return enqueue_job_redirect(request, BackgroundJob.KIND_LOAD_DATA, exam_id=exam_object.id, source='iiv')
         except Exception as e:
             messages.error(request, str(e))
             return redirect("admin:exam_exam_changelist")
@@ -288,25 +256,17 @@ class ExamAdmin(ModelAdmin):
 
     @action(description=format_html("💎 Turniketlarga talabgorlar ma'lumotini yuklash"))
     def push_swing_barrier_action(self, request: HttpRequest, queryset):
-        for exam in queryset:
-            sb_queryset = ExamZoneSwingBar.objects.filter(exam=exam, sb__status=True).order_by('sb__zone__region__number', 'sb__zone__number')
-            if not exam.status.key == 'load_data':
-                messages.warning(request, f"Ma'lumot yuklab olinmagan!")
-                return redirect("admin:exam_exam_changelist")
-            if sb_queryset.count() == 0:
-                self.message_user(request, f"Turniket topilmadi!")
-            elif sb_queryset.count() == 1:
-                success_count_user, success_count_img, error_count_user, error_count_img = push_data_main_worker(sb_queryset)
-                is_warning = success_count_user == 0 or success_count_img == 0 or error_count_user != 0 or error_count_img != 0
-                if is_warning:
-                    self.message_user(request, f"Jarayon tugadi! Ammo yuklanmagan ma'lumotlar bor.")
-                else:
-                    self.message_user(request, f"Jarayon tugadi.", level=messages.SUCCESS)
-                exam.status = ExamState.objects.get(key='push_data')
-                exam.save()
-            else:
-                self.message_user(request, f"Faqat 1 ta tadbir tanlang!", level=messages.WARNING)
-        return redirect("admin:exam_exam_changelist")
+        if queryset.count() != 1:
+            self.message_user(request, f"Faqat 1 ta tadbir tanlang!", level=messages.WARNING)
+            return redirect("admin:exam_exam_changelist")
+        exam = queryset.first()
+        if not exam.status.key == 'load_data':
+            messages.warning(request, f"Ma'lumot yuklab olinmagan!")
+            return redirect("admin:exam_exam_changelist")
+        if not ExamZoneSwingBar.objects.filter(exam=exam, sb__status=True).exists():
+            self.message_user(request, f"Turniket topilmadi!")
+            return redirect("admin:exam_exam_changelist")
+        return enqueue_job_redirect(request, BackgroundJob.KIND_PUSH_SWING_BARRIER, exam_id=exam.id)
 
     @staticmethod
     def has_push_swing_barrier_action_permission(request: HttpRequest):
@@ -348,6 +308,14 @@ class ExamAdmin(ModelAdmin):
     def has_exclusion_student_action_permission(self, request, object_id):
         return request.user.is_admin or request.user.is_central or request.user.is_delegate
 
+    def job_progress_view(self, request):
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Jarayon holati",
+        }
+        return render(request, 'access_control/task_progress.html', context)
+
     def exclude_student_view(self, request, object_id):
         exam = self.get_object(request, object_id)
         if request.method == 'POST':
@@ -772,4 +740,19 @@ class StudentBlacklistAdmin(ModelAdmin):
         user_region = getattr(request.user, "region", None)
         if user_region:
             return qs.filter(student__zone__region=user_region)
-        return qs.none()
\ No newline at end of file
+        return qs.none()
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'current', 'total', 'created_by', 'started_at', 'finished_at', 'progress_link']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['id', 'kind', 'params', 'status', 'total', 'current', 'device_errors', 'message', 'created_by',
+                       'started_at', 'finished_at', 'heartbeat_at', 'created_at', 'updated_at']
+    list_display_links = ['id', 'kind']
+
+    @display(description=_("Progress"))
+    def progress_link(self, obj: BackgroundJob):
+        return format_html('<a href="{}">Ko\'rish</a>', job_progress_url(obj))
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,273 @@
+import logging
+import threading
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils import timezone
+
+from exam import services
+from exam.models import BackgroundJob, Exam, ExamState, ExamZoneSwingBar
+from region.models import SwingBarrier
+from region.utils import push_data_main_worker, is_check_healthy, delete_all_visitors_clean
+from supervisor.models import Supervisor
+from supervisor.utils import add_supervisor_to_swing_barr, upload_single_supervisor_face_image
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS: Dict[str, Callable] = {}
+
+
+def job_handler(kind: str):
+    """Job turi uchun bajaruvchi funksiyani ro'yxatdan o'tkazish"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class JobProgress:
+    """
+    Jarayon progressi: hisoblagichlar xotirada yangilanadi (sinxron va async koddan),
+    alohida oqim ularni har JOB_PROGRESS_FLUSH_SECONDS da bazaga yozadi.
+    """
+
+    def __init__(self, job: BackgroundJob):
+        self.job_id = job.id
+        self.total = 0
+        self.current = 0
+        self.device_errors = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def set_total(self, total: int):
+        with self._lock:
+            self.total = total
+
+    def add_total(self, count: int):
+        with self._lock:
+            self.total += count
+
+    def advance(self, count: int = 1):
+        with self._lock:
+            self.current += count
+
+    def device_error(self, device: str, count: int = 1):
+        with self._lock:
+            self.device_errors[device] += count
+
+    def flush(self):
+        with self._lock:
+            values = {
+                'total': self.total,
+                'current': min(self.current, self.total) if self.total else self.current,
+                'device_errors': dict(self.device_errors),
+            }
+        BackgroundJob.objects.filter(pk=self.job_id).update(heartbeat_at=timezone.now(), **values)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(settings.JOB_PROGRESS_FLUSH_SECONDS):
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.warning(f"Job #{self.job_id} progress yozilmadi: {e}")
+        finally:
+            connection.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"job-progress-{self.job_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+def enqueue_job(kind: str, params: dict = None, user=None) -> BackgroundJob:
+    """Jobni navbatga qo'yish; run_jobs buyrug'i uni oladi"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Noma'lum job turi: {kind}")
+    return BackgroundJob.objects.create(kind=kind, params=params or {}, created_by=user)
+
+
+def job_progress_url(job: BackgroundJob) -> str:
+    """Admin ichidagi progress sahifasi (task_progress.html)"""
+    return f"{reverse('admin:exam_exam_job_progress')}?task_id={job.id}"
+
+
+def enqueue_job_redirect(request, kind: str, **params):
+    """Admin action uchun: jobni navbatga qo'yib, progress sahifasiga yo'naltirish"""
+    job, created = enqueue_unique_job(kind, request.user, **params)
+    if created:
+        messages.info(request, f"Jarayon navbatga qo'yildi (#{job.id}).")
+    else:
+        messages.warning(request, f"Bu jarayon allaqachon bajarilmoqda (#{job.id}).")
+    return redirect(job_progress_url(job))
+
+
+def enqueue_unique_job(kind: str, user=None, **params) -> Tuple[BackgroundJob, bool]:
+    """
+    Shu turdagi (va parametrlardagi) tugamagan job bo'lsa o'shani qaytaradi, aks holda
+    yangisini navbatga qo'yadi. (job, yaratildimi)
+    Tekshiruv va yaratish orasidagi poyga background_job_unique_active cheklovi bilan yopiladi:
+    parallel so'rov ulgurib yaratgan bo'lsa, IntegrityError dan keyin o'sha job qaytariladi.
+    """
+    active = [BackgroundJob.STATUS_QUEUED, BackgroundJob.STATUS_RUNNING]
+    for attempt in range(3):
+        job = BackgroundJob.objects.filter(kind=kind, params=params, status__in=active).order_by('id').first()
+        if job is not None:
+            return job, False
+        try:
+            with transaction.atomic():
+                return enqueue_job(kind, params, user), True
+        except IntegrityError:
+            logger.info(f"{kind} {params}: job parallel so'rovda yaratildi")
+    raise RuntimeError(f"{kind} jobini navbatga qo'yib bo'lmadi")
+
+
+def claim_next_job() -> Optional[BackgroundJob]:
+    """Navbatdagi birinchi jobni olish; bir nechta worker bir jobni olmaydi (skip_locked)"""
+    with transaction.atomic():
+        job = (BackgroundJob.objects.select_for_update(skip_locked=True)
+               .filter(status=BackgroundJob.STATUS_QUEUED).order_by('id').first())
+        if job is None:
+            return None
+        job.status = BackgroundJob.STATUS_RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'updated_at'])
+    return job
+
+
+def fail_stale_jobs() -> int:
+    """Worker to'xtab qolgan (signal kelmayotgan) joblarni xatolik deb belgilash"""
+    deadline = timezone.now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    return BackgroundJob.objects.filter(
+        status=BackgroundJob.STATUS_RUNNING, heartbeat_at__lt=deadline
+    ).update(status=BackgroundJob.STATUS_FAILED, finished_at=timezone.now(), message="Worker to'xtab qoldi")
+
+
+def run_job(job: BackgroundJob) -> BackgroundJob:
+    progress = JobProgress(job)
+    progress.start()
+    try:
+        job.message = JOB_HANDLERS[job.kind](job, progress) or ''
+        job.status = BackgroundJob.STATUS_FINISHED
+    except Exception as e:
+        logger.error(f"Job #{job.id} xatolik: {traceback.format_exc()}")
+        job.message = str(e)
+        job.status = BackgroundJob.STATUS_FAILED
+    finally:
+        progress.stop()
+        close_old_connections()
+
+    job.finished_at = timezone.now()
+    job.total, job.current, job.device_errors = progress.total, progress.current, dict(progress.device_errors)
+    job.save(update_fields=['status', 'message', 'finished_at', 'total', 'current', 'device_errors', 'updated_at'])
+    return job
+
+
+@job_handler(BackgroundJob.KIND_PUSH_SWING_BARRIER)
+def push_swing_barrier_job(job: BackgroundJob, progress: JobProgress) -> str:
+    exam = Exam.objects.get(id=job.params['exam_id'])
+    sb_queryset = ExamZoneSwingBar.objects.filter(exam=exam, sb__status=True).order_by('sb__zone__region__number', 'sb__zone__number')
+    success_count_user, success_count_img, error_count_user, error_count_img = push_data_main_worker(
+        sb_queryset, job.params.get('differential'), progress)
+
+    exam.status = ExamState.objects.get(key='push_data')
+    exam.save()
+    return (f"Users: {success_count_user}✓/{error_count_user}✗ | "
+            f"Images: {success_count_img}✓/{error_count_img}✗")
+
+
+@job_handler(BackgroundJob.KIND_LOAD_DATA)
+def load_data_job(job: BackgroundJob, progress: JobProgress) -> str:
+    loaders = {
+        'cefr': services.get_all_users_cefr,
+        'nct': services.get_all_users_nct,
+        'iiv': services.get_all_users_iiv,
+    }
+    exam = Exam.objects.get(id=job.params['exam_id'])
+    t = async_to_sync(loaders[job.params['source']])(exam)
+    progress.set_total(t)
+    progress.advance(t)
+    if t == 0:
+        raise RuntimeError("Ma'lumot yozilmadi.")
+
+    exam.status = ExamState.objects.get(key='load_data')
+    exam.total_taker = t
+    exam.save()
+    return f"Yuklab olindi: {t}"
+
+
+@job_handler(BackgroundJob.KIND_DELETE_PERSONS)
+def delete_persons_job(job: BackgroundJob, progress: JobProgress) -> str:
+    item_queryset = SwingBarrier.objects.filter(status=True).select_related('zone__region').order_by('zone__region__number', 'zone__number')
+    progress.set_total(item_queryset.count())
+    cleaned = 0
+    for item in item_queryset:
+        device = f"{item.zone.region.name}|{item.ip_address}"
+        try:
+            if not is_check_healthy(ip_address=item.ip_address, username=item.username, password=item.password):
+                # Avvalgi admin action kabi: aloqasiz turniket holati bazada o'zgartirilmaydi
+                progress.device_error(device)
+                continue
+            total, success_count = delete_all_visitors_clean(item.ip_address, item.username, item.password)
+            item.person_count = total - success_count
+            item.status = True
+            item.save()
+            if total != success_count:
+                progress.device_error(device, total - success_count)
+            else:
+                cleaned += 1
+        except Exception as e:
+            logger.warning(f"Turniket: {device} - {e}")
+            progress.device_error(device)
+        finally:
+            progress.advance()
+    return f"Tozalandi: {cleaned}/{progress.total}"
+
+
+@job_handler(BackgroundJob.KIND_SEND_SUPERVISORS)
+def send_supervisors_job(job: BackgroundJob, progress: JobProgress) -> str:
+    staff_list = list(Supervisor.objects.filter(role='staff').select_related('region').order_by('region', 'id'))
+    devices_by_region = defaultdict(list)
+    for sb in SwingBarrier.objects.filter(zone__region__in={staff.region_id for staff in staff_list}).select_related('zone').order_by('id'):
+        devices_by_region[sb.zone.region_id].append(sb)
+    progress.set_total(sum(len(devices_by_region[staff.region_id]) for staff in staff_list))
+
+    healthy = {}
+    for staff in staff_list:
+        for sb in devices_by_region[staff.region_id]:
+            device = f"{staff.region.name}|{sb.ip_address}"
+            try:
+                if sb.id not in healthy:
+                    healthy[sb.id] = is_check_healthy(ip_address=sb.ip_address, mac_address=sb.mac_address,
+                                                      username=sb.username, password=sb.password)
+                if not healthy[sb.id]:
+                    progress.device_error(device)
+                    continue
+                if not add_supervisor_to_swing_barr(sb.ip_address, sb.username, sb.password, staff):
+                    progress.device_error(device)
+                    continue
+                img_data = {"fpid": staff.imei, "img64": staff.img_b64}
+                if not upload_single_supervisor_face_image(user_data=img_data, ip_address=sb.ip_address,
+                                                           username=sb.username, password=sb.password):
+                    progress.device_error(device)
+            except Exception as e:
+                logger.warning(f"{staff.fio} - {device} - {e}")
+                progress.device_error(device)
+            finally:
+                progress.advance()
+    errors = sum(progress.device_errors.values())
+    return f"Xodimlar: {len(staff_list)} | Xatoliklar: {errors}"
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from exam.jobs import claim_next_job, fail_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Navbatdagi fon jarayonlarini (BackgroundJob) bajarish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Navbat bo'shaguncha bajarib, chiqish")
+
+    def handle(self, *args, **options):
+        stale = fail_stale_jobs()
+        if stale:
+            self.stdout.write(self.style.WARNING(f"To'xtab qolgan joblar: {stale}"))
+
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(settings.JOB_POLL_SECONDS)
+                continue
+
+            self.stdout.write(f"Job #{job.id} [{job.kind}] boshlandi")
+            job = run_job(job)
+            style = self.style.SUCCESS if job.status == job.STATUS_FINISHED else self.style.ERROR
+            self.stdout.write(style(
+                f"Job #{job.id} [{job.status}]: {job.current}/{job.total}, {job.elapsed_seconds:.1f}s - {job.message}"
+            ))
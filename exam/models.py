@@ -2,8 +2,9 @@ from django.core.validators import RegexValidator
 from django.db import models
 from django.utils import timezone
 from django.utils.html import format_html
-from pgvector.django import VectorField
+from pgvector.django import VectorField, HnswIndex
 from auditlog.registry import auditlog
+from core.image_store import image_src
 from core.models.base import BaseModel
 from region.models import Zone
 from django.utils.translation import gettext_lazy as _
@@ -129,6 +130,7 @@ class StudentPsData(BaseModel):
     ps_num = models.CharField(max_length=10, blank=True, null=True, verbose_name=_("Nomer"))
     phone = models.CharField(max_length=13, blank=True, null=True, verbose_name=_("Telefon"))
     embedding = VectorField(dimensions=512, blank=True, null=True, verbose_name=_("Vector"))
+    img_hash = models.CharField(max_length=64, blank=True, null=True, verbose_name=_("Embedding rasm hashi"))
     img_b64 = models.TextField(blank=True, null=True, verbose_name=_("Rasm"))
 
     def __str__(self):
@@ -148,6 +150,15 @@ class StudentPsData(BaseModel):
         verbose_name = 'Pasport malumot'
         verbose_name_plural = 'Pasport malumotlari'
         db_table = 'student_ps_data'
+        indexes = [
+            HnswIndex(
+                name='student_ps_data_emb_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+        ]
 
 
 class StudentLog(BaseModel):
@@ -166,6 +177,7 @@ class StudentLog(BaseModel):
     student = models.ForeignKey("exam.Student", on_delete=models.SET_NULL, related_name='student_logs', blank=True, null=True, verbose_name=_("Student"))
     employee_no = models.CharField(max_length=100, db_index=True, verbose_name='Student ID')
     img_face = models.TextField(blank=True, null=True, verbose_name=_("O'tgandagi rasm"))
+    img_face_key = models.CharField(max_length=80, blank=True, null=True, verbose_name=_("O'tgandagi rasm kaliti"))
     door = models.PositiveSmallIntegerField(default=0, verbose_name=_("Kirdi|Chiqdi eshik"))
     accuracy = models.PositiveSmallIntegerField(default=0, verbose_name=_("O'xshashlik"))
     pass_time = models.DateTimeField(verbose_name=_("O'tgan vaqt"))
@@ -181,10 +193,11 @@ class StudentLog(BaseModel):
         return f"{self.student.fio}"
 
     def image_tag(self):
-        if self.img_face:
+        src = image_src(self.img_face_key, self.img_face, variant='admin')
+        if src:
             return format_html(
                 '<img src="{}" style="max-width:100px; max-height:150px;" />',
-                self.img_face
+                src
             )
         return "(No Image)"
 
@@ -278,6 +291,80 @@ class ExamZoneSwingBar(BaseModel):
         db_table = 'exam_zone_swing_bar'
 
 
+class BackgroundJob(BaseModel):
+    """Admin so'rovidan ajratilgan uzoq jarayon (run_jobs buyrug'i bajaradi)"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_FINISHED = 'finished'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Navbatda'),
+        (STATUS_RUNNING, 'Jarayonda'),
+        (STATUS_FINISHED, 'Tugadi'),
+        (STATUS_FAILED, 'Xatolik'),
+    ]
+
+    KIND_PUSH_SWING_BARRIER = 'push_swing_barrier'
+    KIND_LOAD_DATA = 'load_data'
+    KIND_SEND_SUPERVISORS = 'send_supervisors'
+    KIND_DELETE_PERSONS = 'delete_persons'
+
+    KIND_CHOICES = [
+        (KIND_PUSH_SWING_BARRIER, "Turniketlarga talabgorlarni yuklash"),
+        (KIND_LOAD_DATA, "Talabgorlarni yuklab olish"),
+        (KIND_SEND_SUPERVISORS, "Xodimlarni turniketlarga yuklash"),
+        (KIND_DELETE_PERSONS, "Turniketlarni tozalash"),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES, verbose_name=_("Turi"))
+    params = models.JSONField(default=dict, blank=True, verbose_name=_("Parametrlar"))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True, verbose_name=_("Holat"))
+    total = models.PositiveIntegerField(default=0, verbose_name=_("Jami"))
+    current = models.PositiveIntegerField(default=0, verbose_name=_("Bajarildi"))
+    device_errors = models.JSONField(default=dict, blank=True, verbose_name=_("Qurilmalar bo'yicha xatoliklar"))
+    message = models.TextField(blank=True, default='', verbose_name=_("Natija"))
+    created_by = models.ForeignKey('users.User', on_delete=models.SET_NULL, blank=True, null=True, verbose_name=_("Foydalanuvchi"))
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Boshlangan vaqt"))
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Tugagan vaqt"))
+    heartbeat_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Oxirgi signal"))
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if not self.started_at:
+            return 0.0
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+
+    @property
+    def throughput(self) -> float:
+        """Soniyasiga bajarilgan birliklar"""
+        elapsed = self.elapsed_seconds
+        return self.current / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self):
+        if self.status != self.STATUS_RUNNING or not self.total:
+            return None
+        rate = self.throughput
+        return max(self.total - self.current, 0) / rate if rate > 0 else None
+
+    def __str__(self):
+        return f"#{self.id} | {self.kind} | {self.status}"
+
+    class Meta:
+        verbose_name = 'Fon jarayoni'
+        verbose_name_plural = 'Fon jarayonlari'
+        db_table = 'background_job'
+        constraints = [
+            # Bir xil tur va parametrli tugamagan job faqat bitta bo'ladi (parallel bosishlarda ham)
+            models.UniqueConstraint(
+                fields=['kind', 'params'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='background_job_unique_active',
+            ),
+        ]
+
+
 auditlog.register(Cheating)
 auditlog.register(Exam)
 auditlog.register(ExamShift)
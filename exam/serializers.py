@@ -1,4 +1,6 @@
 from rest_framework import serializers
+
+from core.image_store import image_src
 from exam.models import Test, ExamState, Exam, Student, StudentLog
 
 
@@ -40,8 +42,13 @@ class StudentSerializer(serializers.ModelSerializer):
 
 class StudentLogSerializer(serializers.ModelSerializer):
     student = serializers.PrimaryKeyRelatedField(queryset=Student.objects.all())
+    # Ombor kaliti emas, ochiladigan havola (S3 uchun imzolangan) beriladi
+    img_face_url = serializers.SerializerMethodField()
 
     class Meta:
         model = StudentLog
-        fields = ['student', 'img_face', 'pass_time', 'accuracy', 'door',
+        fields = ['student', 'img_face', 'img_face_url', 'pass_time', 'accuracy', 'door',
                   'ip_address', 'mac_address']
+
+    def get_img_face_url(self, obj):
+        return image_src(obj.img_face_key, obj.img_face)
@@ -11,7 +11,11 @@ from django.views.decorators.cache import cache_page
 
 from django.db import transaction
 
-from exam.models import Student, Exam
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from exam.models import Student, Exam, BackgroundJob
 from exam.serializers import StudentSerializer, ExamSerializer
 from users.models import User
 
@@ -101,4 +105,29 @@ class ExamViewSet(viewsets.ModelViewSet):
             serializer = ExamSerializer(exam)
             return Response(data=serializer.data, status=status.HTTP_200_OK)
         except Exception as e:
-            return Response({'message': f"{e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({'message': f"{e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+JOB_STATES = {
+    BackgroundJob.STATUS_QUEUED: 'PENDING',
+    BackgroundJob.STATUS_RUNNING: 'PROGRESS',
+    BackgroundJob.STATUS_FINISHED: 'SUCCESS',
+    BackgroundJob.STATUS_FAILED: 'FAILURE',
+}
+
+
+@staff_member_required
+def job_status(request, job_id: int):
+    """task_progress.html uchun job holati: progress, tezlik, ETA va qurilmalar bo'yicha xatoliklar"""
+    job = get_object_or_404(BackgroundJob, id=job_id)
+    eta = job.eta_seconds
+    return JsonResponse({
+        'id': job.id,
+        'kind': job.kind,
+        'state': JOB_STATES[job.status],
+        'progress': {'current': job.current, 'total': job.total},
+        'throughput': round(job.throughput, 2),
+        'eta_seconds': round(eta) if eta is not None else None,
+        'elapsed_seconds': round(job.elapsed_seconds),
+        'device_errors': job.device_errors,
+        'message': job.message,
+    })
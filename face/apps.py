@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class FaceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'face'
\ No newline at end of file
+    name = 'face'
+
+    def ready(self):
+        import face.signals  # noqa: F401
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from face.models import FaceEmbeddingCache
+
+logger = logging.getLogger("face_worker")
+
+_inserted_since_evict = 0
+
+# Kesh hitlari (id -> soni) xotirada yig'iladi va davriy ravishda bitta UPDATE bilan yoziladi
+_pending_touches: Counter = Counter()
+_touch_lock = threading.Lock()
+_last_touch_flush = time.monotonic()
+
+
+def get_cached_embeddings(digests: Iterable[str]) -> Dict[str, FaceEmbeddingCache]:
+    """Digestlar bo'yicha keshdan embeddinglarni bitta so'rovda olish"""
+    digests = {d for d in digests if d}
+    if not digests:
+        return {}
+
+    cached = {
+        item.digest: item
+        for item in FaceEmbeddingCache.objects.filter(digest__in=digests).only('id', 'digest', 'embedding', 'is_face')
+    }
+    if cached:
+        _touch([item.id for item in cached.values()])
+    return cached
+
+
+def _touch(ids):
+    with _touch_lock:
+        _pending_touches.update(ids)
+        due = (
+            len(_pending_touches) >= settings.FACE_EMBEDDING_CACHE_TOUCH_BATCH
+            or time.monotonic() - _last_touch_flush >= settings.FACE_EMBEDDING_CACHE_TOUCH_SECONDS
+        )
+    if due:
+        flush_embedding_touches()
+
+
+def flush_embedding_touches() -> int:
+    """Yig'ilgan hitlarni bazaga yozish: hits soni bo'yicha guruhlab, har guruhga bitta UPDATE"""
+    global _pending_touches, _last_touch_flush
+
+    with _touch_lock:
+        touches, _pending_touches = _pending_touches, Counter()
+        _last_touch_flush = time.monotonic()
+    if not touches:
+        return 0
+
+    by_count: Dict[int, list] = {}
+    for cache_id, count in touches.items():
+        by_count.setdefault(count, []).append(cache_id)
+
+    now = timezone.now()
+    for count, ids in by_count.items():
+        FaceEmbeddingCache.objects.filter(id__in=ids).update(hits=F('hits') + count, last_used_at=now)
+    return len(touches)
+
+
+def store_embeddings(items: Dict[str, Optional[list]]):
+    """
+    Yangi embeddinglarni keshga yozish.
+    items: {digest: embedding | None}, None — rasmda yuz topilmagan.
+    """
+    global _inserted_since_evict
+
+    items = {digest: embedding for digest, embedding in items.items() if digest}
+    if not items:
+        return
+
+    now = timezone.now()
+    FaceEmbeddingCache.objects.bulk_create(
+        [
+            FaceEmbeddingCache(digest=digest, embedding=embedding, is_face=embedding is not None, last_used_at=now)
+            for digest, embedding in items.items()
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+    _inserted_since_evict += len(items)
+    if _inserted_since_evict >= settings.FACE_EMBEDDING_CACHE_EVICT_EVERY:
+        evict_embedding_cache()
+
+
+def evict_embedding_cache(max_size: int = None) -> int:
+    """Kesh hajmi limitdan oshsa, eng uzoq ishlatilmaganlarini o'chirish (LRU)"""
+    global _inserted_since_evict
+    _inserted_since_evict = 0
+
+    # LRU tartibi to'g'ri bo'lishi uchun yozilmagan hitlar avval saqlanadi
+    flush_embedding_touches()
+
+    max_size = max_size or settings.FACE_EMBEDDING_CACHE_MAX_SIZE
+    excess = _estimated_size() - max_size
+    if excess <= 0:
+        return 0
+
+    deleted = 0
+    while deleted < excess:
+        ids = list(FaceEmbeddingCache.objects.order_by('last_used_at').values_list('id', flat=True)[:min(5000, excess - deleted)])
+        if not ids:
+            break
+        deleted += FaceEmbeddingCache.objects.filter(id__in=ids).delete()[0]
+    logger.info(f"Embedding kesh tozalandi: {deleted} ta yozuv")
+    return deleted
+
+
+def _estimated_size() -> int:
+    """Jadval hajmi: PostgreSQL statistikasidan (to'liq COUNT(*) skanisiz), statistika bo'lmasa COUNT"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [FaceEmbeddingCache._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return FaceEmbeddingCache.objects.count()
+
+
+def get_or_compute_embedding(face_embedder, image: str) -> Optional[np.ndarray]:
+    """Bitta base64 rasm uchun embedding: avval keshdan, bo'lmasa model orqali"""
+    digest = face_embedder.image_digest(image)
+    cached = get_cached_embeddings([digest]).get(digest)
+    if cached is not None:
+        return face_embedder.pgvector_to_numpy(cached.embedding) if cached.is_face else None
+
+    img_rgb = face_embedder.decode_base64(image)
+    embedding = face_embedder.get_embedding(img_rgb)
+    store_embeddings({digest: face_embedder.numpy_to_pgvector(embedding) if embedding is not None else None})
+    return embedding
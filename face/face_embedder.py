@@ -1,35 +1,57 @@
 import base64
+import binascii
+import hashlib
 import re
 
 import cv2
 import numpy as np
-from typing import Optional
+from typing import Optional, List
 from django.conf import settings
 
+from face.model_registry import get_face_analysis
+
+
+BASE64_PATTERN = r"^data:image\/(jpeg|jpg|png|gif|bmp);base64,"
+
 
 class FaceEmbedder:
+    STATUS_OK = 'ok'
+    STATUS_NO_FACE = 'no_face'
+    STATUS_INVALID_IMAGE = 'invalid_image'
+
     def __init__(self):
-        self.detector = settings.FACE_ANALYSIS_MODEL
+        self.detector = get_face_analysis()
         self._recognizer = None
         self.image_format = None
 
     def validate_base64(self, image: str) -> bool:
-        base64_pattern = r"^data:image\/(jpeg|jpg|png|gif|bmp);base64,"
-        match = re.match(base64_pattern, image)
+        match = re.match(BASE64_PATTERN, image)
         if not match:
             return False
         self.image_format = match.group(1)
         return True
 
-    @staticmethod
-    def decode_base64(image: str):
+    @classmethod
+    def decode_base64(cls, image: str):
         image_base64_data = image.split(",")[1]
         img_data = base64.b64decode(image_base64_data)  # Base64 stringni dekodlash
+        return cls.decode_bytes(img_data)
+
+    @staticmethod
+    def decode_bytes(img_data: bytes):
         np_arr = np.frombuffer(img_data, np.uint8)  # Byte massivga aylantirish
         img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)  # Rasmni OpenCV formatida o'qish
         img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         return img_rgb
 
+    @staticmethod
+    def image_digest(image: str) -> Optional[str]:
+        """Rasmning dekodlangan baytlari bo'yicha sha256 digest"""
+        try:
+            return hashlib.sha256(base64.b64decode(image.split(",")[-1])).hexdigest()
+        except (binascii.Error, ValueError):
+            return None
+
     @staticmethod
     def numpy_to_pgvector(embedding: np.ndarray) -> list:
         if isinstance(embedding, list):
@@ -48,7 +70,74 @@ class FaceEmbedder:
             return embedding
         return None
 
+    @property
+    def recognizer(self):
+        """FaceAnalysis ichidagi recognition (ArcFace ONNX) modeli"""
+        if self._recognizer is None:
+            self._recognizer = self.detector.models['recognition']
+        return self._recognizer
+
+    def _recognition_batch_size(self) -> int:
+        # Ba'zi ONNX modellarda batch o'lchami 1 ga qotirilgan bo'ladi
+        batch_dim = self.recognizer.session.get_inputs()[0].shape[0]
+        if isinstance(batch_dim, int) and batch_dim > 0:
+            return batch_dim
+        return settings.FACE_RECOGNITION_BATCH_SIZE
+
+    def _align_face(self, img: np.ndarray) -> Optional[np.ndarray]:
+        """Eng ishonchli yuzni aniqlab, recognition uchun tekislangan crop qaytarish"""
+        from insightface.utils import face_align
+
+        bboxes, kpss = self.detector.det_model.detect(img, max_num=0, metric='default')
+        if bboxes.shape[0] == 0 or kpss is None:
+            return None
+        return face_align.norm_crop(img, landmark=kpss[0], image_size=self.recognizer.input_size[0])
+
+    def get_embeddings_batch(self, images: List[str]) -> List[dict]:
+        """
+        Base64 rasmlar ro'yxatidan embeddinglarni olish.
+        Detection har bir rasm uchun alohida, recognition esa barcha yuzlar uchun bitta batchda.
+        Natija kirish tartibida: {"embedding": np.ndarray | None, "status": ok | no_face | invalid_image}
+        """
+        results = [{"embedding": None, "status": self.STATUS_INVALID_IMAGE} for _ in images]
+        crops = []
+        crop_indexes = []
+
+        for index, image in enumerate(images):
+            try:
+                img_rgb = self.decode_base64(image)
+            except Exception:
+                continue
+            crop = self._align_face(img_rgb)
+            if crop is None:
+                results[index]["status"] = self.STATUS_NO_FACE
+                continue
+            crops.append(crop)
+            crop_indexes.append(index)
+
+        batch_size = self._recognition_batch_size()
+        for start in range(0, len(crops), batch_size):
+            features = self.recognizer.get_feat(crops[start:start + batch_size])
+            for offset, feature in enumerate(features):
+                index = crop_indexes[start + offset]
+                results[index]["embedding"] = feature.flatten()
+                results[index]["status"] = self.STATUS_OK
+
+        return results
+
     @staticmethod
-    def compare_faces(embedding1: np.ndarray, embedding2: np.ndarray) -> float:
-        t = np.dot(embedding1, embedding2) / (np.linalg.norm(embedding1) * np.linalg.norm(embedding2))
+    def normalize(embeddings: np.ndarray) -> np.ndarray:
+        """Embedding(lar)ni L2 bo'yicha normallashtirish (1-o'lchamli yoki (N, 512) matritsa)"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    @classmethod
+    def cosine_similarities(cls, probe: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """Bitta embeddingni (N, 512) matritsadagi barcha embeddinglar bilan bitta matmulda solishtirish"""
+        return cls.normalize(matrix) @ cls.normalize(probe)
+
+    @classmethod
+    def compare_faces(cls, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+        t = float(np.dot(cls.normalize(embedding1), cls.normalize(embedding2)))
         return round(t * 100)
\ No newline at end of file
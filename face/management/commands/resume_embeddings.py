@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exam.models import Exam
+from face.services import run_embedding_job
+
+
+class Command(BaseCommand):
+    help = "Tadbir embeddinglarini oxirgi checkpointdan davom ettirish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int, help="Tadbir ID")
+        parser.add_argument('--restart', action='store_true', help="Checkpointni e'tiborsiz qoldirib, yangi job boshlash")
+
+    def handle(self, *args, **options):
+        try:
+            exam = Exam.objects.get(id=options['exam_id'])
+        except Exam.DoesNotExist:
+            raise CommandError(f"Tadbir topilmadi: {options['exam_id']}")
+
+        job = run_embedding_job(exam, restart=options['restart'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Job #{job.id} [{job.status}]: jami {job.total_count}, hisoblandi {job.processed_count}, "
+            f"o'tkazib yuborildi {job.skipped_count}, xatolik {job.failed_count}, "
+            f"{job.elapsed_seconds:.1f}s"
+        ))
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from exam.models import Student, StudentPsData
+from face.search import EmbeddingMatrix
+
+logger = logging.getLogger("face_worker")
+
+# (exam_id, zone_id, e_date, sm)
+ShiftKey = Tuple[int, int, date, int]
+
+
+class _ShiftEntry:
+    def __init__(self, matrix: EmbeddingMatrix, synced_at):
+        self.matrix = matrix
+        self.synced_at = synced_at
+        self.checked_at = time.monotonic()
+        self.dirty = False
+        self.lock = threading.Lock()
+
+
+class ShiftMatrixCache:
+    """
+    Har bir smena (tadbir, bino, kun, smena) nomzodlarining embeddinglari bitta
+    normallashtirilgan float32 matritsada ASGI process xotirasida saqlanadi.
+    O'zgargan qatorlar updated_at bo'yicha qisman (incremental) yangilanadi.
+    """
+
+    def __init__(self):
+        self._entries: Dict[ShiftKey, _ShiftEntry] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(exam_id, zone_id, e_date, sm) -> ShiftKey:
+        return int(exam_id), int(zone_id), e_date, int(sm)
+
+    def get(self, exam_id, zone_id, e_date, sm) -> EmbeddingMatrix:
+        key = self._key(exam_id, zone_id, e_date, sm)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._load(key)
+                    self._entries[key] = entry
+            return entry.matrix
+
+        if entry.dirty or time.monotonic() - entry.checked_at >= settings.FACE_MATRIX_REFRESH_SECONDS:
+            self._refresh(key, entry)
+        return entry.matrix
+
+    def get_embedding(self, student) -> Optional:
+        """Student uchun normallashtirilgan embedding (smena matritsasidan)"""
+        if not (student.exam_id and student.zone_id and student.e_date):
+            return None
+        return self.get(student.exam_id, student.zone_id, student.e_date, student.sm).get(student.id)
+
+    def mark_dirty(self, exam_id, zone_id, e_date, sm) -> None:
+        """Signal orqali: keyingi so'rovda smena matritsasi qayta tekshiriladi"""
+        if not (exam_id and zone_id and e_date):
+            return
+        entry = self._entries.get(self._key(exam_id, zone_id, e_date, sm))
+        if entry is not None:
+            entry.dirty = True
+
+    def mark_student_dirty(self, student_id) -> None:
+        """Student turgan barcha smena matritsalarini belgilash (ko'chirish yoki o'chirishda eski smena)"""
+        for entry in list(self._entries.values()):
+            if student_id in entry.matrix:
+                entry.dirty = True
+
+    def invalidate(self, exam_id=None) -> None:
+        with self._lock:
+            if exam_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == exam_id]:
+                    del self._entries[key]
+
+    def _load(self, key: ShiftKey) -> _ShiftEntry:
+        start = time.perf_counter()
+        synced_at = timezone.now()
+        exam_id, zone_id, e_date, sm = key
+        matrix = EmbeddingMatrix.from_queryset(exam=exam_id, zone=zone_id, e_date=e_date, sm=sm)
+        logger.info(f"Smena matritsasi yuklandi: {key} | {len(matrix)} ta | {time.perf_counter() - start:.2f}s")
+        return _ShiftEntry(matrix, synced_at)
+
+    def _refresh(self, key: ShiftKey, entry: _ShiftEntry) -> None:
+        if not entry.lock.acquire(blocking=False):
+            # Boshqa thread yangilayapti — eski matritsa bilan davom etiladi
+            return
+        try:
+            synced_at = timezone.now()
+            entry.dirty = False
+            exam_id, zone_id, e_date, sm = key
+            changed = StudentPsData.objects.filter(student__exam_id=exam_id).filter(
+                Q(updated_at__gt=entry.synced_at) | Q(student__updated_at__gt=entry.synced_at)
+            ).values_list(
+                'student_id', 'embedding', 'student__zone_id', 'student__e_date', 'student__sm', 'student__is_face'
+            )
+            upserts, removes = {}, set()
+            for student_id, embedding, s_zone, s_date, s_sm, is_face in changed.iterator(chunk_size=2000):
+                # Student boshqa smenaga o'tgan yoki yuzi yo'q bo'lsa, matritsadan olib tashlanadi
+                if embedding is not None and is_face and (s_zone, s_date, s_sm) == (zone_id, e_date, sm):
+                    upserts[student_id] = embedding
+                else:
+                    removes.add(student_id)
+
+            # O'chirilgan yoki boshqa tadbirga ko'chgan talabalar updated_at bo'yicha ko'rinmaydi,
+            # shuning uchun smenadagi id lar to'plami bazadagisi bilan solishtiriladi
+            current_ids = EmbeddingMatrix.candidate_ids(exam_id, zone_id, e_date, sm)
+            matrix_ids = {int(student_id) for student_id in entry.matrix.ids}
+            removes |= matrix_ids - current_ids
+            missing = current_ids - matrix_ids - set(upserts)
+            if missing:
+                upserts.update(StudentPsData.objects.filter(student_id__in=missing).values_list('student_id', 'embedding'))
+
+            entry.matrix.apply(upserts, removes)
+            count = len(upserts) + len(removes)
+            entry.synced_at = synced_at
+            entry.checked_at = time.monotonic()
+            if count:
+                logger.info(f"Smena matritsasi yangilandi: {key} | {count} ta o'zgarish")
+        except Exception as e:
+            logger.error(f"[ShiftMatrixCache] Yangilashda xatolik {key}: {e}")
+        finally:
+            entry.lock.release()
+
+    def warm_today(self) -> int:
+        """Bugungi barcha smenalar matritsalarini oldindan yuklash"""
+        keys = Student.objects.filter(
+            e_date=timezone.localdate(), exam__isnull=False, zone__isnull=False
+        ).values_list('exam_id', 'zone_id', 'e_date', 'sm').distinct()
+        count = 0
+        for exam_id, zone_id, e_date, sm in keys:
+            self.get(exam_id, zone_id, e_date, sm)
+            count += 1
+        return count
+
+
+shift_matrix_cache = ShiftMatrixCache()
+
+
+def warm_shift_matrices_in_background():
+    """ASGI ishga tushganda matritsalarni alohida threadda yuklash"""
+    def _run():
+        try:
+            count = shift_matrix_cache.warm_today()
+            logger.info(f"{count} ta smena matritsasi oldindan yuklandi")
+        except Exception as e:
+            logger.error(f"[warm_shift_matrices] {e}")
+
+    threading.Thread(target=_run, name="shift-matrix-warmup", daemon=True).start()
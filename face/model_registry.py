@@ -0,0 +1,73 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger("face_worker")
+
+# Har bir process uchun bitta FaceAnalysis obyekti (detector + recognizer)
+_face_analysis = None
+_loaded_pid = None
+# Bir processdagi bir nechta thread modelni parallel yuklab qo'ymasligi uchun
+_load_lock = threading.Lock()
+# init_face_worker chaqirilgan process (pool worker): ota processning modeli ishlatilmaydi
+_is_pool_worker = False
+
+
+def _build_face_analysis():
+    """InsightFace modelini yuklash va tayyorlash"""
+    from insightface.app import FaceAnalysis
+
+    app = FaceAnalysis(
+        name=settings.FACE_MODEL_NAME,
+        root=settings.FACE_MODEL_ROOT,
+        allowed_modules=['detection', 'recognition'],
+        providers=settings.FACE_MODEL_PROVIDERS,
+    )
+    app.prepare(ctx_id=settings.FACE_MODEL_CTX_ID, det_size=settings.FACE_MODEL_DET_SIZE)
+    return app
+
+
+def get_face_analysis():
+    """Joriy processdagi umumiy modelni qaytarish (kerak bo'lsa yuklash)"""
+    global _face_analysis, _loaded_pid
+
+    # Fork qilingan processda ota processning ONNX sessiyasidan foydalanmaslik
+    if _face_analysis is not None and _loaded_pid == os.getpid():
+        return _face_analysis
+
+    with _load_lock:
+        if _face_analysis is not None and _loaded_pid == os.getpid():
+            return _face_analysis
+
+        preloaded = None if _is_pool_worker else getattr(settings, 'FACE_ANALYSIS_MODEL', None)
+        if preloaded is not None:
+            _face_analysis, _loaded_pid = preloaded, os.getpid()
+            return _face_analysis
+
+        start = time.perf_counter()
+        _face_analysis = _build_face_analysis()
+        _loaded_pid = os.getpid()
+        logger.info(f"Face model yuklandi: {settings.FACE_MODEL_NAME} | pid={_loaded_pid} | "
+                    f"{time.perf_counter() - start:.2f}s")
+        return _face_analysis
+
+
+def init_face_worker():
+    """
+    ProcessPoolExecutor initializer: worker o'z modelini bir marta yuklaydi (ota processdan
+    meros qolgan FACE_ANALYSIS_MODEL yoki ONNX sessiyasi ishlatilmaydi).
+    Xatolik yutilmaydi — model yuklanmasa pool buziladi va chunklar xatolik sifatida hisoblanadi.
+    """
+    global _is_pool_worker, _face_analysis, _loaded_pid, _load_lock
+    _is_pool_worker = True
+    # Fork paytida ota processda band bo'lgan lock meros qolishi mumkin
+    _load_lock = threading.Lock()
+    _face_analysis, _loaded_pid = None, None
+    try:
+        get_face_analysis()
+    except Exception as e:
+        logger.error(f"[init_face_worker] Model yuklanmadi: {e}")
+        raise
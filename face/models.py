@@ -1,7 +1,10 @@
 from django.db import models
 from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
+from core.image_store import image_src
 from core.models.base import BaseModel
 from auditlog.registry import auditlog
+from pgvector.django import VectorField
 from exam.models import Exam
 
 
@@ -14,6 +17,55 @@ class GenerateFaceExam(BaseModel):
 
 
 
+class EmbeddingJob(BaseModel):
+    STATUS_RUNNING = 'running'
+    STATUS_FINISHED = 'finished'
+    STATUS_PARTIAL = 'partial'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Jarayonda'),
+        (STATUS_FINISHED, 'Tugadi'),
+        (STATUS_PARTIAL, 'Qisman (xatoliklar bor)'),
+        (STATUS_FAILED, 'Xatolik'),
+    ]
+
+    exam = models.ForeignKey('exam.Exam', on_delete=models.CASCADE, related_name='embedding_jobs', verbose_name=_("Tadbir"))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_RUNNING, db_index=True, verbose_name=_("Holat"))
+    last_student_id = models.PositiveBigIntegerField(default=0, verbose_name=_("Oxirgi student ID"))
+    total_count = models.PositiveIntegerField(default=0, verbose_name=_("Jami"))
+    processed_count = models.PositiveIntegerField(default=0, verbose_name=_("Hisoblangan"))
+    skipped_count = models.PositiveIntegerField(default=0, verbose_name=_("O'tkazib yuborilgan"))
+    failed_count = models.PositiveIntegerField(default=0, verbose_name=_("Xatolik"))
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Boshlangan vaqt"))
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Tugagan vaqt"))
+    elapsed_seconds = models.FloatField(default=0, verbose_name=_("Davomiyligi (s)"))
+
+    def __str__(self):
+        return f"{self.exam_id} | {self.status} | {self.last_student_id}"
+
+    class Meta:
+        verbose_name = 'Embedding jarayoni'
+        verbose_name_plural = 'Embedding jarayonlari'
+        db_table = 'embedding_job'
+
+
+class FaceEmbeddingCache(BaseModel):
+    digest = models.CharField(max_length=64, unique=True, verbose_name=_("Rasm hashi"))
+    embedding = VectorField(dimensions=512, blank=True, null=True, verbose_name=_("Vector"))
+    is_face = models.BooleanField(default=True, verbose_name=_("Yuz aniqlanganmi"))
+    hits = models.PositiveIntegerField(default=0, verbose_name=_("Ishlatilgan soni"))
+    last_used_at = models.DateTimeField(db_index=True, verbose_name=_("Oxirgi ishlatilgan vaqt"))
+
+    def __str__(self):
+        return self.digest
+
+    class Meta:
+        verbose_name = 'Embedding kesh'
+        verbose_name_plural = 'Embedding kesh'
+        db_table = 'face_embedding_cache'
+
+
 class FaceIdentification(BaseModel):
     user = models.ForeignKey("users.User", on_delete=models.CASCADE)
     token = models.TextField()
@@ -21,25 +73,29 @@ class FaceIdentification(BaseModel):
     verified = models.BooleanField(default=False)
     first_image = models.TextField(blank=True, null=True)
     second_image = models.TextField(blank=True, null=True)
+    first_image_key = models.CharField(max_length=80, blank=True, null=True)
+    second_image_key = models.CharField(max_length=80, blank=True, null=True)
     response_json = models.TextField()
     status = models.PositiveSmallIntegerField(default=0)
     response_time = models.FloatField(default=0)
 
     def ps_image(self):
-        if self.first_image and self.verified is False:
+        src = image_src(self.first_image_key, self.first_image, variant='admin')
+        if src and self.verified is False:
             return format_html(
                 '<img src="{}" style="max-width:150px; max-height:150px;" />',
-                self.first_image
+                src
             )
         return "(No Image)"
 
     ps_image.short_description = 'Pasport'
 
     def live_image(self):
-        if self.second_image and self.verified is False:
+        src = image_src(self.second_image_key, self.second_image, variant='admin')
+        if src and self.verified is False:
             return format_html(
                 '<img src="{}" style="max-width:150px; max-height:150px;" />',
-                self.second_image
+                src
             )
         return "(No Image)"
 
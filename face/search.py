@@ -0,0 +1,159 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from pgvector.django import CosineDistance
+
+from exam.models import StudentPsData
+from face.face_embedder import FaceEmbedder
+
+logger = logging.getLogger("face_worker")
+
+DEFAULT_TOP_K = 5
+
+
+def _filter_candidates(queryset, exam=None, zone=None, e_date=None, sm=None):
+    """Nomzodlarni tadbir/bino/kun/smena bo'yicha cheklash"""
+    filters = {}
+    if exam is not None:
+        filters['student__exam'] = exam
+    if zone is not None:
+        filters['student__zone'] = zone
+    if e_date is not None:
+        filters['student__e_date'] = e_date
+    if sm is not None:
+        filters['student__sm'] = sm
+    return queryset.filter(embedding__isnull=False, student__is_face=True, **filters)
+
+
+def search_db(probe: np.ndarray, top_k: int = DEFAULT_TOP_K, exam=None, zone=None, e_date=None, sm=None) -> List[dict]:
+    """
+    1:N qidiruv pgvector orqali: cosine masofa bo'yicha eng yaqin top_k nomzod.
+    student_ps_data.embedding ustidagi HNSW indeksdan foydalanadi.
+    """
+    distance = CosineDistance('embedding', FaceEmbedder.normalize(probe).tolist())
+    rows = (
+        _filter_candidates(StudentPsData.objects.all(), exam, zone, e_date, sm)
+        .annotate(distance=distance)
+        .order_by('distance')
+        .values('student_id', 'distance')[:top_k]
+    )
+    return [
+        {"student_id": row['student_id'], "score": round((1 - row['distance']) * 100, 2)}
+        for row in rows
+    ]
+
+
+class _MatrixState:
+    """Matritsaning o'zgarmas holati; yangilanishda butunlay almashtiriladi"""
+    __slots__ = ('ids', 'matrix', 'positions')
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray):
+        self.ids = ids
+        self.matrix = matrix
+        self.positions = {int(student_id): i for i, student_id in enumerate(ids)}
+
+
+class EmbeddingMatrix:
+    """
+    Oldindan yuklangan va normallashtirilgan embeddinglar ustida xotiradagi 1:N qidiruv.
+    Bitta smena nomzodlari uchun har bir so'rov bitta matmul bilan bajariladi.
+    Yangilash copy-on-write: yangi holat alohida quriladi va bitta havola bilan almashtiriladi,
+    shuning uchun parallel o'qiyotgan oqimlar hech qachon yarim o'zgargan matritsani ko'rmaydi.
+    """
+
+    def __init__(self, ids: Sequence[int], embeddings):
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids):
+            matrix = FaceEmbedder.normalize(np.vstack(embeddings))
+        else:
+            matrix = np.empty((0, 512), dtype=np.float32)
+        self._state = _MatrixState(ids, matrix)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._state.ids
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._state.matrix
+
+    def __len__(self):
+        return len(self._state.ids)
+
+    def __contains__(self, student_id):
+        return student_id in self._state.positions
+
+    def get(self, student_id: int) -> Optional[np.ndarray]:
+        """Studentning normallashtirilgan embeddingi (matritsa qatori)"""
+        state = self._state
+        position = state.positions.get(student_id)
+        return None if position is None else state.matrix[position]
+
+    def apply(self, upserts: Dict[int, object] = None, removes: Iterable[int] = ()) -> None:
+        """
+        Bir nechta o'zgarishni bitta yangi holatga qo'llash (yozuvchi bitta bo'lishi kerak).
+        upserts: student_id -> embedding, removes: olib tashlanadigan student_id lar.
+        """
+        upserts = upserts or {}
+        state = self._state
+        dropped = {int(student_id) for student_id in [*removes, *upserts] if int(student_id) in state.positions}
+        if not upserts and not dropped:
+            return
+
+        ids, matrix = state.ids, state.matrix
+        if dropped:
+            keep = ~np.isin(ids, np.fromiter(dropped, dtype=np.int64, count=len(dropped)))
+            ids, matrix = ids[keep], matrix[keep]
+        if upserts:
+            ids = np.concatenate([ids, np.fromiter(upserts, dtype=np.int64, count=len(upserts))])
+            matrix = np.vstack([matrix, FaceEmbedder.normalize(np.vstack(list(upserts.values())))])
+        self._state = _MatrixState(ids, matrix)
+
+    def upsert(self, student_id: int, embedding) -> None:
+        """Bitta qatorni yangilash yoki qo'shish"""
+        self.apply(upserts={int(student_id): embedding})
+
+    def remove(self, student_id: int) -> None:
+        """Qatorni olib tashlash"""
+        self.apply(removes=[student_id])
+
+    @classmethod
+    def from_queryset(cls, exam=None, zone=None, e_date=None, sm=None) -> 'EmbeddingMatrix':
+        rows = _filter_candidates(StudentPsData.objects.all(), exam, zone, e_date, sm).values_list('student_id', 'embedding')
+        ids = []
+        embeddings = []
+        for student_id, embedding in rows.iterator(chunk_size=2000):
+            ids.append(student_id)
+            embeddings.append(embedding)
+        return cls(ids, embeddings)
+
+    @staticmethod
+    def candidate_ids(exam=None, zone=None, e_date=None, sm=None) -> set:
+        """Hozir bazada shu nomzodlar to'plamiga tegishli student_id lar (solishtirish uchun)"""
+        rows = _filter_candidates(StudentPsData.objects.all(), exam, zone, e_date, sm).values_list('student_id', flat=True)
+        return set(rows.iterator(chunk_size=5000))
+
+    def search(self, probe: np.ndarray, top_k: int = DEFAULT_TOP_K) -> List[dict]:
+        state = self._state
+        if not len(state.ids):
+            return []
+
+        scores = state.matrix @ FaceEmbedder.normalize(probe)
+        top_k = min(top_k, len(scores))
+        # To'liq saralash o'rniga faqat top_k elementni ajratib olish
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"student_id": int(state.ids[i]), "score": round(float(scores[i]) * 100, 2)}
+            for i in top
+        ]
+
+
+def identify(probe: Optional[np.ndarray], top_k: int = DEFAULT_TOP_K, matrix: EmbeddingMatrix = None, **filters) -> List[dict]:
+    """Matritsa berilgan bo'lsa xotirada, aks holda pgvector orqali qidirish"""
+    if probe is None:
+        return []
+    if matrix is not None:
+        return matrix.search(probe, top_k)
+    return search_db(probe, top_k, **filters)
@@ -1,9 +1,16 @@
-from concurrent.futures import ProcessPoolExecutor
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
-from face.face_embedder import FaceEmbedder
+from face.face_embedder import FaceEmbedder, BASE64_PATTERN
+from face.embedding_cache import get_cached_embeddings, store_embeddings, evict_embedding_cache
+from face.model_registry import init_face_worker
 from core.const import default_embedding, default_image64
-from exam.models import Student
+from exam.models import Student, StudentPsData
+from face.models import EmbeddingJob
 from core.utils import get_image_from_personal_info
 import logging
 import sys
@@ -25,119 +32,305 @@ logger.addHandler(ch)
 
 BATCH_SIZE = 500
 
-def process_student(student_data: dict):
-    try:
-        face_embedder: FaceEmbedder = FaceEmbedder()
-        img_base64 = student_data.get("img_b64")
-        imei = student_data.get("imei")
-        ps_ser = student_data.get("ps_ser", "")
-        ps_num = student_data.get("ps_number", "")
+PS_DATA_FIELDS = ('id', 'student_id', 'student__imei', 'img_b64', 'img_hash', 'ps_ser', 'ps_num')
+
+def _resolve_student_image(face_embedder: FaceEmbedder, student_data: dict):
+    """Student rasmini aniqlash: rasm bo'lmasa pasport ma'lumotlari orqali olish"""
+    img_base64 = student_data.get("img_b64")
+    is_image = True
 
-        is_image = True
-        is_face = True
-        face_embedding = face_embedder.numpy_to_pgvector(default_embedding)
+    # 1️⃣ Rasm mavjud emas — pasport ma'lumotlari orqali olish
+    if not img_base64:
+        ps_num = (student_data.get("ps_number") or "")[-7:].zfill(7)
+        img_base64 = get_image_from_personal_info(student_data.get("imei"), f"{student_data.get('ps_ser', '')}{ps_num}")
 
-        # 1️⃣ Rasm mavjud emas — pasport ma'lumotlari orqali olish
         if not img_base64:
-            ps_num = ps_num[-7:].zfill(7)
+            return str(default_image64).replace("\n", ""), False, False
 
-            img_base64 = get_image_from_personal_info(imei, f"{ps_ser}{ps_num}")
+    if not face_embedder.validate_base64(img_base64):
+        is_image = False
+    return img_base64, is_image, True
 
-            if not img_base64:
-                is_image = False
-                img_base64 = str(default_image64).replace("\n", "")
-            else:
-                if not face_embedder.validate_base64(img_base64):
-                    is_image = False
-                img_rgb = face_embedder.decode_base64(img_base64)
-                embedding = face_embedder.get_embedding(img_rgb)
-                if embedding is None:
-                    is_face = False
-                else:
-                    face_embedding = face_embedder.numpy_to_pgvector(embedding)
 
-        # 2️⃣ Rasm mavjud — embedding olish
-        else:
-            try:
-                if not face_embedder.validate_base64(img_base64):
-                    is_image = False
-                img_rgb = face_embedder.decode_base64(img_base64)
-                embedding = face_embedder.get_embedding(img_rgb)
-                if embedding is None:
-                    is_face = False
-                else:
-                    face_embedding = face_embedder.numpy_to_pgvector(embedding)
-            except Exception as e:
-                logger.error(f"[process_student] Base64 konvertatsiyada xato: {imei}: {e}")
-                is_image = False
+def process_students_batch(student_data_list: list):
+    """
+    Studentlar guruhi uchun embeddinglarni bitta recognition batchida olish.
+    Umumiy xatolik (model, xotira va h.k.) chaqiruvchiga ko'tariladi — chunk xatolik deb hisoblanadi.
+    """
+    face_embedder: FaceEmbedder = FaceEmbedder()
+    default_vector = face_embedder.numpy_to_pgvector(default_embedding)
 
-        return {
+    results = []
+    to_embed = []
+    embed_sources = []
+    for student_data in student_data_list:
+        img_base64, is_image, has_image = _resolve_student_image(face_embedder, student_data)
+        result = {
             "id": student_data["id"],
-            "embedding": face_embedding,
-            "img_b64": img_base64,
+            "student_id": student_data.get("student_id"),
+            "embedding": default_vector,
+            # Rasm faqat o'zgargan bo'lsa qaytariladi (pasport ma'lumotlari orqali olingan)
+            "img_b64": None if img_base64 == student_data.get("img_b64") else img_base64,
+            "img_hash": None,
             "is_image": is_image,
-            "is_face": is_face
+            "is_face": True
         }
+        results.append(result)
+        # 2️⃣ Rasm mavjud — embedding olish
+        if has_image:
+            to_embed.append((result, img_base64))
+            embed_sources.append(student_data)
+
+    embeddings = face_embedder.get_embeddings_batch([img for _, img in to_embed])
+    for (result, img_base64), item, student_data in zip(to_embed, embeddings, embed_sources):
+        if item["status"] in (FaceEmbedder.STATUS_OK, FaceEmbedder.STATUS_NO_FACE):
+            # Qaysi rasmdan hisoblanganini saqlash — keyingi ishga tushirishda o'tkazib yuborish uchun
+            digest = student_data.get("img_digest") if result["img_b64"] is None else None
+            result["img_hash"] = digest or face_embedder.image_digest(img_base64)
+        if item["status"] == FaceEmbedder.STATUS_OK:
+            result["embedding"] = face_embedder.numpy_to_pgvector(item["embedding"])
+        elif item["status"] == FaceEmbedder.STATUS_NO_FACE:
+            result["is_face"] = False
+        else:
+            logger.error(f"[process_students_batch] Base64 konvertatsiyada xato: {result['id']}")
+            result["is_image"] = False
+    return results
+
+
+def process_student(student_data: dict):
+    results = process_students_batch([student_data])
+    return results[0] if results else None
 
-    except Exception as e:
-        logger.error(f"[process_student] Umumiy xatolik: {student_data.get('imei')}: {e}")
-        return None
 
 @transaction.atomic
-def save_users_to_db(users):
-    try:
-        if not users:
-            return
-        users = [u for u in users if u is not None and u.pk is not None]
-
-        if not users:
-            return
-        Student.objects.bulk_update(
-            users, ['embedding', 'img_b64', 'is_face', 'is_image', 'updated_at'], batch_size=BATCH_SIZE
-        )
-    except Exception as e:
-        logger.error(f"save_users_to_db error: {e}")
+def save_chunk_results(results: list) -> int:
+    """Bitta chunk natijalarini bazaga yozish (StudentPsData va Student)"""
+    results = [r for r in results if r and r.get("id")]
+    if not results:
+        return 0
+
+    current_time = timezone.now()
+    ps_data_list = []
+    ps_data_with_image = []
+    students = []
+    for r in results:
+        ps_data = StudentPsData(id=r["id"], embedding=r["embedding"], img_hash=r["img_hash"], updated_at=current_time)
+        if r["img_b64"]:
+            ps_data.img_b64 = r["img_b64"]
+            ps_data_with_image.append(ps_data)
+        else:
+            ps_data_list.append(ps_data)
+        if r["student_id"]:
+            students.append(Student(id=r["student_id"], is_face=r["is_face"], is_image=r["is_image"], updated_at=current_time))
+
+    StudentPsData.objects.bulk_update(ps_data_list, ['embedding', 'img_hash', 'updated_at'], batch_size=BATCH_SIZE)
+    StudentPsData.objects.bulk_update(ps_data_with_image, ['embedding', 'img_b64', 'img_hash', 'updated_at'], batch_size=BATCH_SIZE)
+    Student.objects.bulk_update(students, ['is_face', 'is_image', 'updated_at'], batch_size=BATCH_SIZE)
+    return len(results)
+
 
+def iter_student_chunks(student_queryset, chunk_size: int, after_student_id: int = 0):
+    """
+    StudentPsData qatorlarini student_id bo'yicha keyset pagination bilan o'qish.
+    Butun queryset xotiraga olinmaydi, har safar faqat bitta sahifa o'qiladi.
+    (chunk, o'tkazib yuborilganlar soni, chunkdagi oxirgi student_id) qaytaradi.
+    """
+    page_size = settings.FACE_STREAM_PAGE_SIZE
+    base_qs = StudentPsData.objects.filter(student__in=student_queryset.values('id')).order_by('student_id')
+    last_student_id = after_student_id
 
-def get_students_in_bulk(ids):
-    return Student.objects.in_bulk(ids)
+    while True:
+        page = base_qs.filter(student_id__gt=last_student_id).values(*PS_DATA_FIELDS)[:page_size]
+        chunk = []
+        skipped = 0
+        row_count = 0
+        for row in page.iterator(chunk_size=chunk_size):
+            row_count += 1
+            last_student_id = row["student_id"]
+            digest = FaceEmbedder.image_digest(row["img_b64"]) if row["img_b64"] else None
+            # Embedding aynan shu rasmdan hisoblangan bo'lsa, qayta hisoblanmaydi
+            if digest and digest == row["img_hash"]:
+                skipped += 1
+            else:
+                chunk.append({
+                    "id": row["id"],
+                    "student_id": row["student_id"],
+                    "imei": row["student__imei"],
+                    "img_b64": row["img_b64"],
+                    "img_digest": digest,
+                    "ps_ser": row["ps_ser"] or "",
+                    "ps_number": row["ps_num"] or "",
+                })
+            if len(chunk) + skipped >= chunk_size:
+                yield chunk, skipped, last_student_id
+                chunk = []
+                skipped = 0
+        if chunk or skipped:
+            yield chunk, skipped, last_student_id
+        if row_count < page_size:
+            break
+
+
+def split_cached_chunk(chunk: list):
+    """
+    Chunkni embedding keshi bo'yicha ikkiga ajratish.
+    Keshda bor rasmlar uchun tayyor natija, qolganlari esa modelga yuboriladi.
+    """
+    cached = get_cached_embeddings(item["img_digest"] for item in chunk)
+    if not cached:
+        return [], chunk
+
+    default_vector = FaceEmbedder.numpy_to_pgvector(default_embedding)
+    hits = []
+    misses = []
+    for item in chunk:
+        entry = cached.get(item["img_digest"])
+        if entry is None:
+            misses.append(item)
+            continue
+        hits.append({
+            "id": item["id"],
+            "student_id": item["student_id"],
+            "embedding": entry.embedding if entry.is_face else default_vector,
+            "img_b64": None,
+            "img_hash": item["img_digest"],
+            "is_image": bool(re.match(BASE64_PATTERN, item["img_b64"])),
+            "is_face": entry.is_face,
+        })
+    return hits, misses
+
+
+def cache_chunk_results(results: list):
+    """Model hisoblagan embeddinglarni rasm hashi bo'yicha keshga yozish"""
+    store_embeddings({
+        r["img_hash"]: r["embedding"] if r["is_face"] else None
+        for r in results if r and r.get("img_hash")
+    })
+
+
+def _save_job_progress(job: EmbeddingJob, **fields):
+    if job is None:
+        return
+    for key, value in fields.items():
+        setattr(job, key, value)
+    job.save(update_fields=list(fields.keys()) + ['updated_at'])
+
+
+def main_worker(student_queryset, job: EmbeddingJob = None):
+    """
+    Embeddinglarni oqim (streaming) rejimida qayta generatsiya qilish.
+    Chunklar cheklangan navbat orqali workerlarga beriladi va har bir tugagan chunk darhol saqlanadi.
+    job berilsa, checkpoint (oxirgi student_id) va hisoblagichlar har chunkdan keyin yoziladi.
+    Checkpoint faqat ketma-ket muvaffaqiyatli saqlangan chunklar ustidan suriladi: xatolik bo'lgan
+    chunkdan keyin u to'xtaydi, job PARTIAL bo'lib qoladi va resume shu joydan qayta o'tadi.
+    """
+    max_workers = settings.FACE_WORKER_COUNT
+    chunk_size = settings.FACE_WORKER_BATCH_SIZE
+    max_pending = max_workers * 2
+
+    processed = job.processed_count if job else 0
+    skipped = job.skipped_count if job else 0
+    # Oldingi ishga tushirishdagi xatoliklar checkpointdan keyin qayta ishlanadi
+    failed = 0
+    checkpoint = job.last_student_id if job else 0
+    elapsed_before = job.elapsed_seconds if job else 0
+    cached = 0
+    start = time.perf_counter()
 
+    # Yuborilgan tartibda: [future | None, chunk_size, oxirgi student_id]
+    in_flight = deque()
+    saved = set()
+    blocked = False
+
+    def _collect(done_futures):
+        nonlocal processed, failed
+        for future in done_futures:
+            try:
+                results = future.result()
+                if len(results) != future.chunk_len:
+                    raise RuntimeError(f"chunk natijasi to'liq emas: {len(results)}/{future.chunk_len}")
+                processed += save_chunk_results(results)
+                cache_chunk_results(results)
+                saved.add(future)
+            except Exception as e:
+                failed += future.chunk_len
+                logger.error(f"main_worker chunk error: {e}")
+
+    def _advance_checkpoint():
+        # Checkpoint faqat oldingi barcha chunklar muvaffaqiyatli saqlangandan keyin suriladi;
+        # xatolik bo'lgan chunkdan keyin bu ishga tushirishda boshqa surilmaydi
+        nonlocal checkpoint, blocked
+        while not blocked and in_flight:
+            future, _, last_id = in_flight[0]
+            if future is not None and future not in saved:
+                if not future.done():
+                    break
+                blocked = True
+                break
+            in_flight.popleft()
+            saved.discard(future)
+            checkpoint = last_id
+        _save_job_progress(
+            job, last_student_id=checkpoint, processed_count=processed, skipped_count=skipped,
+            failed_count=failed, elapsed_seconds=elapsed_before + time.perf_counter() - start,
+        )
 
-def main_worker(student_queryset):
     try:
-        max_workers = 20
-        student_data_list = [
-            {
-                "id": s.id,
-                "imei": s.imei,
-                "img_b64": s.img_b64,
-                "ps_ser": s.ps_ser,
-                "ps_number": s.ps_number
-            }
-            for s in student_queryset
-        ]
-
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            results = list(executor.map(process_student, student_data_list))
-
-        results = [r for r in results if r]
-
-        ids = [r["id"] for r in results]
-        students_map = get_students_in_bulk(ids)
-
-        users = []
-        current_time = timezone.now()
-        for r in results:
-            student = students_map[r["id"]]
-            student.embedding = r["embedding"]
-            student.img_b64 = r["img_b64"]
-            student.is_image = r["is_image"]
-            student.is_face = r["is_face"]
-            student.updated_at = current_time
-            users.append(student)
-
-        save_users_to_db(users)
-        logger.info(f"Successfully processed {len(users)} students")
+        # Model har bir workerda bir marta yuklanadi, FaceEmbedder uni qayta ishlatadi
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_face_worker) as executor:
+            pending = set()
+            for chunk, chunk_skipped, last_id in iter_student_chunks(student_queryset, chunk_size, checkpoint):
+                skipped += chunk_skipped
+                # Keshda bor rasmlar modelga yuborilmay darhol saqlanadi
+                hits, chunk = split_cached_chunk(chunk)
+                if hits:
+                    processed += save_chunk_results(hits)
+                    cached += len(hits)
+                if not chunk:
+                    in_flight.append((None, 0, last_id))
+                    continue
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    _collect(done)
+                    _advance_checkpoint()
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"Progress: {processed} processed, {skipped} skipped | {processed / elapsed:.1f} student/s")
+                future = executor.submit(process_students_batch, chunk)
+                future.chunk_len = len(chunk)
+                pending.add(future)
+                in_flight.append((future, len(chunk), last_id))
+            _collect(wait(pending).done)
+            _advance_checkpoint()
+        evict_embedding_cache()
+        final_status = EmbeddingJob.STATUS_PARTIAL if failed else EmbeddingJob.STATUS_FINISHED
+        _save_job_progress(job, status=final_status, finished_at=timezone.now())
 
     except Exception as e:
-        logger.error(f"main_worker error: {e}")
\ No newline at end of file
+        logger.error(f"main_worker error: {e}")
+        _save_job_progress(job, status=EmbeddingJob.STATUS_FAILED)
+
+    logger.info(f"Successfully processed {processed} students ({cached} from cache), skipped {skipped} in "
+                f"{time.perf_counter() - start:.1f}s (failed: {failed})")
+    return processed
+
+
+def run_embedding_job(exam, restart: bool = False) -> EmbeddingJob:
+    """Tadbir uchun embedding jarayonini ishga tushirish yoki checkpointdan davom ettirish"""
+    job = None
+    if not restart:
+        job = EmbeddingJob.objects.filter(exam=exam).exclude(
+            status=EmbeddingJob.STATUS_FINISHED).order_by('-id').first()
+
+    student_queryset = Student.objects.filter(exam=exam)
+    if job is None:
+        job = EmbeddingJob.objects.create(
+            exam=exam,
+            total_count=StudentPsData.objects.filter(student__exam=exam).count(),
+            started_at=timezone.now(),
+        )
+    else:
+        logger.info(f"Job #{job.id} davom ettirilmoqda: student_id > {job.last_student_id}")
+        _save_job_progress(job, status=EmbeddingJob.STATUS_RUNNING)
+
+    main_worker(student_queryset, job=job)
+    return job
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from exam.models import Student, StudentPsData
+from face.matrix_cache import shift_matrix_cache
+
+
+@receiver([post_save, post_delete], sender=StudentPsData)
+def student_ps_data_changed(sender, instance, **kwargs):
+    shift_matrix_cache.mark_student_dirty(instance.student_id)
+    student = Student.objects.filter(id=instance.student_id).values('exam_id', 'zone_id', 'e_date', 'sm').first()
+    if student:
+        shift_matrix_cache.mark_dirty(student['exam_id'], student['zone_id'], student['e_date'], student['sm'])
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, instance, **kwargs):
+    # Boshqa smena/tadbirga ko'chirilgan yoki o'chirilgan student eski smena matritsasidan ham chiqariladi
+    shift_matrix_cache.mark_student_dirty(instance.id)
+    shift_matrix_cache.mark_dirty(instance.exam_id, instance.zone_id, instance.e_date, instance.sm)
@@ -1,3 +1,5 @@
+import datetime
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
@@ -6,10 +8,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
 from tutorial.quickstart.serializers import UserSerializer
 from face.face_embedder import FaceEmbedder
+from face.embedding_cache import get_or_compute_embedding
+from face.matrix_cache import shift_matrix_cache
+from face.search import identify, DEFAULT_TOP_K
 from users.models import User
 
 class LoginView(APIView):
@@ -101,15 +107,13 @@ class StudentViewSet(viewsets.ModelViewSet):
             if not face_embedder.validate_base64(second_image):
                 raise Exception("Invalid Base64 string. Must start with a valid image data URI prefix.")
 
-            img_rgb_1 = face_embedder.decode_base64(first_image)
-            embedding_1 = face_embedder.get_embedding(img_rgb_1)
-
-            img_rgb_2 = face_embedder.decode_base64(second_image)
-            embedding_2 = face_embedder.get_embedding(img_rgb_2)
+            # Bir xil rasm qayta yuborilsa, embedding keshdan olinadi
+            embedding_1 = get_or_compute_embedding(face_embedder, first_image)
+            embedding_2 = get_or_compute_embedding(face_embedder, second_image)
 
             similarity = face_embedder.compare_faces(embedding_1, embedding_2)
 
-            if similarity >= 40:
+            if similarity >= settings.FACE_MATCH_THRESHOLD:
                 data = {"status": status.HTTP_200_OK, "score": f"{similarity}%", "verified": True,
                         "message": "Aniqlandi"}
                 return Response(data=data, status=status.HTTP_200_OK)
@@ -119,4 +123,43 @@ class StudentViewSet(viewsets.ModelViewSet):
                 return Response(data=data, status=status.HTTP_200_OK)
         except Exception as e:
             data = {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "message": f"{e}"}
-            return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
+            return Response(data, status=status.HTTP_200_OK)
+
+    @action(methods=['post'], detail=False)
+    def identify(self, request):
+        """Jonli rasm bo'yicha tadbir/bino/smena nomzodlari orasidan 1:N qidiruv"""
+        try:
+            image = str(request.data['image'])
+            top_k = int(request.data.get('top_k', DEFAULT_TOP_K))
+
+            face_embedder = FaceEmbedder()
+            if not face_embedder.validate_base64(image):
+                raise Exception("Invalid Base64 string. Must start with a valid image data URI prefix.")
+
+            probe = get_or_compute_embedding(face_embedder, image)
+            if probe is None:
+                data = {"status": status.HTTP_404_NOT_FOUND, "candidates": [], "message": "Rasmda yuz topilmadi"}
+                return Response(data=data, status=status.HTTP_200_OK)
+
+            filters = {
+                'exam': request.data.get('exam_id'),
+                'zone': request.data.get('zone_id'),
+                'e_date': request.data.get('e_date'),
+                'sm': request.data.get('sm'),
+            }
+            matrix = None
+            if all(value not in (None, '') for value in filters.values()):
+                # Smena to'liq berilsa, xotiradagi smena matritsasidan qidiriladi (pgvector'siz)
+                e_date = filters['e_date']
+                if isinstance(e_date, str):
+                    e_date = datetime.date.fromisoformat(e_date)
+                matrix = shift_matrix_cache.get(filters['exam'], filters['zone'], e_date, filters['sm'])
+
+            candidates = identify(probe, top_k=top_k, matrix=matrix, **filters)
+            candidates = [c for c in candidates if c["score"] >= settings.FACE_MATCH_THRESHOLD]
+            data = {"status": status.HTTP_200_OK if candidates else status.HTTP_404_NOT_FOUND,
+                    "candidates": candidates, "message": "Aniqlandi" if candidates else "Topilmadi"}
+            return Response(data=data, status=status.HTTP_200_OK)
+        except Exception as e:
+            data = {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "message": f"{e}"}
+            return Response(data, status=status.HTTP_200_OK)
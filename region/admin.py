@@ -12,7 +12,9 @@ from django.utils.translation import gettext_lazy as _
 
 
 from region.models import Region, Zone, SwingBarrier
-from region.utils import is_check_healthy, delete_all_visitors_clean, get_all_visitors
+from exam.jobs import enqueue_job_redirect
+from exam.models import BackgroundJob
+from region.utils import is_check_healthy, get_all_visitors
 from users.models import User
 
 
@@ -59,9 +61,9 @@ class ZoneAdmin(ModelAdmin, ImportExportModelAdmin):
 
 @admin.register(SwingBarrier)
 class SwingBarrierAdmin(ModelAdmin):
-    list_display = ['id', 'ip_address', 'get_region', 'zone', 'number', 'model', 'mac_address', 'person_count', 'status']
+    list_display = ['id', 'ip_address', 'get_region', 'zone', 'number', 'model', 'mac_address', 'person_count', 'provision_strategy', 'status']
     list_display_links = ['id', 'zone', 'ip_address']
-    list_filter = ['zone__region__name', 'status', 'brand']
+    list_filter = ['zone__region__name', 'status', 'brand', 'provision_strategy']
     readonly_fields = ['id', 'created_at', 'updated_at']
     search_fields = ['name', 'number', 'brand', 'serial_number', 'ip_address', 'mac_address', 'username']
 
@@ -117,40 +119,8 @@ class SwingBarrierAdmin(ModelAdmin):
     @action(description=_("Tozalash"), url_path="delete-persons-action", permissions=["delete_persons_action"], icon="delete", variant=ActionVariant.DANGER)
     def delete_persons_action(self, request):
         if request.user.is_admin or request.user.is_central:
-            item_queryset = SwingBarrier.objects.filter(status=True).order_by('zone__region__number', 'zone__number',
-                                                                              'zone__number')
-            total_sb = item_queryset.count()
-            for item in item_queryset:
-                ip = item.ip_address
-                username = item.username
-                password = item.password
-
-                is_healthy: bool = is_check_healthy(ip_address=ip, username=username, password=password)
-                if not is_healthy:
-                    item.status = False
-                    self.message_user(request,
-                                      f"Turniket: {item.zone.region.name}|{item.ip_address} - aloqa mavjud emas!",
-                                      level=messages.ERROR)
-                    continue
-                total, success_count = delete_all_visitors_clean(ip, username, password)
-                if total == success_count:
-                    item.person_count = 0
-                    self.message_user(request,
-                                      f"Turniket: {item.zone.region.name}|{item.ip_address} - Total:{total}, Success:{success_count}",
-                                      level=messages.SUCCESS)
-                elif total != success_count:
-                    item.person_count = total - success_count
-                    self.message_user(request,
-                                      f"Turniket: {item.zone.region.name}|{item.ip_address} - Total:{total}, Success:{success_count}",
-                                      level=messages.WARNING)
-                item.status = True
-                item.save()
-            if total_sb == 0:
-                self.message_user(request, f"Aktiv turniketlar topilmadi.", level=messages.WARNING)
-            else:
-                self.message_user(request, f"Jarayon tugadi.", level=messages.INFO)
-        else:
-            self.message_user(request, f"Sizda ruxsat yo'q.", level=messages.WARNING)
+            return enqueue_job_redirect(request, BackgroundJob.KIND_DELETE_PERSONS)
+        self.message_user(request, f"Sizda ruxsat yo'q.", level=messages.WARNING)
         return redirect(
             reverse_lazy("admin:region_swingbarrier_changelist")
         )
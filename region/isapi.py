@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DigestAuth:
+    """Custom Digest Authentication for aiohttp"""
+
+    def __init__(self, username: str, password: str):
+        self.username = username
+        self.password = password
+        self.nc = 0
+        self.cnonce = None
+        self.auth_params = None
+
+    def parse_auth_header(self, auth_header: str) -> Dict:
+        """WWW-Authenticate headerini parse qilish"""
+        params = {}
+        parts = auth_header.replace('Digest ', '').split(',')
+
+        for part in parts:
+            key_val = part.strip().split('=', 1)
+            if len(key_val) == 2:
+                key = key_val[0].strip()
+                val = key_val[1].strip().strip('"')
+                params[key] = val
+
+        return params
+
+    def generate_response(self, method: str, uri: str) -> str:
+        """Digest response generatsiya qilish"""
+        if not self.auth_params:
+            return ""
+
+        self.nc += 1
+        self.cnonce = hashlib.md5(str(time.time()).encode()).hexdigest()[:16]
+
+        realm = self.auth_params.get('realm', '')
+        nonce = self.auth_params.get('nonce', '')
+        qop = self.auth_params.get('qop', 'auth')
+        opaque = self.auth_params.get('opaque', '')
+        algorithm = self.auth_params.get('algorithm', 'MD5')
+
+        # HA1 = MD5(username:realm:password)
+        ha1 = hashlib.md5(f"{self.username}:{realm}:{self.password}".encode()).hexdigest()
+
+        # HA2 = MD5(method:uri)
+        ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
+
+        # Response = MD5(HA1:nonce:nc:cnonce:qop:HA2)
+        nc_str = f"{self.nc:08x}"
+        response_str = f"{ha1}:{nonce}:{nc_str}:{self.cnonce}:{qop}:{ha2}"
+        response = hashlib.md5(response_str.encode()).hexdigest()
+
+        # Authorization header yaratish
+        auth_header = (
+            f'Digest username="{self.username}", '
+            f'realm="{realm}", '
+            f'nonce="{nonce}", '
+            f'uri="{uri}", '
+            f'qop={qop}, '
+            f'nc={nc_str}, '
+            f'cnonce="{self.cnonce}", '
+            f'response="{response}", '
+            f'opaque="{opaque}", '
+            f'algorithm={algorithm}'
+        )
+
+        return auth_header
+
+class AsyncISAPIClient:
+    """
+    Bitta qurilma uchun uzoq yashovchi aiohttp sessiyasi (keep-alive ulanishlar puli).
+    Digest nonce saqlab qolinadi va keyingi so'rovlarda oldindan yuboriladi,
+    shuning uchun har bir so'rovda 401 challenge aylanishi bo'lmaydi.
+    """
+
+    _clients: Dict[Tuple[int, str, str], 'AsyncISAPIClient'] = {}
+
+    def __init__(self, ip: str, username: str, password: str):
+        self.ip = ip
+        self.base_url = f"http://{ip}"
+        self.digest = DigestAuth(username, password)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def for_device(cls, ip: str, username: str, password: str) -> 'AsyncISAPIClient':
+        """Joriy event loop va qurilma uchun umumiy klient"""
+        key = (id(asyncio.get_running_loop()), ip, username)
+        client = cls._clients.get(key)
+        if client is None or client.digest.password != password:
+            client = cls(ip, username, password)
+            cls._clients[key] = client
+        return client
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=settings.ISAPI_POOL_SIZE,
+                    keepalive_timeout=settings.ISAPI_KEEPALIVE_SECONDS,
+                ),
+                timeout=aiohttp.ClientTimeout(total=settings.ISAPI_TIMEOUT_SECONDS),
+            )
+        return self._session
+
+    def _auth_headers(self, method: str, uri: str, headers: Optional[Dict]) -> Dict:
+        headers = dict(headers or {})
+        if self.digest.auth_params:
+            headers['Authorization'] = self.digest.generate_response(method, uri)
+        return headers
+
+    async def request(self, method: str, uri: str, data=None, json: Dict = None,
+                      headers: Dict = None) -> Tuple[int, str]:
+        """ISAPI so'rovi; nonce eskirgan bo'lsa bir marta yangi challenge bilan qayta yuboriladi"""
+        url = f"{self.base_url}{uri}"
+        for attempt in range(2):
+            async with self.session.request(
+                method, url, data=data, json=json, headers=self._auth_headers(method, uri, headers)
+            ) as resp:
+                text = await resp.text()
+                if resp.status != 401 or attempt:
+                    return resp.status, text
+                auth_header = resp.headers.get('WWW-Authenticate', '')
+                if 'Digest' not in auth_header:
+                    return resp.status, text
+                self.digest.auth_params = self.digest.parse_auth_header(auth_header)
+                self.digest.nc = 0
+        return 401, ""
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    @classmethod
+    async def close_all(cls):
+        """Joriy event loopdagi barcha sessiyalarni yopish"""
+        loop_id = id(asyncio.get_running_loop())
+        for key in [k for k in cls._clients if k[0] == loop_id]:
+            await cls._clients.pop(key).close()
@@ -34,6 +34,16 @@ class Zone(BaseModel):
 
 
 class SwingBarrier(BaseModel):
+    PROVISION_BATCH = 'batch'
+    PROVISION_SETUP = 'setup'
+    PROVISION_RECORD = 'record'
+
+    PROVISION_STRATEGY_CHOICES = [
+        (PROVISION_BATCH, 'Ko\'plab (UserInfo/Record ro\'yxat)'),
+        (PROVISION_SETUP, 'Upsert (UserInfo/SetUp)'),
+        (PROVISION_RECORD, 'Bittalab (UserInfo/Record)'),
+    ]
+
     zone = models.ForeignKey('region.Zone', verbose_name=_("Bino"), on_delete=models.SET_NULL, related_name="zones", null=True, help_text='Bino')
     name = models.CharField(max_length=255, verbose_name=_("Nom"))
     model = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("Model"))
@@ -47,6 +57,7 @@ class SwingBarrier(BaseModel):
     password = models.CharField(max_length=255, verbose_name=_("Parol"))
     status = models.BooleanField(default=True, verbose_name=_("Holat"))
     person_count = models.IntegerField(default=0, verbose_name=_("Total Persons"))
+    provision_strategy = models.CharField(max_length=20, choices=PROVISION_STRATEGY_CHOICES, blank=True, default='', verbose_name=_("Yuklash usuli"))
 
 
     def __str__(self):
@@ -0,0 +1,506 @@
+import asyncio
+import functools
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from exam.models import Student, StudentPsData, ExamShift
+from region.isapi import AsyncISAPIClient
+from region.models import SwingBarrier
+from region.sync_planner import fetch_device_users, plan_device_sync
+from region.utils import build_user_info_payload, build_face_record, prepare_face_image
+
+logger = logging.getLogger(__name__)
+
+USER_RECORD_URI = "/ISAPI/AccessControl/UserInfo/Record?format=json"
+USER_SETUP_URI = "/ISAPI/AccessControl/UserInfo/SetUp?format=json"
+USER_CAPABILITIES_URI = "/ISAPI/AccessControl/UserInfo/capabilities?format=json"
+USER_MODIFY_URI = "/ISAPI/AccessControl/UserInfo/Modify?format=json"
+USER_DELETE_URI = "/ISAPI/AccessControl/UserInfo/Delete?format=json"
+DELETE_BATCH_SIZE = 50
+# Qurilma usul yoki formatni qo'llamasligini bildiruvchi javoblar (bitta yozuv xatosi emas)
+UNSUPPORTED_HTTP_STATUSES = {405, 501}
+UNSUPPORTED_SUB_STATUSES = {'notSupport', 'methodNotAllowed'}
+# UserInfo capability'dagi bir so'rovda bir nechta yozuvni bildiruvchi belgilar
+MULTI_RECORD_FLAGS = ('isSupportMultiRecord', 'isSupportBatchAdd', 'isSupportMultiUserAdd')
+MULTI_RECORD_LIMITS = ('maxRecordNumPerRequest', 'maxUserInfoNumPerRequest')
+FACE_SETUP_URI = "/ISAPI/Intelligent/FDLib/FDSetUp?format=json"
+
+
+class AdaptiveLimit:
+    """
+    Qurilma uchun AIMD parallellik chegarasi: javob tez kelsa chegara asta oshadi,
+    xatolik yoki sekin javobda ikki barobar kamayadi.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_ms: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_ms = target_ms
+        self.limit = float(initial)
+        self._inflight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._inflight < int(self.limit))
+            self._inflight += 1
+
+    async def release(self, elapsed_ms: float, ok: bool):
+        async with self._cond:
+            self._inflight -= 1
+            if ok and elapsed_ms <= self.target_ms:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.minimum, self.limit / 2)
+            self._cond.notify_all()
+
+
+@dataclass
+class DevicePushResult:
+    """Bitta turniket bo'yicha yuklash natijasi"""
+    real_count: int = 0
+    pushed_user_count: int = 0
+    pushed_image_count: int = 0
+    unpushed_users_imei: List[str] = field(default_factory=list)
+    unpushed_images_imei: List[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    strategy: str = SwingBarrier.PROVISION_RECORD
+
+
+def build_face_multipart(f_pid: str, image_data: bytes) -> Tuple[bytes, str]:
+    """
+    FDSetUp uchun multipart tana. Tayyor bayt ko'rinishida bo'lgani uchun digest
+    challenge'dan keyin qayta yuborish mumkin.
+    """
+    boundary = uuid.uuid4().hex
+    record = json.dumps(build_face_record(f_pid)).encode()
+    body = b"".join([
+        f"--{boundary}\r\n".encode(),
+        b'Content-Disposition: form-data; name="FaceDataRecord"\r\n',
+        b"Content-Type: application/json\r\n\r\n",
+        record, b"\r\n",
+        f"--{boundary}\r\n".encode(),
+        b'Content-Disposition: form-data; name="img"; filename="face.jpg"\r\n',
+        b"Content-Type: image/jpeg\r\n\r\n",
+        image_data, b"\r\n",
+        f"--{boundary}--\r\n".encode(),
+    ])
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _as_bool(value) -> bool:
+    if isinstance(value, dict):
+        value = value.get('@opt', value.get('value'))
+    return str(value).strip().lower() in ('true', '1')
+
+
+def _as_int(value) -> int:
+    if isinstance(value, dict):
+        value = value.get('@max', value.get('value'))
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def supports_multi_record(capabilities: dict) -> bool:
+    """Capability bir Record so'rovida bir nechta UserInfo qabul qilinishini e'lon qiladimi"""
+    if any(_as_bool(capabilities.get(flag)) for flag in MULTI_RECORD_FLAGS):
+        return True
+    return any(_as_int(capabilities.get(limit)) > 1 for limit in MULTI_RECORD_LIMITS)
+
+
+def is_unsupported_response(status_code: int, text: str) -> bool:
+    """Javob usul/format qo'llanmasligini bildiradimi (bitta yozuvning validatsiya xatosi emas)"""
+    if status_code in UNSUPPORTED_HTTP_STATUSES:
+        return True
+    if not 400 <= status_code < 500:
+        return False
+    try:
+        body = json.loads(text)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(body, dict) and str(body.get('subStatusCode', '')) in UNSUPPORTED_SUB_STATUSES
+
+
+def _is_ok_status(record: dict) -> bool:
+    return str(record.get('statusCode', '')) == '1' or str(record.get('subStatusCode', '')).lower() == 'ok'
+
+
+def parse_batch_statuses(text: str) -> Optional[Dict[str, bool]]:
+    """
+    Ko'plab yozish javobidan har bir yozuv natijasi: employeeNo -> muvaffaqiyatli.
+    Javobda yozuvlar ro'yxati bo'lmasa, umumiy holat barcha yozuvlarga tegishli deb
+    qaraladi ({'*': ok}); javob o'qilmasa None.
+    """
+    try:
+        body = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(body, dict):
+        return None
+
+    records = body.get('statusList')
+    if records is None:
+        out_list = body.get('UserInfoOutList')
+        records = out_list.get('UserInfoOut') if isinstance(out_list, dict) else None
+    if not isinstance(records, list):
+        return {'*': _is_ok_status(body)}
+
+    statuses = {}
+    for record in records:
+        if isinstance(record, dict) and record.get('employeeNo') is not None:
+            statuses[str(record['employeeNo'])] = _is_ok_status(record)
+    return statuses
+
+
+async def detect_provision_strategy(client: AsyncISAPIClient) -> Tuple[str, str]:
+    """
+    UserInfo capability to'plamidan yuklash usulini tanlash: (asosiy usul, zaxira usul).
+    Ko'plab yozish faqat capability bir so'rovda bir nechta yozuvni e'lon qilsa tanlanadi;
+    aks holda SetUp (qo'llansa) yoki bittalab Record dan boshlanadi.
+    """
+    try:
+        status_code, text = await client.request("GET", USER_CAPABILITIES_URI)
+        capabilities = json.loads(text).get('UserInfo', {}) if status_code == 200 else {}
+    except Exception as e:
+        logger.warning(f"{client.ip}: capability o'qilmadi: {e}")
+        capabilities = {}
+
+    if not isinstance(capabilities, dict) or not capabilities:
+        return SwingBarrier.PROVISION_RECORD, SwingBarrier.PROVISION_RECORD
+
+    functions = capabilities.get('supportFunction', {})
+    functions = functions.get('@opt', '') if isinstance(functions, dict) else ''
+    single = SwingBarrier.PROVISION_RECORD
+    if 'setUp' in [f.strip() for f in functions.split(',')]:
+        single = SwingBarrier.PROVISION_SETUP
+    if supports_multi_record(capabilities):
+        return SwingBarrier.PROVISION_BATCH, single
+    return single, SwingBarrier.PROVISION_RECORD
+
+
+class DevicePusher:
+    """Bitta turniketga talabgorlarni moslashuvchan parallellik bilan yuklash"""
+
+    def __init__(self, exam_sb, items: List[Tuple[Student, ExamShift]], differential: bool = True, progress=None,
+                 owned: Set[str] = frozenset()):
+        self.exam_sb = exam_sb
+        self.items = items
+        # Shu tadbir talabgorlarining employeeNo lari: faqat ular qurilmadan o'chirilishi mumkin
+        self.owned = owned
+        self.differential = differential
+        self.progress = progress
+        self.client = AsyncISAPIClient.for_device(exam_sb.sb.ip_address, exam_sb.sb.username, exam_sb.sb.password)
+        self.limit = AdaptiveLimit(
+            settings.PUSH_INITIAL_CONCURRENCY,
+            1,
+            settings.PUSH_MAX_CONCURRENCY,
+            settings.PUSH_TARGET_LATENCY_MS,
+        )
+        self.result = DevicePushResult(real_count=len(items))
+        self.fallback = SwingBarrier.PROVISION_RECORD
+
+    async def _call(self, method: str, uri: str, **kwargs) -> int:
+        """Chegaralangan ISAPI so'rovi; muvaffaqiyatsiz bo'lsa qayta urinadi. HTTP status qaytaradi (0 - tarmoq xatosi)"""
+        status_code, _ = await self._request(method, uri, **kwargs)
+        return status_code
+
+    async def _request(self, method: str, uri: str, **kwargs) -> Tuple[int, str]:
+        """_call bilan bir xil, javob matni bilan birga: (status, matn)"""
+        status_code, text = 0, ''
+        for attempt in range(settings.PUSH_RETRY_ATTEMPTS):
+            await self.limit.acquire()
+            start = time.perf_counter()
+            status_code, text = 0, ''
+            try:
+                status_code, text = await self.client.request(method, uri, **kwargs)
+                if status_code != 200:
+                    logger.warning(f"{self.client.ip} {uri}: {status_code} {text[:200]}")
+            except Exception as e:
+                logger.warning(f"{self.client.ip} {uri}: {e}")
+            finally:
+                await self.limit.release((time.perf_counter() - start) * 1000, status_code == 200)
+            # 4xx - so'rovning o'zi noto'g'ri, qayta yuborishdan foyda yo'q
+            if status_code == 200 or 400 <= status_code < 500:
+                break
+        return status_code, text
+
+    def _downgrade(self, strategy: str, status_code: int, text: str):
+        """
+        Usul faqat qurilma uni qo'llamasligini aytsa almashtiriladi (va saqlanadi);
+        bitta yozuvning validatsiya xatosi qurilmani pastroq usulga o'tkazmaydi.
+        """
+        if self.result.strategy != strategy or not is_unsupported_response(status_code, text):
+            return False
+        fallback = self.fallback if strategy == SwingBarrier.PROVISION_BATCH else SwingBarrier.PROVISION_RECORD
+        logger.info(f"{self.client.ip}: {strategy} qo'llanmaydi, {fallback} usuliga o'tildi")
+        self.result.strategy = fallback
+        if fallback == SwingBarrier.PROVISION_RECORD:
+            self.fallback = SwingBarrier.PROVISION_RECORD
+        return True
+
+    async def _push_user(self, payload: dict) -> bool:
+        if self.result.strategy == SwingBarrier.PROVISION_SETUP:
+            status_code, text = await self._request("PUT", USER_SETUP_URI, json=payload)
+            if not 400 <= status_code < 500:
+                return status_code == 200
+            self._downgrade(SwingBarrier.PROVISION_SETUP, status_code, text)
+            # Yozuv rad etilsa ham bittalab Record bilan bir marta qayta urinib ko'riladi
+        return await self._call("POST", USER_RECORD_URI, json=payload) == 200
+
+    def _advance(self, count: int = 1):
+        """Job progressi (talabgorlar soni bo'yicha)"""
+        if self.progress is not None and count:
+            self.progress.advance(count)
+
+    def _build_payloads(self, items: List[Tuple[Student, ExamShift]]) -> List[Tuple[Student, dict]]:
+        payloads = []
+        for student, sm_obj in items:
+            try:
+                payloads.append((student, build_user_info_payload(student, sm_obj)))
+            except Exception as e:
+                logger.warning(f"{student.imei}: payload tayyorlanmadi: {e}")
+                self.result.unpushed_users_imei.append(student.imei)
+        return payloads
+
+    async def _push_batch(self, payloads: List[Tuple[Student, dict]]) -> Tuple[List[Student], List[Tuple[Student, dict]]]:
+        """
+        Bir so'rovda bir nechta UserInfo yozish. (yozilganlar, qayta urinish kerak bo'lganlar):
+        javobdagi har bir yozuv holati (statusList / UserInfoOut) alohida tekshiriladi.
+        """
+        batch = {"UserInfo": [payload["UserInfo"] for _, payload in payloads]}
+        status_code, text = await self._request("POST", USER_RECORD_URI, json=batch)
+        if status_code != 200:
+            self._downgrade(SwingBarrier.PROVISION_BATCH, status_code, text)
+            return [], payloads
+
+        statuses = parse_batch_statuses(text)
+        if statuses is None or '*' in statuses:
+            ok = statuses is None or statuses['*']
+            return ([student for student, _ in payloads], []) if ok else ([], payloads)
+
+        pushed, rejected = [], []
+        for student, payload in payloads:
+            if statuses.get(str(student.imei)):
+                pushed.append(student)
+            else:
+                rejected.append((student, payload))
+        if rejected:
+            logger.info(f"{self.client.ip}: ko'plab yozishda {len(rejected)} ta yozuv rad etildi, bittalab qayta yuboriladi")
+        return pushed, rejected
+
+    async def _push_users(self, payloads: List[Tuple[Student, dict]]) -> List[Student]:
+        """Yangi userlarni yozish; yozilgan talabgorlar ro'yxatini qaytaradi"""
+        pushed = []
+        if self.result.strategy == SwingBarrier.PROVISION_BATCH and len(payloads) > 1:
+            pushed, payloads = await self._push_batch(payloads)
+            self.result.pushed_user_count += len(pushed)
+
+        for student, payload in payloads:
+            if await self._push_user(payload):
+                self.result.pushed_user_count += 1
+                pushed.append(student)
+            else:
+                self.result.unpushed_users_imei.append(student.imei)
+        return pushed
+
+    async def _update_user(self, student: Student, payload: dict, needs_face: bool):
+        """Qurilmadagi userning muddati/ismini yangilash"""
+        if self.result.strategy == SwingBarrier.PROVISION_SETUP:
+            status_code, text = await self._request("PUT", USER_SETUP_URI, json=payload)
+            if 400 <= status_code < 500:
+                self._downgrade(SwingBarrier.PROVISION_SETUP, status_code, text)
+                status_code = await self._call("PUT", USER_MODIFY_URI, json=payload)
+        else:
+            status_code = await self._call("PUT", USER_MODIFY_URI, json=payload)
+        if status_code == 200:
+            self.result.pushed_user_count += 1
+            if needs_face:
+                await self._push_face(student)
+        else:
+            self.result.unpushed_users_imei.append(student.imei)
+            if needs_face:
+                self.result.unpushed_images_imei.append(student.imei)
+
+    async def _delete_users(self, employee_nos: List[str]):
+        payload = {"UserInfoDelCond": {"EmployeeNoList": [{"employeeNo": no} for no in employee_nos]}}
+        if await self._call("PUT", USER_DELETE_URI, json=payload) != 200:
+            logger.warning(f"{self.client.ip}: {len(employee_nos)} ta ortiqcha user o'chirilmadi")
+
+    async def _push_face(self, student: Student):
+        imei = student.imei
+        try:
+            # Rasm faqat yuklash vaqtida o'qiladi, butun ro'yxat xotirada base64 saqlamaydi
+            img_b64 = await StudentPsData.objects.filter(student_id=student.id).values_list('img_b64', flat=True).afirst()
+            if not img_b64:
+                raise ValueError("rasm yo'q")
+            image_data = await asyncio.to_thread(prepare_face_image, img_b64)
+        except Exception as e:
+            logger.warning(f"{imei}: rasm tayyorlanmadi: {e}")
+            self.result.unpushed_images_imei.append(imei)
+            return
+        body, content_type = build_face_multipart(imei, image_data)
+        if await self._call("PUT", FACE_SETUP_URI, data=body, headers={"Content-Type": content_type}) == 200:
+            self.result.pushed_image_count += 1
+        else:
+            self.result.unpushed_images_imei.append(imei)
+
+    async def _plan_tasks(self):
+        """
+        Bajariladigan ishlar ro'yxati. Differensial rejimda qurilmadagi userlar bilan
+        solishtirilib faqat farqlar yuboriladi; ro'yxat o'qilmasa to'liq yuklanadi.
+        """
+        size = settings.PUSH_BATCH_SIZE if self.result.strategy == SwingBarrier.PROVISION_BATCH else 1
+
+        def add_users(payloads):
+            async def task():
+                for student in await self._push_users(payloads):
+                    await self._push_face(student)
+                self._advance(len(payloads))
+            return task
+
+        def counted(func, *args):
+            async def task():
+                await func(*args)
+                self._advance()
+            return task
+
+        device_users = await fetch_device_users(self.client) if self.differential else None
+        if device_users is None:
+            payloads = self._build_payloads(self.items)
+            self._advance(len(self.items) - len(payloads))
+            return iter([add_users(payloads[i:i + size]) for i in range(0, len(payloads), size)])
+
+        plan = plan_device_sync(device_users, self.items, self.owned)
+        logger.info(f"{self.client.ip}: {plan.summary()}")
+        self.result.unpushed_users_imei.extend(plan.invalid)
+        self.result.pushed_user_count += plan.in_sync
+        self.result.pushed_image_count += plan.with_face
+        self._advance(len(plan.invalid) + plan.in_sync - len(plan.faces) + plan.duplicates)
+
+        tasks = [
+            functools.partial(self._delete_users, plan.deletes[i:i + DELETE_BATCH_SIZE])
+            for i in range(0, len(plan.deletes), DELETE_BATCH_SIZE)
+        ]
+        tasks += [add_users(plan.adds[i:i + size]) for i in range(0, len(plan.adds), size)]
+        tasks += [counted(self._update_user, student, payload, needs_face) for student, payload, needs_face in plan.updates]
+        tasks += [counted(self._push_face, student) for student in plan.faces]
+        return iter(tasks)
+
+    async def run(self) -> DevicePushResult:
+        start = time.perf_counter()
+
+        stored = self.exam_sb.sb.provision_strategy
+        if stored:
+            self.result.strategy = stored
+        else:
+            self.result.strategy, self.fallback = await detect_provision_strategy(self.client)
+
+        tasks = await self._plan_tasks()
+
+        async def worker():
+            for task in tasks:
+                try:
+                    await task()
+                except Exception as e:
+                    logger.exception(f"{self.client.ip}: {e}")
+
+        await asyncio.gather(*(worker() for _ in range(settings.PUSH_MAX_CONCURRENCY)))
+        self.result.elapsed_seconds = time.perf_counter() - start
+        if self.progress is not None:
+            errors = len(self.result.unpushed_users_imei) + len(self.result.unpushed_images_imei)
+            if errors:
+                self.progress.device_error(self.exam_sb.sb.name, errors)
+        return self.result
+
+
+def load_push_items(sb_queryset) -> List[Tuple[object, List[Tuple[Student, ExamShift]], Set[str]]]:
+    """
+    Har bir turniket uchun talabgorlar ro'yxatini oldindan (sinxron) yuklash.
+    Bir binodagi turniketlar bitta ro'yxatdan foydalanadi. Rasmlar (img_b64) bu yerda
+    o'qilmaydi — ular har bir yuz yuklanishida alohida olinadi.
+    (exam_sb, talabgorlar, tadbirning barcha imei lari) qaytariladi.
+    """
+    by_zone: Dict[Tuple[int, int], List[Tuple[Student, ExamShift]]] = {}
+    shifts: Dict[int, Dict[int, ExamShift]] = {}
+    owned: Dict[int, Set[str]] = {}
+    plans = []
+
+    for exam_sb in sb_queryset.select_related('exam', 'sb', 'sb__zone'):
+        exam = exam_sb.exam
+        zone = exam_sb.sb.zone
+        if exam.id not in shifts:
+            shifts[exam.id] = {es.sm_id: es for es in ExamShift.objects.filter(exam=exam).order_by('id')}
+            owned[exam.id] = {str(imei) for imei in Student.objects.filter(exam=exam).values_list('imei', flat=True)}
+        key = (exam.id, zone.id)
+        if key not in by_zone:
+            students = Student.objects.filter(
+                exam=exam,
+                zone=zone,
+                e_date__gte=exam.start_date,
+                e_date__lte=exam.finish_date
+            ).order_by('id')
+            by_zone[key] = [(student, shifts[exam.id].get(int(student.sm))) for student in students]
+        plans.append((exam_sb, by_zone[key], owned[exam.id]))
+    return plans
+
+
+async def push_devices(plans, differential: bool = True, progress=None) -> List[DevicePushResult]:
+    """Barcha turniketlarni parallel yuklash (bir vaqtda PUSH_MAX_DEVICES tagacha)"""
+    devices = asyncio.Semaphore(settings.PUSH_MAX_DEVICES)
+
+    async def push_one(exam_sb, items, owned):
+        async with devices:
+            result = await DevicePusher(exam_sb, items, differential, progress, owned).run()
+            logger.info(
+                f"Turniket {exam_sb.sb.name} ({result.strategy}) yakunlandi: {result.real_count} | "
+                f"Users: {result.pushed_user_count} | Images: {result.pushed_image_count} | "
+                f"{result.elapsed_seconds:.1f}s"
+            )
+            return result
+
+    try:
+        return await asyncio.gather(*(push_one(exam_sb, items, owned) for exam_sb, items, owned in plans))
+    finally:
+        await AsyncISAPIClient.close_all()
+
+
+def push_swing_barriers(sb_queryset, differential: bool = None, progress=None) -> Tuple[int, int, int, int]:
+    """
+    Turniketlarga talabgorlarni yuklash: DB o'qish/yozish sinxron, tarmoq qismi
+    bitta event loopda barcha qurilmalar uchun parallel bajariladi.
+    progress - exam.jobs.JobProgress (ixtiyoriy)
+    """
+    if differential is None:
+        differential = settings.PUSH_DIFFERENTIAL_SYNC
+    plans = load_push_items(sb_queryset)
+    if progress is not None:
+        progress.set_total(sum(len(items) for _, items, _ in plans))
+    results = asyncio.run(push_devices(plans, differential, progress))
+
+    totals = [0, 0, 0, 0]
+    for (exam_sb, _, _), result in zip(plans, results):
+        exam_sb.unpushed_users_imei = result.unpushed_users_imei
+        exam_sb.unpushed_images_imei = result.unpushed_images_imei
+        exam_sb.real_count = result.real_count
+        exam_sb.pushed_user_count = result.pushed_user_count
+        exam_sb.pushed_image_count = result.pushed_image_count
+        exam_sb.err_user_count = len(result.unpushed_users_imei)
+        exam_sb.err_image_count = len(result.unpushed_images_imei)
+        exam_sb.save()
+
+        if exam_sb.sb.provision_strategy != result.strategy:
+            SwingBarrier.objects.filter(pk=exam_sb.sb_id).update(provision_strategy=result.strategy)
+
+        totals[0] += result.pushed_user_count
+        totals[1] += result.pushed_image_count
+        totals[2] += exam_sb.err_user_count
+        totals[3] += exam_sb.err_image_count
+    return tuple(totals)
@@ -9,6 +9,8 @@ from datetime import datetime
 import hashlib
 import re
 
+from region.isapi import DigestAuth
+
 # Logging sozlash
 logging.basicConfig(
     level=logging.INFO,
@@ -21,72 +23,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class DigestAuth:
-    """Custom Digest Authentication for aiohttp"""
-
-    def __init__(self, username: str, password: str):
-        self.username = username
-        self.password = password
-        self.nc = 0
-        self.cnonce = None
-        self.auth_params = None
-
-    def parse_auth_header(self, auth_header: str) -> Dict:
-        """WWW-Authenticate headerini parse qilish"""
-        params = {}
-        parts = auth_header.replace('Digest ', '').split(',')
-
-        for part in parts:
-            key_val = part.strip().split('=', 1)
-            if len(key_val) == 2:
-                key = key_val[0].strip()
-                val = key_val[1].strip().strip('"')
-                params[key] = val
-
-        return params
-
-    def generate_response(self, method: str, uri: str) -> str:
-        """Digest response generatsiya qilish"""
-        if not self.auth_params:
-            return ""
-
-        self.nc += 1
-        self.cnonce = hashlib.md5(str(time.time()).encode()).hexdigest()[:16]
-
-        realm = self.auth_params.get('realm', '')
-        nonce = self.auth_params.get('nonce', '')
-        qop = self.auth_params.get('qop', 'auth')
-        opaque = self.auth_params.get('opaque', '')
-        algorithm = self.auth_params.get('algorithm', 'MD5')
-
-        # HA1 = MD5(username:realm:password)
-        ha1 = hashlib.md5(f"{self.username}:{realm}:{self.password}".encode()).hexdigest()
-
-        # HA2 = MD5(method:uri)
-        ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
-
-        # Response = MD5(HA1:nonce:nc:cnonce:qop:HA2)
-        nc_str = f"{self.nc:08x}"
-        response_str = f"{ha1}:{nonce}:{nc_str}:{self.cnonce}:{qop}:{ha2}"
-        response = hashlib.md5(response_str.encode()).hexdigest()
-
-        # Authorization header yaratish
-        auth_header = (
-            f'Digest username="{self.username}", '
-            f'realm="{realm}", '
-            f'nonce="{nonce}", '
-            f'uri="{uri}", '
-            f'qop={qop}, '
-            f'nc={nc_str}, '
-            f'cnonce="{self.cnonce}", '
-            f'response="{response}", '
-            f'opaque="{opaque}", '
-            f'algorithm={algorithm}'
-        )
-
-        return auth_header
-
-
 class HikvisionAsyncImporter:
     def __init__(self, base_url: str, username: str, password: str,
                  max_concurrent: int = 50, retry_attempts: int = 3,
@@ -0,0 +1,155 @@
+import datetime
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.utils import timezone
+
+from exam.models import Student, ExamShift
+from region.isapi import AsyncISAPIClient
+from region.utils import build_user_info_payload
+
+logger = logging.getLogger(__name__)
+
+USER_SEARCH_URI = "/ISAPI/AccessControl/UserInfo/Search?format=json"
+SEARCH_PAGE_SIZE = 50
+# Qurilma name maydonini UTF-8 baytlarida shu uzunlikkacha qirqib saqlaydi
+DEVICE_NAME_MAX_BYTES = 32
+
+
+@dataclass
+class SyncPlan:
+    """Qurilmadagi holat va kutilgan talabgorlar o'rtasidagi farq"""
+    adds: List[Tuple[Student, dict]] = field(default_factory=list)
+    updates: List[Tuple[Student, dict, bool]] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)
+    faces: List[Student] = field(default_factory=list)  # o'zgarmagan, ammo yuzsiz userlar
+    invalid: List[str] = field(default_factory=list)
+    in_sync: int = 0
+    with_face: int = 0
+    duplicates: int = 0  # bir imei uchun ortiqcha yozuvlar (qurilmaga yuborilmaydi)
+
+    def summary(self) -> str:
+        return (f"+{len(self.adds)} ~{len(self.updates)} -{len(self.deletes)} "
+                f"yuz:{len(self.faces)} o'zgarmagan:{self.in_sync}")
+
+
+async def fetch_device_users(client: AsyncISAPIClient) -> Optional[Dict[str, dict]]:
+    """
+    Qurilmadagi barcha userlarni UserInfo/Search orqali sahifalab o'qish (employeeNo -> UserInfo).
+    Ro'yxat to'liq o'qilmasa None qaytadi — bunday holda farq hisoblanmaydi.
+    """
+    users: Dict[str, dict] = {}
+    search_id = uuid.uuid4().hex
+    position = 0
+
+    while True:
+        payload = {
+            "UserInfoSearchCond": {
+                "searchID": search_id,
+                "searchResultPosition": position,
+                "maxResults": SEARCH_PAGE_SIZE,
+            }
+        }
+        try:
+            status_code, text = await client.request("POST", USER_SEARCH_URI, json=payload)
+            if status_code != 200:
+                logger.warning(f"{client.ip}: userlar ro'yxati o'qilmadi: {status_code}")
+                return None
+            search = json.loads(text).get('UserInfoSearch', {})
+        except Exception as e:
+            logger.warning(f"{client.ip}: userlar ro'yxati o'qilmadi: {e}")
+            return None
+
+        page = search.get('UserInfo', []) or []
+        for user in page:
+            if user.get('employeeNo'):
+                users[str(user['employeeNo'])] = user
+
+        position += len(page)
+        if not page or search.get('responseStatusStrg') != 'MORE' or position >= search.get('totalMatches', 0):
+            return users
+
+
+def device_name(name: str) -> str:
+    """Ismni qurilma saqlaydigan ko'rinishga keltirish (baytlar bo'yicha qirqish, yarim harf tashlanadi)"""
+    return (name or '').encode('utf-8')[:DEVICE_NAME_MAX_BYTES].decode('utf-8', errors='ignore').strip()
+
+
+def dedupe_items(items: List[Tuple[Student, ExamShift]], today: datetime.date = None) -> List[Tuple[Student, ExamShift]]:
+    """
+    Bir employeeNo (imei) uchun qurilmada bitta user bo'ladi. Bir nechta yozuv bo'lsa, bugungi yoki
+    eng yaqin kelgusi kun tanlanadi, hammasi o'tib ketgan bo'lsa — eng oxirgisi (teng bo'lsa kichik id).
+    """
+    today = today or timezone.localdate()
+    chosen: Dict[str, Tuple[Student, ExamShift]] = {}
+
+    def rank(student):
+        upcoming = student.e_date >= today
+        # Kelgusi kunlar eng yaqini bo'yicha, o'tganlar eng oxirgisi bo'yicha birinchi
+        day = student.e_date.toordinal()
+        return (0, day, student.id) if upcoming else (1, -day, student.id)
+
+    for student, sm_obj in items:
+        imei = str(student.imei)
+        current = chosen.get(imei)
+        if current is None or rank(student) < rank(current[0]):
+            chosen[imei] = (student, sm_obj)
+    return sorted(chosen.values(), key=lambda item: item[0].id)
+
+
+def _valid_window(user_info: dict) -> Tuple[str, str]:
+    """Valid oralig'ini solishtirish uchun (timezone qo'shimchasisiz)"""
+    valid = user_info.get('Valid', {}) or {}
+    return str(valid.get('beginTime', ''))[:19], str(valid.get('endTime', ''))[:19]
+
+
+def plan_device_sync(device_users: Dict[str, dict], items: List[Tuple[Student, ExamShift]],
+                     owned: Set[str] = frozenset()) -> SyncPlan:
+    """
+    Kutilgan talabgorlarni (employeeNo = imei) qurilmadagi ro'yxat bilan solishtirish:
+    yo'qlari qo'shiladi, muddati yoki ismi farq qilganlari yangilanadi, yuzi yo'qlarga rasm
+    yuklanadi. Faqat shu tadbirga tegishli (owned) ortiqcha visitorlar o'chiriladi —
+    boshqa tadbir userlari va xodimlar (normal) tegilmaydi.
+    """
+    plan = SyncPlan()
+    expected = set()
+
+    unique_items = dedupe_items(items)
+    plan.duplicates = len(items) - len(unique_items)
+    for student, sm_obj in unique_items:
+        imei = str(student.imei)
+        try:
+            payload = build_user_info_payload(student, sm_obj)
+        except Exception as e:
+            logger.warning(f"{imei}: payload tayyorlanmadi: {e}")
+            plan.invalid.append(imei)
+            continue
+        expected.add(imei)
+
+        current = device_users.get(imei)
+        if current is None:
+            plan.adds.append((student, payload))
+            continue
+
+        has_face = int(current.get('numOfFace', 0) or 0) > 0
+        if has_face:
+            plan.with_face += 1
+
+        wanted = payload["UserInfo"]
+        name_changed = device_name(current.get('name')) != device_name(wanted["name"])
+        if _valid_window(current) != _valid_window(wanted) or name_changed:
+            # Yangilangan userning yuzi yo'q bo'lsa, rasm yangilashdan keyin yuklanadi
+            plan.updates.append((student, payload, not has_face))
+        else:
+            plan.in_sync += 1
+            if not has_face:
+                plan.faces.append(student)
+
+    plan.deletes = [
+        employee_no for employee_no, user in device_users.items()
+        if user.get('userType') == 'visitor' and employee_no not in expected and employee_no in owned
+    ]
+    return plan
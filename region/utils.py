@@ -1,15 +1,28 @@
 import base64
 import json
+import logging
+import threading
 import time
+from collections import OrderedDict
 from io import BytesIO
 import requests
 from PIL import Image
 
+from django.conf import settings
 from requests.exceptions import ConnectTimeout, RequestException
 from requests.auth import HTTPDigestAuth
+from core.image_store import get_image_store
 from exam.models import Student, ExamZoneSwingBar, ExamShift
 from region.contex_manager import hikvision_session
 
+logger = logging.getLogger(__name__)
+
+# Qurilmaga tayyor (siqilgan) rasmlar: kalit -> JPEG baytlar (LRU)
+_device_images: "OrderedDict[str, bytes]" = OrderedDict()
+_device_images_lock = threading.Lock()
+# Bir rasm bir vaqtda faqat bitta oqimda siqiladi (single-flight): kalit -> lock
+_device_image_locks: "dict[str, threading.Lock]" = {}
+
 HEADER = {
     "Content-Type": "application/json",
     "Accept": "application/json"
@@ -148,43 +161,38 @@ def delete_all_visitors_clean(ip_address, username, password):
 
     return total, success_count
 
-def add_user_to_swing_barr(ip_address: str, username: str, password: str, obj: Student = None, sm_obj: ExamShift = None):
-    imei: str = obj.imei
-    name: str = obj.fio
-    user_type: str = 'visitor'
-    door_right = "1,2"
-    check_user = True
-    belong_group = "1"
-    num_of_face = 0
+def build_user_info_payload(obj: Student, sm_obj: ExamShift) -> dict:
+    """Turniketga yoziladigan UserInfo (visitor) payloadi"""
     test_day = obj.e_date
+    return {
+        "UserInfo": {
+            "employeeNo": f"{obj.imei}",
+            "name": f"{obj.fio}",
+            "userType": 'visitor',
+            "gender": "male",
+            "Valid": {
+                "enable": True,
+                "beginTime": f"{test_day}T{sm_obj.access_time}",
+                "endTime": f"{test_day}T{sm_obj.expire_time}",
+                "timeType": "local",
+            },
+            "doorRight": "1,2",
+            "roomNumber": 5,
+            "floorNumber": 2,
+            "buildingNumber": "B",
+            "belongGroup": "1",
+            "numOfFace": 0,
+            "checkUser": True
+        }
+    }
 
+def add_user_to_swing_barr(ip_address: str, username: str, password: str, obj: Student = None, sm_obj: ExamShift = None):
+    imei: str = obj.imei
     is_success = False
 
-    valid = {
-        "enable": True,
-        "beginTime": f"{test_day}T{sm_obj.access_time}",
-        "endTime": f"{test_day}T{sm_obj.expire_time}",
-        "timeType": "local",
-    }
-
     with hikvision_session(ip_address, username, password) as session:
         base_url = f"http://{ip_address}/ISAPI/AccessControl/UserInfo/Record?format=json"
-        payload = {
-            "UserInfo": {
-                "employeeNo": f"{imei}",
-                "name": f"{name}",
-                "userType": user_type,
-                "gender": "male",
-                "Valid": valid,
-                "doorRight": door_right,
-                "roomNumber": 5,
-                "floorNumber": 2,
-                "buildingNumber": "B",
-                "belongGroup": belong_group,
-                "numOfFace": num_of_face,
-                "checkUser": check_user
-            }
-        }
+        payload = build_user_info_payload(obj, sm_obj)
         try:
             res = session.post(url=base_url, json=payload, timeout=10)
             if res.status_code == 200:
@@ -196,120 +204,10 @@ def add_user_to_swing_barr(ip_address: str, username: str, password: str, obj: S
             print(f"Turniket: {ip_address} - {imei} yuklanmadi: {res.status_code}. Error: {e}")
             return is_success
 
-def push_data_main_worker(sb_queryset):
-    success_count_user = 0
-    error_count_user = 0
-    success_count_img = 0
-    error_count_img = 0
-
-    for sb in sb_queryset:
-        zone = sb.sb.zone
-        exam = sb.exam
-        ip_address = sb.sb.ip_address
-        username = sb.sb.username
-        password = sb.sb.password
-
-        parts_day_queryset = ExamShift.objects.filter(exam=exam).order_by('id')
-        student_queryset = Student.objects.filter(
-            exam=exam,
-            zone=zone,
-            e_date__gte=exam.start_date,
-            e_date__lte=exam.finish_date
-        ).order_by('id')
-
-        n_count = student_queryset.count()
-
-        # Har bir swing barrier uchun alohida listlar
-        error_users_imei = []
-        error_images_imei = []
-        sb_success_user = 0
-        sb_error_user = 0
-        sb_success_img = 0
-        sb_error_img = 0
-
-        print(f"Swing Barrier: {sb.sb.name} - Jami talabalar: {n_count}")
-
-        for index, student in enumerate(student_queryset, 1):
-            sm: int = int(student.sm)
-            sm_obj = parts_day_queryset.filter(sm=sm).first()
-            imei = student.imei
-
-            try:
-                # 1. Avval userni qo'shish
-                is_user_added = add_user_to_swing_barr(
-                    ip_address,
-                    username,
-                    password,
-                    student,
-                    sm_obj
-                )
-
-                if is_user_added:
-                    sb_success_user += 1
-
-                    # 2. User qo'shildi, darhol rasmni yuklash
-                    time.sleep(0.2)  # Qurilma barqaror ishlashi uchun
-
-                    img_data = {"fpid": imei, "img64": student.ps_data.img_b64}
-
-                    is_image_uploaded = upload_single_user_face_image(
-                        user_data=img_data,
-                        ip_address=ip_address,
-                        username=username,
-                        password=password
-                    )
-
-                    if is_image_uploaded:
-                        sb_success_img += 1
-                        print(f"✓ [{index}/{n_count}] User {imei} va rasmi yuklandi")
-                    else:
-                        sb_error_img += 1
-                        error_images_imei.append(imei)
-                        print(f"✗ [{index}/{n_count}] User {imei} qo'shildi, lekin rasm yuklanmadi")
-                else:
-                    sb_error_user += 1
-                    error_users_imei.append(imei)
-                    print(f"✗ [{index}/{n_count}] User {imei} qo'shilmadi")
-
-            except Exception as e:
-                sb_error_user += 1
-                error_users_imei.append(imei)
-                print(f"✗ [{index}/{n_count}] Xatolik {imei}: {str(e)}")
-
-            # Har 100 ta userdan keyin progress ko'rsatish
-            if index % 100 == 0:
-                print(f"Progress: {index}/{n_count} | "
-                      f"Users: {sb_success_user}✓/{sb_error_user}✗ | "
-                      f"Images: {sb_success_img}✓/{sb_error_img}✗")
-
-            time.sleep(0.1)  # Rate limiting
-
-        # Umumiy statistikani yangilash
-        success_count_user += sb_success_user
-        error_count_user += sb_error_user
-        success_count_img += sb_success_img
-        error_count_img += sb_error_img
-
-        # Ma'lumotlar bazasini yangilash
-        sb.unpushed_users_imei = error_users_imei
-        sb.unpushed_images_imei = error_images_imei
-        sb.real_count = n_count
-        sb.pushed_user_count = sb_success_user
-        sb.pushed_image_count = sb_success_img
-        sb.err_user_count = sb_error_user
-        sb.err_image_count = sb_error_img
-        sb.save()
-
-        print(f"\n{'=' * 60}")
-        print(f"Swing Barrier {sb.sb.name} yakunlandi:")
-        print(f"  Jami: {n_count}")
-        print(f"  Users: {sb_success_user}✓ / {sb_error_user}✗")
-        print(f"  Images: {sb_success_img}✓ / {sb_error_img}✗")
-        print(f"{'=' * 60}\n")
-
-        time.sleep(0.5)  # Keyingi swing barrierga o'tishdan oldin pauza
-
-    return success_count_user, success_count_img, error_count_user, error_count_img
+def push_data_main_worker(sb_queryset, differential: bool = None, progress=None):
+    """Turniketlarga yuklash — barcha qurilmalar parallel, faqat farqlar (region.push_engine)"""
+    from region.push_engine import push_swing_barriers
+    return push_swing_barriers(sb_queryset, differential, progress)
 
 def compress_image_to_limit(image_data, max_size_kb=200, quality_start=95):
     """
@@ -380,6 +278,70 @@ def compress_image_to_limit(image_data, max_size_kb=200, quality_start=95):
         return image_data  # Original ni qaytarish
 
 
+def prepare_face_image(base64_string: str, max_size_kb: int = 200) -> bytes:
+    """
+    Base64 rasmni decode qilib, turniket qabul qiladigan hajmgacha (200 KB) siqish.
+    Siqilgan nusxa asl rasm hashi bo'yicha xotirada va image store'da saqlanadi,
+    shuning uchun bir rasm barcha turniketlar va qayta yuklashlar uchun bir marta siqiladi.
+    Bir rasmni bir vaqtda so'ragan oqimlar birinchisining natijasini kutadi.
+    """
+    if ',' in base64_string:
+        base64_string = base64_string.split(',')[1]
+
+    image_data = base64.b64decode(base64_string)
+    if len(image_data) / 1024 <= max_size_kb:
+        return image_data
+
+    store = get_image_store()
+    key = store.variant_key(store.make_key(image_data), f"device{max_size_kb}")
+    with _device_images_lock:
+        cached = _device_images.get(key)
+        if cached is not None:
+            _device_images.move_to_end(key)
+            return cached
+        key_lock = _device_image_locks.setdefault(key, threading.Lock())
+
+    try:
+        with key_lock:
+            # Kutish paytida boshqa oqim siqib qo'ygan bo'lishi mumkin
+            with _device_images_lock:
+                cached = _device_images.get(key)
+            if cached is not None:
+                return cached
+
+            try:
+                cached = store.get(key)
+            except Exception as e:
+                logger.warning(f"Siqilgan rasm o'qilmadi ({key}): {e}")
+                cached = None
+
+            if cached is None:
+                cached = compress_image_to_limit(image_data, max_size_kb=max_size_kb)
+                try:
+                    store.put_as(key, cached)
+                except Exception as e:
+                    logger.warning(f"Siqilgan rasm saqlanmadi ({key}): {e}")
+
+            with _device_images_lock:
+                _device_images[key] = cached
+                while len(_device_images) > settings.DEVICE_IMAGE_CACHE_SIZE:
+                    _device_images.popitem(last=False)
+            return cached
+    finally:
+        with _device_images_lock:
+            if _device_image_locks.get(key) is key_lock:
+                del _device_image_locks[key]
+
+
+def build_face_record(f_pid: str) -> dict:
+    """FDSetUp uchun FaceDataRecord qismi"""
+    return {
+        "faceLibType": "blackFD",
+        "FDID": "1",
+        "FPID": f_pid
+    }
+
+
 def upload_single_user_face_image(user_data, ip_address, username, password):
     base_url = f"http://{ip_address}/ISAPI/Intelligent/FDLib/FDSetUp?format=json"
     is_added = False
@@ -392,31 +354,15 @@ def upload_single_user_face_image(user_data, ip_address, username, password):
             print(f"FPID {f_pid}: Base64 yoki FPID topilmadi")
             return is_added
 
-        # Base64 ni decode qilish
-        if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
+        image_data = prepare_face_image(base64_string)
+        size_kb = len(image_data) / 1024
+        print(f"FPID {f_pid}: Rasm hajmi: {size_kb:.2f} KB")
 
-        image_data = base64.b64decode(base64_string)
-        original_size_kb = len(image_data) / 1024
-
-        print(f"FPID {f_pid}: Original rasm hajmi: {original_size_kb:.2f} KB")
-
-        # Agar 200 KB dan katta bo'lsa, compress qilish
-        if original_size_kb > 200:
-            print(f"FPID {f_pid}: Rasm 200 KB dan katta, compress qilinmoqda...")
-            image_data = compress_image_to_limit(image_data, max_size_kb=200)
-            compressed_size_kb = len(image_data) / 1024
-            print(f"FPID {f_pid}: Compressed hajmi: {compressed_size_kb:.2f} KB")
-
-            if compressed_size_kb > 200:
-                print(f"FPID {f_pid}: Ogohlantirish - Rasm hali ham 200 KB dan katta!")
+        if size_kb > 200:
+            print(f"FPID {f_pid}: Ogohlantirish - Rasm hali ham 200 KB dan katta!")
 
         # JSON data tayyorlash
-        json_data = {
-            "faceLibType": "blackFD",
-            "FDID": "1",
-            "FPID": f_pid
-        }
+        json_data = build_face_record(f_pid)
 
         # Multipart files
         files = {
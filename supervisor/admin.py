@@ -1,4 +1,3 @@
-import time
 from io import BytesIO
 from django.contrib import admin
 from django.db import models
@@ -10,8 +9,9 @@ from django.contrib import messages
 import openpyxl
 from import_export.admin import ExportActionModelAdmin
 
-from region.models import Region, SwingBarrier
-from supervisor.utils import is_check_healthy, add_supervisor_to_swing_barr, upload_single_supervisor_face_image
+from region.models import Region
+from exam.jobs import enqueue_job_redirect
+from exam.models import BackgroundJob
 from supervisor.forms import ExcelImportForm
 
 from unfold.admin import ModelAdmin
@@ -118,54 +118,7 @@ class SupervisorAdmin(ModelAdmin, ExportActionModelAdmin):
     @action(description=_("Face ID"), icon="ar_on_you", variant=ActionVariant.SUCCESS,
             permissions=["send_data_action"], )
     def send_data_action(self, request):
-        try:
-            staff_queryset = Supervisor.objects.filter(role='staff').order_by('region', 'id')
-            error_message = str()
-
-            for staff in staff_queryset:
-                region = staff.region
-                imei = staff.imei
-                img64 = staff.img_b64
-
-                sb_queryset = SwingBarrier.objects.filter(zone__region=region).order_by('id')
-
-                for sb in sb_queryset:
-                    sb_ip = sb.ip_address
-                    sb_username = sb.username
-                    sb_password = sb.password
-                    sb_mac_address = sb.mac_address
-                    status = is_check_healthy(ip_address=sb_ip, mac_address=sb_mac_address, username=sb_username, password=sb_password)
-                    if not status:
-                        error_message += f"{staff.fio} - {region.name} - {sb_ip} - holati faol emas!\n"
-                        continue
-                    try:
-                        is_user_added = add_supervisor_to_swing_barr(sb_ip, sb_username, sb_password, staff)
-
-                        if is_user_added:
-                            time.sleep(0.2)
-
-                            img_data = {"fpid": imei, "img64": img64}
-
-                            is_image_uploaded = upload_single_supervisor_face_image(
-                                user_data=img_data,
-                                ip_address=sb_ip,
-                                username=sb_username,
-                                password=sb_password
-                            )
-
-                            if is_image_uploaded:
-                                print(f"✓ User {imei} va rasmi yuklandi")
-                            else:
-                                error_message += f"{staff.fio} - {region.name} - {sb_ip} - Rasm qo'shilmadi!\n"
-                        else:
-                            error_message += f"{staff.fio} - {region.name} - {sb_ip} - qo'shilmadi!\n"
-                    except Exception as e:
-                        error_message += f"{staff.fio} - {region.name} - {sb_ip} - {str(e)}\n"
-
-        except Exception as e:
-            messages.error(request, str(e))
-        finally:
-            return redirect(request.headers["referer"])
+        return enqueue_job_redirect(request, BackgroundJob.KIND_SEND_SUPERVISORS)
 
     def has_send_data_action_permission(self, request):
         return request.user.is_admin or request.user.is_central
@@ -2,7 +2,7 @@ from auditlog.registry import auditlog
 from django.db import models
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
-from pgvector.django import VectorField
+from pgvector.django import VectorField, HnswIndex
 from core.models.base import BaseModel
 from django.core.validators import RegexValidator
 
@@ -61,6 +61,15 @@ class Supervisor(BaseModel):
         verbose_name = 'Nazoratchi'
         verbose_name_plural = 'Nazoratchilar'
         db_table = 'supervisor'
+        indexes = [
+            HnswIndex(
+                name='supervisor_img_vector_hnsw',
+                fields=['img_vector'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+        ]
 
 
 class EventSupervisor(BaseModel):
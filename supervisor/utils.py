@@ -3,11 +3,11 @@ import json
 import time
 from io import BytesIO
 import requests
-from PIL import Image
 
 from requests.exceptions import ConnectTimeout, RequestException
 from requests.auth import HTTPDigestAuth
 from region.contex_manager import hikvision_session
+from region.utils import prepare_face_image
 from supervisor.models import Supervisor
 
 HEADER = {
@@ -191,75 +191,6 @@ def add_supervisor_to_swing_barr(ip_address: str, username: str, password: str,
             print(f"Turniket: {ip_address} - {imei} yuklanmadi: {res.status_code}. Error: {e}")
             return is_success
 
-def compress_image_to_limit(image_data, max_size_kb=200, quality_start=95):
-    """
-    Rasmni 200 KB gacha compress qilish
-    """
-    try:
-        # Image obyektini yaratish
-        img = Image.open(BytesIO(image_data))
-
-        # RGBA bo'lsa RGB ga o'tkazish (JPEG uchun)
-        if img.mode in ('RGBA', 'LA', 'P'):
-            # Alpha channel ni olib tashlash
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-
-        # Progressiv sifat pasaytirish
-        quality = quality_start
-        output = BytesIO()
-
-        while quality > 10:
-            output.seek(0)
-            output.truncate()
-
-            # JPEG sifatida saqlash
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            size_kb = output.tell() / 1024
-
-            if size_kb <= max_size_kb:
-                output.seek(0)
-                return output.read()
-
-            quality -= 5
-
-        # Agar sifat yetmasa, o'lchamini kichraytirish
-        width, height = img.size
-        scale_factor = 0.9
-
-        while quality <= 10:
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            output.seek(0)
-            output.truncate()
-            img_resized.save(output, format='JPEG', quality=85, optimize=True)
-
-            size_kb = output.tell() / 1024
-
-            if size_kb <= max_size_kb:
-                output.seek(0)
-                return output.read()
-
-            scale_factor -= 0.05
-
-            if scale_factor < 0.3:  # Juda kichik bo'lmasligi uchun
-                break
-
-        # Oxirgi variant - eng kichik
-        output.seek(0)
-        return output.read()
-
-    except Exception as e:
-        print(f"Compress qilishda xatolik: {e}")
-        return image_data  # Original ni qaytarish
-
-
 def upload_single_supervisor_face_image(user_data, ip_address, username, password):
     base_url = f"http://{ip_address}/ISAPI/Intelligent/FDLib/FDSetUp?format=json"
     is_added = False
@@ -272,24 +203,13 @@ def upload_single_supervisor_face_image(user_data, ip_address, username, passwor
             print(f"FPID {f_pid}: Base64 yoki FPID topilmadi")
             return is_added
 
-        # Base64 ni decode qilish
-        if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
-
-        image_data = base64.b64decode(base64_string)
-        original_size_kb = len(image_data) / 1024
-
-        print(f"FPID {f_pid}: Original rasm hajmi: {original_size_kb:.2f} KB")
-
-        # Agar 200 KB dan katta bo'lsa, compress qilish
-        if original_size_kb > 200:
-            print(f"FPID {f_pid}: Rasm 200 KB dan katta, compress qilinmoqda...")
-            image_data = compress_image_to_limit(image_data, max_size_kb=200)
-            compressed_size_kb = len(image_data) / 1024
-            print(f"FPID {f_pid}: Compressed hajmi: {compressed_size_kb:.2f} KB")
+        # Decode + 200 KB gacha siqish (kontent hashi bo'yicha keshlanadi)
+        image_data = prepare_face_image(base64_string)
+        size_kb = len(image_data) / 1024
+        print(f"FPID {f_pid}: Rasm hajmi: {size_kb:.2f} KB")
 
-            if compressed_size_kb > 200:
-                print(f"FPID {f_pid}: Ogohlantirish - Rasm hali ham 200 KB dan katta!")
+        if size_kb > 200:
+            print(f"FPID {f_pid}: Ogohlantirish - Rasm hali ham 200 KB dan katta!")
 
         # JSON data tayyorlash
         json_data = {